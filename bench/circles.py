@@ -0,0 +1,94 @@
+"""Cost of the circle finders' candidate scoring, full-frame masks versus
+bounding-box disc masks, plus the finders end to end.
+
+Run from the repository root:  python -m bench.circles [-i recording.bin]
+"""
+import argparse
+import cv2
+import numpy as np
+
+from time import perf_counter
+
+from strikepoint.frames import FrameInfoReader
+from strikepoint.engine.util import _discMean, \
+    findBrightestThermalCircles, findBrightestVisualCircles
+
+
+def fullMaskMean(frame, x, y, r):
+    mask = np.zeros(frame.shape, dtype=np.uint8)
+    cv2.circle(mask, (x, y), r, 255, -1)
+    return cv2.mean(frame, mask=mask)[0]
+
+
+def loadFrames(fileName, maxFrames):
+    if fileName is None:
+        rng = np.random.default_rng(0)
+        frameList = list()
+        for i in range(maxFrames):
+            frame = np.full((240, 320, 3), 40, dtype=np.uint8)
+            frame += rng.integers(0, 10, frame.shape, dtype=np.uint8)
+            cv2.circle(frame, (160 + i % 7, 150), 18, (230, 230, 230), -1)
+            frameList.append((frame, frame))
+        return frameList
+
+    with FrameInfoReader(fileName) as reader:
+        return [(a.rgbFrames['visual'], a.rgbFrames['thermal'])
+                for a in reader[:maxFrames]]
+
+
+def candidateCircles(frameList, count):
+    """Hough candidates like the finders score them, padded with random
+    circles so every frame has `count` to score."""
+    rng = np.random.default_rng(1)
+    resultList = list()
+    for visual, _ in frameList:
+        gray = cv2.medianBlur(cv2.cvtColor(visual, cv2.COLOR_BGR2GRAY), 5)
+        circles = cv2.HoughCircles(
+            gray, cv2.HOUGH_GRADIENT_ALT, dp=1.2, minDist=30, param1=100,
+            param2=0.8, minRadius=10, maxRadius=50)
+        circles = [] if circles is None else \
+            [tuple(a) for a in np.round(circles[0]).astype(int)]
+        while len(circles) < count:
+            circles.append((int(rng.integers(0, gray.shape[1])),
+                            int(rng.integers(0, gray.shape[0])),
+                            int(rng.integers(10, 51))))
+        resultList.append((gray, circles))
+    return resultList
+
+
+def timeOver(fn, argList, repeat):
+    start = perf_counter()
+    for _ in range(repeat):
+        for args in argList:
+            fn(*args)
+    return (perf_counter() - start) / (repeat * len(argList))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-i", "--input-recording", type=str,
+                        help="recording to take frames from "
+                        "(synthetic frames when omitted)")
+    parser.add_argument("-n", "--frames", type=int, default=50)
+    parser.add_argument("-c", "--candidates", type=int, default=8)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    frameList = loadFrames(args.input_recording, args.frames)
+    candidateList = candidateCircles(frameList, args.candidates)
+    scoreArgList = [(gray, *c) for gray, circles in candidateList
+                    for c in circles]
+    mismatchCount = sum(fullMaskMean(*a) != _discMean(*a)
+                        for a in scoreArgList)
+
+    print(f"{len(frameList)} frames, {len(scoreArgList)} candidates, "
+          f"{mismatchCount} scoring mismatches")
+    for name, fn, argList in (
+            ("score, full-frame mask", fullMaskMean, scoreArgList),
+            ("score, disc mask", _discMean, scoreArgList),
+            ("findBrightestVisualCircles", findBrightestVisualCircles,
+             [(a[0], ) for a in frameList]),
+            ("findBrightestThermalCircles", findBrightestThermalCircles,
+             [(a[1], ) for a in frameList])):
+        seconds = timeOver(fn, argList, args.repeat)
+        print(f"  {name:<30} {seconds * 1e6:9.1f} us/call")
@@ -0,0 +1,71 @@
+"""Per-frame cost of the camera preprocessing, before and after fusing.
+
+Run from the repository root:  python -m bench.preprocess
+"""
+import argparse
+import cv2
+import numpy as np
+
+from time import perf_counter
+
+from strikepoint.preprocess import ThermalPreprocessor, VisualPreprocessor
+
+OUTPUT_SIZE = (320, 240)
+
+
+def visualStepByStep(frame):
+    frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+    frame = cv2.rotate(frame, cv2.ROTATE_180)
+    frame = cv2.flip(frame, 0)
+    frame = cv2.flip(frame, 1)
+    frame = cv2.resize(frame, OUTPUT_SIZE, interpolation=cv2.INTER_NEAREST)
+    return cv2.resize(frame, OUTPUT_SIZE, interpolation=cv2.INTER_NEAREST)
+
+
+def thermalStepByStep(frame):
+    frame = cv2.flip(frame, 0)
+    raw = cv2.flip(frame, 1)
+    frame = cv2.resize(raw, OUTPUT_SIZE, interpolation=cv2.INTER_NEAREST)
+    frame = cv2.normalize(
+        frame, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    return raw, cv2.applyColorMap(frame, cv2.COLORMAP_HOT)
+
+
+def timePerCall(fn, frame, iterations):
+    for _ in range(min(iterations, 10)):
+        fn(frame)
+    start = perf_counter()
+    for _ in range(iterations):
+        fn(frame)
+    return (perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=500)
+    parser.add_argument("--camera-width", type=int, default=640)
+    parser.add_argument("--camera-height", type=int, default=480)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    cameraShape = (args.camera_height, args.camera_width, 3)
+    visualFrame = rng.integers(0, 256, cameraShape, dtype=np.uint8)
+    thermalFrame = rng.normal(70, 3, (60, 80)).astype(np.float32)
+    visual = VisualPreprocessor(cameraShape, OUTPUT_SIZE)
+    thermal = ThermalPreprocessor((60, 80), OUTPUT_SIZE, flipCode=-1)
+    visualOut = np.empty((OUTPUT_SIZE[1], OUTPUT_SIZE[0], 3), dtype=np.uint8)
+
+    caseList = (
+        ("visual step-by-step", visualStepByStep, visualFrame),
+        ("visual fused", visual.process, visualFrame),
+        ("visual fused, preallocated output",
+         lambda a: visual.process(a, out=visualOut), visualFrame),
+        ("thermal step-by-step", thermalStepByStep, thermalFrame),
+        ("thermal native-resolution colorize", thermal.process,
+         thermalFrame),
+    )
+    print(f"camera {args.camera_width}x{args.camera_height} -> "
+          f"{OUTPUT_SIZE[0]}x{OUTPUT_SIZE[1]}, {args.iterations} iterations")
+    for name, fn, frame in caseList:
+        seconds = timePerCall(fn, frame, args.iterations)
+        print(f"  {name:<36} {seconds * 1e6:9.1f} us/frame")
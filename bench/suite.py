@@ -0,0 +1,424 @@
+"""Repeatable benchmarks of the frame pipeline, saved as JSON and compared
+against a stored baseline.
+
+Covers recording writes and reads, the circle finders, both engines, the
+content manager's frame registration and JPEG encoding, SSE fan-out, and
+the cases from bench.preprocess and bench.circles.  Frames are synthetic
+unless a recording is given; the strike pair is always synthetic, since
+it needs a known strike.
+
+Run from the repository root:
+    python -m bench.suite -o results.json --save-baseline baseline.json
+    python -m bench.suite --baseline baseline.json     # exits 1 on regressions
+
+Baselines only compare like with like, so record one per machine (e.g. on
+a field unit before deploying).
+"""
+import argparse
+import cv2
+import fnmatch
+import json
+import numpy as np
+import os
+import platform
+import sys
+import tempfile
+
+from datetime import datetime
+from flask import Flask
+from time import perf_counter
+
+from strikepoint.events import EventBus
+from strikepoint.frames import FrameInfo, FrameInfoReader, FrameInfoWriter
+from strikepoint.preprocess import ThermalPreprocessor, VisualPreprocessor
+from strikepoint.engine.analysis import FrameAnalysis
+from strikepoint.engine.calibrate import CalibrationEngine
+from strikepoint.engine.strike import StrikeDetectionEngine, \
+    StrikeDetectedEvent
+from strikepoint.engine.util import findBrightestThermalCircles, \
+    findBrightestVisualCircles
+from strikepoint.web.content import ContentManager
+from strikepoint.web.sse import SSEManager
+
+FRAME_PERIOD_NS = 100_000_000
+OUTPUT_SIZE = (320, 240)
+IDENTITY_TRANSFORM = np.float32([[1, 0, 0], [0, 1, 0]])
+
+# name -> setup(fixture) returning the function to time
+_benchmarkMap = dict()
+
+
+def benchmark(name: str):
+    def register(setup):
+        _benchmarkMap[name] = setup
+        return setup
+    return register
+
+
+def syntheticFrameInfo(index: int, ballPresent: bool = True,
+                       warmPatch: bool = False, audioEvents: list = None):
+    """A 320x240 visual and 80x60 thermal frame pair with a bright ball on
+    the tee, and optionally the warm patch it leaves once struck."""
+    rng = np.random.default_rng(index)
+    visual = np.full((240, 320, 3), 40, dtype=np.uint8)
+    visual += rng.integers(0, 10, visual.shape, dtype=np.uint8)
+    thermal = np.full((60, 80), 70.0, dtype=np.float32)
+    thermal += rng.normal(0, 0.05, thermal.shape).astype(np.float32)
+    if ballPresent:
+        cv2.circle(visual, (160 + index % 3, 150), 18, (230, 230, 230), -1)
+        cv2.circle(thermal, (40, 37), 4, 75.0, -1)
+    if warmPatch:
+        cv2.circle(thermal, (34, 38), 4, 80.0, -1)
+    thermalRgb = cv2.resize(cv2.normalize(
+        thermal, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8),
+        OUTPUT_SIZE, interpolation=cv2.INTER_NEAREST)
+
+    frameInfo = FrameInfo(index * FRAME_PERIOD_NS / 1e9)
+    frameInfo.rawFrames['thermal'] = thermal
+    frameInfo.rgbFrames['visual'] = visual
+    frameInfo.rgbFrames['thermal'] = cv2.applyColorMap(
+        thermalRgb, cv2.COLORMAP_HOT)
+    frameInfo.metadata['timestamp_ns'] = index * FRAME_PERIOD_NS
+    frameInfo.metadata['audioEvents'] = [
+        dict(t_ns=t, rms=0.1, eventSeq=i + 1)
+        for i, t in enumerate(audioEvents or [])]
+    frameInfo.metadata['audioStrikeDetected'] = bool(audioEvents)
+    return frameInfo
+
+
+class Fixture:
+    """Frames shared by every benchmark, from a recording or synthetic."""
+
+    def __init__(self, fileName: str = None, frameCount: int = 50):
+        self.fileName = fileName
+        if fileName is None:
+            self.frameInfoList = [syntheticFrameInfo(i)
+                                  for i in range(frameCount)]
+        else:
+            with FrameInfoReader(fileName) as reader:
+                self.frameInfoList = reader[:frameCount]
+            for frameInfo in self.frameInfoList:
+                frameInfo.rgbFrames.decodeAll()
+        self.tempDir = tempfile.TemporaryDirectory()
+
+    def frames(self, key: str) -> list:
+        return [a.rgbFrames[key] for a in self.frameInfoList]
+
+    def copyFrameInfo(self, index: int) -> FrameInfo:
+        """A fresh FrameInfo over the same frames, with nothing cached."""
+        source = self.frameInfoList[index % len(self.frameInfoList)]
+        frameInfo = FrameInfo(source.timestamp)
+        frameInfo.metadata = dict(source.metadata)
+        frameInfo.rawFrames = dict(source.rawFrames)
+        for key in source.rgbFrames:
+            frameInfo.rgbFrames[key] = source.rgbFrames[key]
+        return frameInfo
+
+    def close(self):
+        self.tempDir.cleanup()
+
+
+def _cycle(itemList: list):
+    state = dict(index=0)
+
+    def nextItem():
+        item = itemList[state['index'] % len(itemList)]
+        state['index'] += 1
+        return item
+    return nextItem
+
+
+@benchmark('frames.writeFrameInfo')
+def _writeFrameInfo(fixture: Fixture):
+    writer = FrameInfoWriter(os.path.join(fixture.tempDir.name, 'write.bin'))
+    nextIndex = _cycle(range(len(fixture.frameInfoList)))
+    return lambda: writer.writeFrameInfo(fixture.copyFrameInfo(nextIndex()))
+
+
+def _openRecording(fixture: Fixture) -> FrameInfoReader:
+    fileName = os.path.join(fixture.tempDir.name, 'read.bin')
+    if not os.path.exists(fileName):
+        with FrameInfoWriter(fileName) as writer:
+            for index in range(len(fixture.frameInfoList)):
+                writer.writeFrameInfo(fixture.copyFrameInfo(index))
+    return FrameInfoReader(fileName, useMmap=True)
+
+
+def _readNext(reader: FrameInfoReader) -> FrameInfo:
+    frameInfo = reader.readFrameInfo()
+    if frameInfo is None:
+        reader.rewind()
+        frameInfo = reader.readFrameInfo()
+    return frameInfo
+
+
+@benchmark('frames.readFrameInfo')
+def _readFrameInfo(fixture: Fixture):
+    reader = _openRecording(fixture)
+    return lambda: _readNext(reader)
+
+
+@benchmark('frames.readFrameInfo+decode')
+def _readAndDecode(fixture: Fixture):
+    reader = _openRecording(fixture)
+
+    def run():
+        _readNext(reader).rgbFrames.decodeAll()
+    return run
+
+
+@benchmark('preprocess.visual')
+def _preprocessVisual(fixture: Fixture):
+    frame = np.random.default_rng(0).integers(
+        0, 256, (480, 640, 3), dtype=np.uint8)
+    visual = VisualPreprocessor(frame.shape, OUTPUT_SIZE)
+    return lambda: visual.process(frame)
+
+
+@benchmark('preprocess.thermal')
+def _preprocessThermal(fixture: Fixture):
+    frame = np.random.default_rng(0).normal(70, 3, (60, 80)) \
+        .astype(np.float32)
+    thermal = ThermalPreprocessor(frame.shape, OUTPUT_SIZE, flipCode=-1)
+    return lambda: thermal.process(frame)
+
+
+@benchmark('circles.findBrightestVisualCircles')
+def _findVisual(fixture: Fixture):
+    nextFrame = _cycle(fixture.frames('visual'))
+    return lambda: findBrightestVisualCircles(nextFrame())
+
+
+@benchmark('circles.findBrightestVisualCircles(roi)')
+def _findVisualWindow(fixture: Fixture):
+    # The window a CircleTracker searches around a ball of radius 18
+    nextFrame = _cycle(fixture.frames('visual'))
+    return lambda: findBrightestVisualCircles(
+        nextFrame(), roi=(116, 106, 204, 194))
+
+
+@benchmark('circles.findBrightestThermalCircles')
+def _findThermal(fixture: Fixture):
+    nextFrame = _cycle(fixture.frames('thermal'))
+    return lambda: findBrightestThermalCircles(nextFrame())
+
+
+@benchmark('engine.CalibrationEngine.process')
+def _calibrationProcess(fixture: Fixture):
+    eventBus = EventBus()
+    engine = CalibrationEngine()
+    state = dict(frameSeq=0)
+
+    def run():
+        # Restart once all three points are in, so every call calibrates
+        if engine.phase not in (CalibrationEngine.CalibrationPhase.POINT_1,
+                                CalibrationEngine.CalibrationPhase.POINT_2,
+                                CalibrationEngine.CalibrationPhase.POINT_3):
+            engine.start()
+        state['frameSeq'] += 1
+        frameInfo = fixture.copyFrameInfo(state['frameSeq'])
+        engine.process(eventBus, state['frameSeq'], frameInfo,
+                       FrameAnalysis(state['frameSeq'], frameInfo))
+        eventBus.pump()
+    return run
+
+
+@benchmark('engine.StrikeDetectionEngine.process')
+def _strikeProcessFrame(fixture: Fixture):
+    eventBus = EventBus()
+    engine = StrikeDetectionEngine()
+    state = dict(frameSeq=0)
+
+    def run():
+        state['frameSeq'] += 1
+        frameInfo = fixture.copyFrameInfo(state['frameSeq'])
+        engine.process(eventBus, frameInfo, IDENTITY_TRANSFORM,
+                       FrameAnalysis(state['frameSeq'], frameInfo))
+        eventBus.pump()
+    return run
+
+
+@benchmark('engine.StrikeDetectionEngine.process(strike pair)')
+def _strikeProcessPair(fixture: Fixture):
+    eventBus = EventBus()
+    engine = StrikeDetectionEngine()
+    strikeList = list()
+    eventBus.subscribe(StrikeDetectedEvent, strikeList.append)
+    strikeNs = FRAME_PERIOD_NS // 2
+    pairList = [syntheticFrameInfo(0),
+                syntheticFrameInfo(1, ballPresent=False, warmPatch=True,
+                                   audioEvents=[strikeNs])]
+
+    def run():
+        engine.reset()
+        for frameInfo in pairList:
+            engine.process(eventBus, frameInfo, IDENTITY_TRANSFORM)
+        eventBus.pump()
+
+    run()
+    if len(strikeList) != 1:
+        raise RuntimeError("Synthetic strike pair was not detected")
+    return run
+
+
+@benchmark('web.ContentManager.registerVideoFrame')
+def _registerVideoFrame(fixture: Fixture):
+    contentManager = ContentManager(Flask(__name__), encodeWorkers=0)
+    nextFrame = _cycle(fixture.frames('visual'))
+    return lambda: contentManager.registerVideoFrame('visual', nextFrame())
+
+
+@benchmark('web.ContentManager.registerVideoFrame+encode')
+def _registerAndEncode(fixture: Fixture):
+    contentManager = ContentManager(Flask(__name__), encodeWorkers=0)
+    nextFrame = _cycle(fixture.frames('visual'))
+
+    def run():
+        contentManager.registerVideoFrame('visual', nextFrame())
+        contentManager.getVideoFrame('visual')
+    return run
+
+
+def _ssePush(clientCount: int):
+    def setup(fixture: Fixture):
+        sseManager = SSEManager()
+        # Unbounded client queues, so nobody is dropped as they fill up
+        clientList = [sseManager.subscribe(maxsize=0)
+                      for _ in range(clientCount)]
+        strike = dict(visual_url='/content/image/strike-visual_00000001.jpg',
+                      thermal_url='/content/image/strike-thermal_00000001.jpg',
+                      left_score=0.25, right_score=0.75)
+
+        def run():
+            sseManager.push('strike_detected', strike)
+            if clientList[0].qsize() > 10000:
+                for index, client in enumerate(clientList):
+                    sseManager.unsubscribe(client)
+                    clientList[index] = sseManager.subscribe(maxsize=0)
+        return run
+    return setup
+
+
+for _clientCount in (1, 10, 100):
+    benchmark(f'web.SSEManager.push({_clientCount} clients)')(
+        _ssePush(_clientCount))
+
+
+def timeCalls(fn, rounds: int, minRoundSec: float) -> dict:
+    """Seconds per call of `fn` over `rounds` rounds, each long enough to
+    take at least `minRoundSec`, after a short warm-up."""
+    number, startTime = 0, perf_counter()
+    while number < 3 or perf_counter() - startTime < minRoundSec:
+        fn()
+        number += 1
+
+    roundList = list()
+    for _ in range(rounds):
+        startTime = perf_counter()
+        for _ in range(number):
+            fn()
+        roundList.append((perf_counter() - startTime) / number)
+    roundArray = np.array(roundList)
+    return dict(medianSec=float(np.median(roundArray)),
+                minSec=float(roundArray.min()),
+                meanSec=float(roundArray.mean()),
+                stdSec=float(roundArray.std()),
+                rounds=rounds, callsPerRound=number,
+                callsPerSec=float(1.0 / np.median(roundArray)))
+
+
+def runBenchmarks(fixture: Fixture, patternList: list = None,
+                  rounds: int = 5, minRoundSec: float = 0.2) -> dict:
+    resultMap = dict()
+    for name, setup in _benchmarkMap.items():
+        if patternList and not any(fnmatch.fnmatch(name, a)
+                                   for a in patternList):
+            continue
+        resultMap[name] = timeCalls(setup(fixture), rounds, minRoundSec)
+        print(f"  {name:<52} {resultMap[name]['medianSec'] * 1e6:11.1f} "
+              f"us/call", flush=True)
+    return resultMap
+
+
+def compareResults(resultMap: dict, baselineMap: dict,
+                   threshold: float) -> dict:
+    """Median time of each benchmark relative to the baseline, flagged as
+    a regression or improvement past `threshold` (e.g. 0.2 for 20%)."""
+    comparisonMap = dict()
+    for name, result in resultMap.items():
+        baseline = baselineMap.get(name)
+        if baseline is None:
+            continue
+        ratio = result['medianSec'] / baseline['medianSec']
+        status = 'regression' if ratio > 1 + threshold else \
+            'improvement' if ratio < 1 - threshold else 'unchanged'
+        comparisonMap[name] = dict(ratio=ratio, status=status)
+    return comparisonMap
+
+
+def environment() -> dict:
+    return dict(date=datetime.now().isoformat(timespec='seconds'),
+                machine=platform.machine(), node=platform.node(),
+                python=platform.python_version(), numpy=np.__version__,
+                opencv=cv2.__version__, cpuCount=os.cpu_count())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-i", "--input-recording", type=str,
+                        help="recording to take frames from "
+                        "(synthetic frames when omitted)")
+    parser.add_argument("-n", "--frames", type=int, default=50)
+    parser.add_argument("-k", "--filter", action="append",
+                        help="only run benchmarks matching this glob "
+                        "(repeatable)")
+    parser.add_argument("-r", "--rounds", type=int, default=5)
+    parser.add_argument("--min-round-sec", type=float, default=0.2)
+    parser.add_argument("-o", "--output", type=str,
+                        help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=str,
+                        help="compare against the results in this JSON file")
+    parser.add_argument("--save-baseline", type=str,
+                        help="also write the results as a new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown counted as a regression "
+                        "(default: %(default)s)")
+    args = parser.parse_args()
+
+    fixture = Fixture(args.input_recording, args.frames)
+    print(f"{len(fixture.frameInfoList)} "
+          f"{'recorded' if args.input_recording else 'synthetic'} frames")
+    try:
+        resultMap = runBenchmarks(
+            fixture, args.filter, args.rounds, args.min_round_sec)
+    finally:
+        fixture.close()
+
+    report = dict(environment=environment(),
+                  fixture=args.input_recording or 'synthetic',
+                  results=resultMap)
+    regressionList = list()
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        report['baseline'] = dict(file=args.baseline,
+                                  environment=baseline.get('environment'))
+        report['comparison'] = compareResults(
+            resultMap, baseline['results'], args.threshold)
+        print(f"against {args.baseline} "
+              f"({baseline['environment'].get('date')}):")
+        for name, comparison in report['comparison'].items():
+            print(f"  {name:<52} {comparison['ratio']:6.2f}x  "
+                  f"{comparison['status']}")
+            if comparison['status'] == 'regression':
+                regressionList.append(name)
+
+    for fileName in (args.output, args.save_baseline):
+        if fileName:
+            with open(fileName, "w") as file:
+                json.dump(report, file, indent=2)
+
+    if regressionList:
+        print(f"{len(regressionList)} regression(s) beyond "
+              f"{args.threshold:.0%}")
+        sys.exit(1)
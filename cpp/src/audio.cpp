@@ -14,8 +14,14 @@ AudioEngine::AudioEngine(Logger &logger,
     _is_running(false),
     _source(source),
     _cfg(cfg),
-    _logger(logger)
+    _logger(logger),
+    _block_count(0),
+    _event_count(0),
+    _dropped_event_count(0)
 {
+    // Created up front so get_stats() never races an insert
+    _timers["audio_block"];
+
     _thread = std::thread([this] {
         pthread_setname_np(pthread_self(), "Audio capture driver");
         iirfilt_rrrf hp = iirfilt_rrrf_create_prototype(
@@ -94,9 +100,11 @@ AudioEngine::_captureLoop(iirfilt_rrrf &hp)
     // - apply high-pass filter to remove low-frequency content (room rumble, DC)
     // - compute energy/peak metrics on the high-passed signal
     // - update noise estimate and decide whether the block contains a strike
-    TIMER_GUARD_BLOCK(_timers["audio_capture"])
     _is_running.store(true);
     while (!_source.is_eof() && _is_running.load(std::memory_order_relaxed)) {
+        TimerGuard guard(_timers["audio_block"]);
+        _block_count++;
+
         // Read a block of samples (blocking or non-blocking depending on source)
         _source.read(&(buf[0]), frameSize);
 
@@ -136,24 +144,39 @@ AudioEngine::_captureLoop(iirfilt_rrrf &hp)
             e.rms = rms;
             e.event_seq = ++eventSeq;
 
+            _event_count++;
+
             std::lock_guard<std::mutex> lk(_mtx);
-            if (_queue.size() >= _cfg.queue_size)
+            if (_queue.size() >= _cfg.queue_size) {
                 _queue.pop(); // drop oldest
+                _dropped_event_count++;
+            }
             _queue.push(e);
         }
     }
 }
 
 void
-AudioEngine::getEvents(std::vector<AudioEngine::event> &out)
+AudioEngine::getEvents(std::vector<AudioEngine::event> &out, size_t max_events)
 {
     std::lock_guard<std::mutex> lk(_mtx);
-    while (!_queue.empty()) {
+    for (size_t i = 0; i < max_events && !_queue.empty(); i++) {
         out.push_back(_queue.front());
         _queue.pop();
     }
 }
 
+void
+AudioEngine::get_stats(AudioEngine::counters &out,
+                       std::map<std::string, Timer::stats> &timers) const
+{
+    out.block_count = _block_count.load();
+    out.event_count = _event_count.load();
+    out.dropped_event_count = _dropped_event_count.load();
+    for (const auto &kv : _timers)
+        timers[kv.first] = kv.second.get_stats();
+}
+
 AudioEngine::IAudioSource::IAudioSource() :
     _sample_rate_hz(0)
 {
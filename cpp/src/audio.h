@@ -29,6 +29,12 @@ class AudioEngine {
         uint32_t event_seq; // increments each hit
     } event;
 
+    typedef struct {
+        uint64_t block_count;         // sample blocks processed
+        uint64_t event_count;         // strikes detected
+        uint64_t dropped_event_count; // events dropped from a full queue
+    } counters;
+
     class IAudioSource {
       public:
         IAudioSource();
@@ -53,8 +59,13 @@ class AudioEngine {
     // set default config values
     static void defaults(AudioEngine::config &cfg);
 
-    // retrieve all pending events
-    void getEvents(std::vector<AudioEngine::event> &out);
+    // retrieve pending events, oldest first, up to max_events of them
+    void getEvents(std::vector<AudioEngine::event> &out,
+                   size_t max_events = SIZE_MAX);
+
+    // live copy of the counters and timers, callable from any thread
+    void get_stats(counters &out,
+                   std::map<std::string, Timer::stats> &timers) const;
 
   private:
     // capture loop and helpers (camelCase names)
@@ -69,6 +80,7 @@ class AudioEngine {
     std::queue<AudioEngine::event> _queue;
     std::mutex _mtx;
     std::map<std::string, Timer> _timers;
+    std::atomic<uint64_t> _block_count, _event_count, _dropped_event_count;
 };
 
 } // namespace strikepoint
\ No newline at end of file
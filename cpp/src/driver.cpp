@@ -2,6 +2,7 @@
 #include <stdlib.h>
 
 #include <map>
+#include <mutex>
 #include <stdbool.h>
 #include <stdint.h>
 #include <stdio.h>
@@ -26,8 +27,16 @@ typedef struct {
     AudioEngine *audio_engine;
     size_t pixel_count;
     std::map<std::string, Timer> timers;
+    std::mutex timers_mutex; // guards inserts into timers
 } SessionData;
 
+Timer &
+_sessionTimer(SessionData *session, const char *func_name)
+{
+    std::lock_guard<std::mutex> lk(session->timers_mutex);
+    return session->timers[func_name];
+}
+
 int
 _errorHandler(SessionData *session,
               const char *func_name,
@@ -37,7 +46,7 @@ _errorHandler(SessionData *session,
         return -2;
 
     try {
-        TimerGuard guard(session->timers[func_name]);
+        TimerGuard guard(_sessionTimer(session, func_name));
         func();
         return 0;
     } catch (const strikepoint::bail_error &e) {
@@ -115,24 +124,43 @@ SPLIB_LogGetNextEntry(SPLIB_SessionHandle hndl,
     });
 }
 
+int
+SPLIB_LogGetEntries(SPLIB_SessionHandle hndl,
+                    SPLIB_LogEntryInfo *entries, size_t max_entries,
+                    char *buffer, size_t buffer_size, size_t *num_entries)
+{
+    SessionData *session = static_cast<SessionData *>(hndl);
+    return _errorHandler(session, __func__, [=]() {
+        if (entries == NULL)
+            BAIL("entries argument cannot be NULL");
+        if (buffer == NULL)
+            BAIL("buffer argument cannot be NULL");
+        if (num_entries == NULL)
+            BAIL("num_entries argument cannot be NULL");
+        *num_entries = session->logger->get_entries(
+            entries, max_entries, buffer, buffer_size);
+    });
+}
+
 int
 SPLIB_AudioGetEvents(SPLIB_SessionHandle hndl,
-                     uint64_t *event_times,
+                     SPLIB_AudioEvent *events,
                      size_t max_events, size_t *num_events)
 {
     SessionData *session = static_cast<SessionData *>(hndl);
     return _errorHandler(session, __func__, [=]() {
-        if (event_times == NULL)
-            BAIL("event_times argument cannot be NULL");
+        if (events == NULL)
+            BAIL("events argument cannot be NULL");
         if (num_events == NULL)
             BAIL("num_events argument cannot be NULL");
-        std::vector<AudioEngine::event> events;
-        session->audio_engine->getEvents(events);
-        *num_events = events.size();
-        if (*num_events > max_events)
-            BAIL("Max events exceeded, max=%zu, found=%zu", max_events, *num_events);
-        for (size_t i = 0; i < *num_events; ++i)
-            event_times[i] = events[i].t_ns;
+        std::vector<AudioEngine::event> pending;
+        session->audio_engine->getEvents(pending, max_events);
+        *num_events = pending.size();
+        for (size_t i = 0; i < *num_events; ++i) {
+            events[i].t_ns = pending[i].t_ns;
+            events[i].rms = pending[i].rms;
+            events[i].event_seq = pending[i].event_seq;
+        }
     });
 }
 
@@ -163,6 +191,57 @@ SPLIB_LeptonGetFrame(SPLIB_SessionHandle hndl,
     });
 }
 
+int
+SPLIB_GetStats(SPLIB_SessionHandle hndl,
+               SPLIB_DriverCounters *counters,
+               SPLIB_TimerStats *timers, size_t max_timers,
+               size_t *num_timers)
+{
+    SessionData *session = static_cast<SessionData *>(hndl);
+    return _errorHandler(session, __func__, [=]() {
+        if (counters == NULL)
+            BAIL("counters argument cannot be NULL");
+        if (timers == NULL && max_timers > 0)
+            BAIL("timers argument cannot be NULL");
+        if (num_timers == NULL)
+            BAIL("num_timers argument cannot be NULL");
+
+        LeptonDriver::counters lepton;
+        AudioEngine::counters audio;
+        std::map<std::string, Timer::stats> timerStats;
+        session->driver->get_stats(lepton, timerStats);
+        session->audio_engine->get_stats(audio, timerStats);
+        {
+            std::lock_guard<std::mutex> lk(session->timers_mutex);
+            for (const auto &kv : session->timers)
+                timerStats[kv.first] = kv.second.get_stats();
+        }
+
+        counters->frame_count = lepton.frame_count;
+        counters->overwritten_frame_count = lepton.overwritten_frame_count;
+        counters->resync_count = lepton.resync_count;
+        counters->retry_count = lepton.retry_count;
+        counters->reboot_count = lepton.reboot_count;
+        counters->stale_frame_count = lepton.stale_frame_count;
+        counters->audio_block_count = audio.block_count;
+        counters->audio_event_count = audio.event_count;
+        counters->audio_dropped_event_count = audio.dropped_event_count;
+
+        *num_timers = 0;
+        for (const auto &kv : timerStats) {
+            if (*num_timers >= max_timers)
+                break;
+            SPLIB_TimerStats &out = timers[(*num_timers)++];
+            memset(&out, 0, sizeof(out));
+            snprintf(out.name, sizeof(out.name), "%s", kv.first.c_str());
+            out.call_count = kv.second.call_count;
+            out.elapsed_real = kv.second.elapsed_real;
+            out.elapsed_user = kv.second.elapsed_user;
+            out.elapsed_sys = kv.second.elapsed_sys;
+        }
+    });
+}
+
 int
 SPLIB_Shutdown(SPLIB_SessionHandle hndl)
 {
@@ -28,6 +28,41 @@ typedef enum {
 
 extern const char *SPLIB_LOG_LEVEL_NAMES[];
 
+typedef struct {
+    int32_t level;           // SPLIB_LogLevel
+    uint32_t message_offset; // offset of the NUL-terminated message in buffer
+    uint32_t message_length; // message length, excluding the NUL
+    uint32_t reserved;
+    int64_t timestamp;       // seconds since the epoch
+} SPLIB_LogEntryInfo;
+
+typedef struct {
+    uint64_t t_ns;      // CLOCK_MONOTONIC time the strike was heard
+    float rms;          // rms of the high-pass filtered block
+    uint32_t event_seq; // increments with each detected strike
+} SPLIB_AudioEvent;
+
+typedef struct {
+    uint64_t frame_count;             // thermal frames published
+    uint64_t overwritten_frame_count; // thermal frames replaced unread
+    uint64_t resync_count;            // SPI packets skipped finding a frame
+    uint64_t retry_count;             // thermal frames abandoned mid-read
+    uint64_t reboot_count;            // camera reboots
+    uint64_t stale_frame_count;       // repeats of the previous frame
+    uint64_t audio_block_count;       // audio sample blocks processed
+    uint64_t audio_event_count;       // strikes detected
+    uint64_t audio_dropped_event_count; // strikes dropped from a full queue
+} SPLIB_DriverCounters;
+
+typedef struct {
+    char name[48];       // NUL-terminated, e.g. "SPLIB_LeptonGetFrame"
+    uint32_t call_count;
+    uint32_t reserved;
+    double elapsed_real; // seconds of wall clock time
+    double elapsed_user; // seconds of user CPU time (whole process)
+    double elapsed_sys;  // seconds of system CPU time (whole process)
+} SPLIB_TimerStats;
+
 // Create a new session
 int SPLIB_Init(SPLIB_SessionHandle *hndl_ptr,
                SPLIB_DriverInfo *info,
@@ -49,12 +84,34 @@ int SPLIB_LogGetNextEntry(SPLIB_SessionHandle hndl,
                           char *buffer,
                           size_t buffer_size);
 
-// Retrieve strike event timestamps (in ns)
+// Drain up to max_entries log entries in a single call.  Messages are
+// packed NUL-terminated into buffer and described by entries; a call that
+// returns fewer entries than requested may still leave entries pending if
+// buffer filled up, so callers drain until num_entries is zero
+int SPLIB_LogGetEntries(SPLIB_SessionHandle hndl,
+                        SPLIB_LogEntryInfo *entries,
+                        size_t max_entries,
+                        char *buffer,
+                        size_t buffer_size,
+                        size_t *num_entries);
+
+// Retrieve up to max_events pending strike events; any remaining events
+// stay queued for the next call
 int SPLIB_AudioGetEvents(SPLIB_SessionHandle hndl,
-                         uint64_t *event_times,
+                         SPLIB_AudioEvent *events,
                          size_t max_events,
                          size_t *num_events);
 
+// Snapshot the driver counters and up to max_timers timers: one per SPLIB
+// call plus the capture threads' per-frame and per-block timers.  Safe to
+// call while frames are being captured.  num_timers receives the number
+// of timers written
+int SPLIB_GetStats(SPLIB_SessionHandle hndl,
+                   SPLIB_DriverCounters *counters,
+                   SPLIB_TimerStats *timers,
+                   size_t max_timers,
+                   size_t *num_timers);
+
 // Close a session
 int SPLIB_Shutdown(SPLIB_SessionHandle hndl);
 
@@ -11,7 +11,7 @@
 #define FRAME_HEIGHT 60
 #define PACKET_SIZE (4 + 2 * FRAME_WIDTH)
 #define SPLIB_VERSION_MAJOR 2
-#define SPLIB_VERSION_MINOR 0
+#define SPLIB_VERSION_MINOR 3
 
 using namespace strikepoint;
 
@@ -29,10 +29,20 @@ LeptonDriver::LeptonDriver(Logger &logger, ILeptonImpl &impl) :
     _has_frame(false),
     _is_running(false),
     _shutdown_requested(false),
+    _frame_count(0),
+    _overwritten_frame_count(0),
+    _resync_count(0),
+    _retry_count(0),
+    _reboot_count(0),
+    _stale_frame_count(0),
     _impl(impl)
 {
     _frame_info.buffer.resize(FRAME_WIDTH * FRAME_HEIGHT);
 
+    // Create every timer up front so get_stats() can walk the map while
+    // the driver thread is running without racing an insert
+    _timers["thermal_frame"];
+
 #ifdef DEBUG
     LOG_INFO(_logger, "Lepton driver v%d.%d DEBUG initializing...",
              SPLIB_VERSION_MAJOR, SPLIB_VERSION_MINOR);
@@ -130,6 +140,23 @@ LeptonDriver::get_frame(LeptonDriver::frameInfo &frame_info)
     _has_frame.store(false);
 }
 
+/*********************************************************************
+ * get_stats - snapshot of the capture counters and timers
+ *********************************************************************/
+void
+LeptonDriver::get_stats(LeptonDriver::counters &out,
+                        std::map<std::string, Timer::stats> &timers) const
+{
+    out.frame_count = _frame_count.load();
+    out.overwritten_frame_count = _overwritten_frame_count.load();
+    out.resync_count = _resync_count.load();
+    out.retry_count = _retry_count.load();
+    out.reboot_count = _reboot_count.load();
+    out.stale_frame_count = _stale_frame_count.load();
+    for (const auto &kv : _timers)
+        timers[kv.first] = kv.second.get_stats();
+}
+
 /*********************************************************************
  * _driverMain - Driver logic main loop
  *********************************************************************/
@@ -143,9 +170,9 @@ LeptonDriver::_driver_main()
     uint32_t frame_seq = -1;
     struct timespec ts{};
 
-    TIMER_GUARD_BLOCK(_timers["thermal_capture"])
     _is_running.store(true);
     while (!_shutdown_requested.load()) {
+        TIMER_GUARD_BLOCK(_timers["thermal_frame"])
         try {
             // Make sure we don't retry forever
             if (retry_count > 20)
@@ -159,6 +186,7 @@ LeptonDriver::_driver_main()
                 if (sync_attempt_count++ > 300)
                     REBOOT("trouble syncing frame start");
                 // LOG_DEBUG(_logger, "re-sync %d/300", sync_attempt_count);
+                _resync_count++;
                 usleep(10000);
                 _impl.spi_read(raw_buffer, PACKET_SIZE);
             }
@@ -190,6 +218,8 @@ LeptonDriver::_driver_main()
             }
 
             // Check for frames not changing over ~1s of capture
+            if (matches_last_frame)
+                _stale_frame_count++;
             if (matches_last_frame && stale_frame_count++ > 27)
                 REBOOT("stale frame detected");
 
@@ -197,6 +227,9 @@ LeptonDriver::_driver_main()
             // so only update consumers when we see changes
             if (!matches_last_frame) {
                 std::lock_guard<std::mutex> lk(_frame_mutex);
+                if (_has_frame.load())
+                    _overwritten_frame_count++;
+                _frame_count++;
                 clock_gettime(CLOCK_MONOTONIC, &ts);
                 memcpy(&(_frame_info.buffer[0]), local_buffer, sizeof(local_buffer));
                 _frame_info.frame_seq = frame_seq;
@@ -210,9 +243,11 @@ LeptonDriver::_driver_main()
             LOG_WARNING(_logger, "RETRYING due to %s", e.what());
             usleep(50000);
             retry_count++;
+            _retry_count++;
         } catch (const reboot_error &e) {
             LOG_ERROR(_logger, "REBOOTING due to %s", e.what());
             _impl.reboot_camera();
+            _reboot_count++;
             memset(prev_buffer, 0, sizeof(prev_buffer));
             retry_count = 0;
         }
@@ -23,6 +23,15 @@ class LeptonDriver {
         std::vector<float> buffer; // pointer to frame buffer (in degF)
     } frameInfo;
 
+    typedef struct {
+        uint64_t frame_count;             // frames published to consumers
+        uint64_t overwritten_frame_count; // published, replaced before read
+        uint64_t resync_count;            // packets skipped finding a frame
+        uint64_t retry_count;             // frames abandoned mid-read
+        uint64_t reboot_count;            // camera reboots
+        uint64_t stale_frame_count;       // repeats of the previous frame
+    } counters;
+
     DECLARE_SPECIALIZED_BAIL_ERROR(eof_error);
     
     class ILeptonImpl {
@@ -39,6 +48,10 @@ class LeptonDriver {
     void get_driver_info(SPLIB_DriverInfo *info);
     void get_frame(frameInfo &frame_info);
 
+    // live copy of the counters and timers, callable from any thread
+    void get_stats(counters &out,
+                   std::map<std::string, Timer::stats> &timers) const;
+
   private:
     void _driver_main();
 
@@ -50,6 +63,9 @@ class LeptonDriver {
     std::atomic<bool> _is_running;
     std::atomic<bool> _shutdown_requested;
     std::map<std::string, Timer> _timers;
+    std::atomic<uint64_t> _frame_count, _overwritten_frame_count;
+    std::atomic<uint64_t> _resync_count, _retry_count;
+    std::atomic<uint64_t> _reboot_count, _stale_frame_count;
     strikepoint::Logger &_logger;
     frameInfo _frame_info;
     ILeptonImpl &_impl;
@@ -93,3 +93,42 @@ strikepoint::Logger::get_next_entry(
         _log_buffer.pop();
     }
 }
+
+size_t
+strikepoint::Logger::get_entries(SPLIB_LogEntryInfo *entries,
+                                 size_t max_entries,
+                                 char *buffer, size_t buffer_size)
+{
+    if (entries == NULL)
+        BAIL("entries pointer is NULL");
+    if (buffer == NULL)
+        BAIL("buffer pointer is NULL");
+    if (buffer_size == 0)
+        BAIL("buffer_size is zero");
+
+    std::lock_guard<std::mutex> lk(_log_mutex);
+    size_t count = 0, offset = 0;
+    while (count < max_entries && !_log_buffer.empty()) {
+        const LogEntry &entry = _log_buffer.front();
+        size_t length = entry.message.size();
+        if (offset + length + 1 > buffer_size) {
+            // Leave it for the next call unless it could never fit
+            if (count > 0)
+                break;
+            length = buffer_size - 1;
+        }
+
+        memcpy(buffer + offset, entry.message.c_str(), length);
+        buffer[offset + length] = '\0';
+        entries[count].level = entry.level;
+        entries[count].message_offset = (uint32_t) offset;
+        entries[count].message_length = (uint32_t) length;
+        entries[count].reserved = 0;
+        entries[count].timestamp = (int64_t) entry.timestamp;
+        offset += length + 1;
+        count++;
+        _log_buffer.pop();
+    }
+
+    return count;
+}
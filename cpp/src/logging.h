@@ -46,6 +46,9 @@ class Logger {
 
     void get_next_entry(int *log_level, char *buffer, size_t buffer_size);
 
+    size_t get_entries(SPLIB_LogEntryInfo *entries, size_t max_entries,
+                       char *buffer, size_t buffer_size);
+
   private:
     std::mutex _log_mutex;
     std::queue<LogEntry> _log_buffer;
@@ -15,6 +15,7 @@ Timer::Timer() :
 void
 Timer::start()
 {
+    std::lock_guard<std::mutex> lk(_mutex);
     if (_running)
         BAIL("Timer started that is already running");
 
@@ -26,6 +27,7 @@ Timer::start()
 void
 Timer::stop()
 {
+    std::lock_guard<std::mutex> lk(_mutex);
     if (!_running)
         BAIL("Timer stopped that was not running");
 
@@ -47,9 +49,17 @@ Timer::stop()
         (usage_end.ru_stime.tv_usec - _usage_start.ru_stime.tv_usec) * 1e-6;
 }
 
+Timer::stats
+Timer::get_stats() const
+{
+    std::lock_guard<std::mutex> lk(_mutex);
+    return stats{_call_count, _elapsed_real, _elapsed_user, _elapsed_sys};
+}
+
 std::string
 strikepoint::Timer::to_str() const
 {
+    std::lock_guard<std::mutex> lk(_mutex);
     char buff[256];
     snprintf(buff, sizeof(buff),
              "%7.2f/%6.3f real %7.2f/%6.3f user %7.2f/%6.3f sys (calls=%d)",
@@ -2,6 +2,7 @@
 
 #include <ctime>
 #include <map>
+#include <mutex>
 #include <string>
 #include <sys/resource.h>
 #include <utility>
@@ -10,6 +11,12 @@ namespace strikepoint {
 
 class Timer {
 
+  public:
+    typedef struct {
+        unsigned int call_count;
+        double elapsed_real, elapsed_user, elapsed_sys;
+    } stats;
+
   public:
     Timer();
 
@@ -17,6 +24,10 @@ class Timer {
     void stop();
     std::string to_str() const;
 
+    // consistent copy of the totals, safe to call while the timer runs
+    // on another thread
+    stats get_stats() const;
+
     unsigned int call_count() const { return _call_count; }
     double elapsed_real() const { return _elapsed_real; }
     double elapsed_user() const { return _elapsed_user; }
@@ -28,6 +39,7 @@ class Timer {
     double _elapsed_real, _elapsed_user, _elapsed_sys;
     unsigned int _call_count;
     bool _running;
+    mutable std::mutex _mutex;
 };
 
 class TimerGuard {
@@ -259,6 +259,35 @@ TEST(Lepton, BadFrameOneRow)
     leptonTest.finalize();
 }
 
+/*********************************************************************
+ * StatsCountRetriesAndReboots - counters and timers report the bad and
+ * stale frames seen above
+ *********************************************************************/
+TEST(Lepton, StatsCountRetriesAndReboots)
+{
+    strikepoint::Logger logger("stdout");
+    LeptonTestImpl leptonTest;
+    strikepoint::LeptonDriver leptonDriver(logger, leptonTest);
+    strikepoint::LeptonDriver::frameInfo frame_info;
+    strikepoint::LeptonDriver::counters counters;
+    std::map<std::string, Timer::stats> timers;
+
+    leptonTest.appendBadFrameOneRow(7);
+    for (int i = 0; i < 50; i++)
+        leptonTest.appendGoodFrame(50);
+    leptonDriver.get_frame(frame_info);
+    leptonTest.finalize();
+    leptonDriver.get_stats(counters, timers);
+
+    EXPECT_EQ(1, counters.retry_count);
+    EXPECT_EQ(1, counters.reboot_count);
+    EXPECT_EQ(leptonTest.rebootCount(), counters.reboot_count);
+    EXPECT_LE(1, counters.frame_count);
+    EXPECT_LE(28, counters.stale_frame_count);
+    ASSERT_EQ(1, timers.count("thermal_frame"));
+    EXPECT_LE(50, timers["thermal_frame"].call_count);
+}
+
 // TEST a single bad frame
 // TEST a bunch of bad frames in a row
 // TEST stale frames
@@ -0,0 +1,45 @@
+#include <gtest/gtest.h>
+#include <string>
+
+#include "logging.h"
+
+using namespace strikepoint;
+
+TEST(LoggerApi, GetEntriesDrainsInBulk)
+{
+    Logger logger(nullptr);
+    for (int i = 0; i < 10; i++)
+        LOG_WARNING(logger, "message %d", i);
+    EXPECT_EQ(logger.get_entries_remaining(), 10);
+
+    SPLIB_LogEntryInfo entries[4];
+    char buffer[1024];
+    size_t count = logger.get_entries(entries, 4, buffer, sizeof(buffer));
+    EXPECT_EQ(count, 4);
+    EXPECT_EQ(logger.get_entries_remaining(), 6);
+    for (size_t i = 0; i < count; i++) {
+        std::string expected = "message " + std::to_string(i);
+        EXPECT_EQ(entries[i].level, SPLIB_LOG_LEVEL_WARN);
+        EXPECT_EQ(entries[i].message_length, expected.size());
+        EXPECT_STREQ(buffer + entries[i].message_offset, expected.c_str());
+    }
+}
+
+TEST(LoggerApi, GetEntriesStopsWhenBufferIsFull)
+{
+    Logger logger(nullptr);
+    LOG_ERROR(logger, "0123456789");
+    LOG_ERROR(logger, "0123456789");
+
+    SPLIB_LogEntryInfo entries[4];
+    char buffer[16];
+    EXPECT_EQ(logger.get_entries(entries, 4, buffer, sizeof(buffer)), 1);
+    EXPECT_EQ(logger.get_entries(entries, 4, buffer, sizeof(buffer)), 1);
+    EXPECT_EQ(logger.get_entries(entries, 4, buffer, sizeof(buffer)), 0);
+
+    // A single message larger than the buffer is truncated, not stuck
+    LOG_ERROR(logger, "this message is longer than the buffer");
+    EXPECT_EQ(logger.get_entries(entries, 4, buffer, sizeof(buffer)), 1);
+    EXPECT_EQ(entries[0].message_length, sizeof(buffer) - 1);
+    EXPECT_EQ(logger.get_entries_remaining(), 0);
+}
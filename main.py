@@ -1,16 +1,16 @@
-import cv2
 import argparse
-import numpy as np
 import threading
 
-from time import monotonic
+from time import monotonic_ns
 from logging import getLogger
 from queue import Queue
-from time import monotonic
 from os import environ
 
-from strikepoint.frames import FrameInfo, FileBasedFrameInfoProvider
+from strikepoint.frames import FrameInfo, FileBasedFrameInfoProvider, \
+    TimestampedFrameRing
 from strikepoint.logging import setupLogging
+from strikepoint.preprocess import ThermalPreprocessor, VisualPreprocessor
+from strikepoint.synthetic import SyntheticFrameInfoProvider
 from strikepoint.web.app import StrikePointWebApp as StrikePointDashApp, FrameInfoProvider
 from strikepoint.driver import SplibDriver
 
@@ -24,47 +24,130 @@ IMAGE_HEIGHT = 240
 
 
 class DeviceBasedFrameInfoProvider(FrameInfoProvider):
+    """Live frames from the Lepton (via libstrikepoint) and the Pi camera.
+
+    Each sensor runs on its own acquisition thread feeding a small
+    timestamped ring, so the two capture latencies overlap instead of
+    adding up.  `getFrameInfo` returns every thermal frame in order, paired
+    with the visual frame captured closest to it in time.  If it falls
+    behind and thermal frames are overwritten, their audio events are
+    carried over to the next frame it returns, so no strike is lost.
+    """
+
+    ringSize = 4
 
     def __init__(self):
         super().__init__()
         self.picamera = Picamera2()
         self.picamera.start()
         self.splibDriver = SplibDriver(None)
-
-    def getFrameInfo(self):
-        frameInfo = FrameInfo(monotonic())
-
+        self.thermalRing = TimestampedFrameRing(self.ringSize)
+        self.visualRing = TimestampedFrameRing(self.ringSize)
+        self.lastThermalSeq = 0
+        self.thermalPreprocessor = None
+        self.visualPreprocessor = None
+        self.isRunning = True
+        self.acquisitionError = None
+
+        self.threadList = [
+            threading.Thread(
+                name=f"StrikePoint {name} acquisition", daemon=True,
+                target=self._acquisitionThreadMain, args=(target, ))
+            for name, target in (('thermal', self._acquireThermalFrame),
+                                 ('visual', self._acquireVisualFrame))]
+        for thread in self.threadList:
+            thread.start()
+
+    def close(self):
+        self.isRunning = False
+        self.thermalRing.close()
+        self.visualRing.close()
+        for thread in self.threadList:
+            thread.join()
+
+    def _acquisitionThreadMain(self, acquireFrame):
+        try:
+            while self.isRunning:
+                acquireFrame()
+        except Exception as ex:
+            logger.error(f"Frame acquisition failed: {ex}")
+            self.acquisitionError = ex
+            self.thermalRing.close()
+            self.visualRing.close()
+
+    def _acquireThermalFrame(self):
         frameWithMetadata = self.splibDriver.getFrameWithMetadata()
-        while self.splibDriver.logHasEntries():
-            level, msg = self.splibDriver.logGetNextEntry()
+        for level, _, msg in self.splibDriver.drainLogs():
             logger.log(level, f"(libstrikepoint) {msg}")
 
-        frame = frameWithMetadata.pop("frame")
-        frame = cv2.flip(frame, 0)
-        frame = cv2.flip(frame, 1)
-        frameInfo.rawFrames['thermal'] = frame
+        rawFrame = frameWithMetadata.pop("frame")
+        audioEvents = frameWithMetadata.pop("audioEvents")
+        del frameWithMetadata["audioStrikeDetected"]
+        if self.thermalPreprocessor is None:
+            self.thermalPreprocessor = ThermalPreprocessor(
+                rawFrame.shape, (IMAGE_WIDTH, IMAGE_HEIGHT), flipCode=-1)
+        # Outputs are allocated per frame rather than per ring slot: the
+        # FrameInfo built from them outlives the ring in the strike history,
+        # the web streams and the recording queue
+        rawThermal, frame = self.thermalPreprocessor.process(rawFrame)
+        self.splibDriver.releaseFrame(rawFrame)
+
+        self.thermalRing.put(frameWithMetadata['timestamp_ns'],
+                             (rawThermal, frame, frameWithMetadata),
+                             events=audioEvents)
+
+    def _acquireVisualFrame(self):
+        # Picamera2 doesn't hand back a CLOCK_MONOTONIC capture time with
+        # capture_array, so take the midpoint of the call
+        startNs = monotonic_ns()
+        frame = self.picamera.capture_array()
+        timestampNs = (startNs + monotonic_ns()) // 2
 
-        frame = cv2.resize(frame, (IMAGE_WIDTH, IMAGE_HEIGHT),
-                           interpolation=cv2.INTER_NEAREST)
-        frame = cv2.normalize(
-            frame, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-        frame = cv2.applyColorMap(frame, cv2.COLORMAP_HOT)
-        frameInfo.rgbFrames['thermal'] = frame
+        # The camera's 180 degree rotation cancels out its vertical and
+        # horizontal flips, leaving only the scale and color conversion
+        if self.visualPreprocessor is None:
+            self.visualPreprocessor = VisualPreprocessor(
+                frame.shape, (IMAGE_WIDTH, IMAGE_HEIGHT))
+        # Allocated per frame for the same reason as the thermal outputs
+        frame = self.visualPreprocessor.process(frame)
 
-        frame = self.picamera.capture_array()
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-        frame = cv2.rotate(frame, cv2.ROTATE_180)
-        frame = cv2.flip(frame, 0)
-        frame = cv2.flip(frame, 1)
-        frame = cv2.resize(frame, (IMAGE_WIDTH, IMAGE_HEIGHT),
-                           interpolation=cv2.INTER_NEAREST)
-        frameInfo.rawFrames['visual'] = frame
+        self.visualRing.put(timestampNs, frame)
 
-        frame = cv2.resize(frame, (IMAGE_WIDTH, IMAGE_HEIGHT),
-                           interpolation=cv2.INTER_NEAREST)
-        frameInfo.rgbFrames['visual'] = frame
+    def getDriverStats(self):
+        return self.splibDriver.getStats()
 
-        frameInfo.metadata.update(frameWithMetadata)
+    def getFrameInfo(self):
+        entry = self.thermalRing.waitForNext(self.lastThermalSeq)
+        if entry is None:
+            raise RuntimeError(
+                f"Frame acquisition stopped: {self.acquisitionError}")
+        thermalSeq, thermalNs, (rawThermal, thermal, metadata) = entry
+        if thermalSeq != self.lastThermalSeq + 1:
+            logger.warning(
+                f"Dropped {thermalSeq - self.lastThermalSeq - 1} thermal "
+                f"frame(s), consumer is falling behind")
+        self.lastThermalSeq = thermalSeq
+
+        # The Pi camera is much faster than the Lepton, so after the very
+        # first frame there is always a visual frame to pair with
+        visualEntry = self.visualRing.closest(thermalNs)
+        while visualEntry is None:
+            if self.visualRing.waitForNext(0) is None:
+                raise RuntimeError(
+                    f"Frame acquisition stopped: {self.acquisitionError}")
+            visualEntry = self.visualRing.closest(thermalNs)
+        _, visualNs, visual = visualEntry
+
+        frameInfo = FrameInfo(thermalNs / 1e9)
+        frameInfo.rawFrames['thermal'] = rawThermal
+        frameInfo.rgbFrames['thermal'] = thermal
+        frameInfo.rawFrames['visual'] = visual
+        frameInfo.rgbFrames['visual'] = visual
+        frameInfo.metadata.update(metadata)
+        frameInfo.metadata['visualTimestamp_ns'] = visualNs
+        audioEvents = self.thermalRing.takeEvents(thermalSeq)
+        frameInfo.metadata['audioEvents'] = audioEvents
+        frameInfo.metadata['audioStrikeDetected'] = len(audioEvents) > 0
 
         return frameInfo
 
@@ -75,6 +158,29 @@ if __name__ == "__main__":
     parser.add_argument(
         "-i", "--input-recording", type=str,
         help="use a file-based recording instead of live camera inputs")
+    parser.add_argument(
+        "--as-fast-as-possible", action="store_true",
+        help="play the input recording back without real-time pacing")
+    parser.add_argument(
+        "--recording-overflow", type=str, default="block",
+        choices=("block", "drop-oldest", "drop-newest"),
+        help="what to do when the background recording queue is full")
+    parser.add_argument(
+        "--async-events", action="store_true",
+        help="run event handlers on their own workers instead of the "
+             "capture thread")
+    parser.add_argument(
+        "--synthetic", action="store_true",
+        help="use generated frames instead of live camera inputs")
+    parser.add_argument(
+        "--synthetic-fps", type=float, default=9.0,
+        help="frame rate of the generated frames (default: %(default)s)")
+    parser.add_argument(
+        "--synthetic-unthrottled", action="store_true",
+        help="generate frames as fast as possible instead of at the fps")
+    parser.add_argument(
+        "--synthetic-size", type=str, default=f"{IMAGE_WIDTH}x{IMAGE_HEIGHT}",
+        help="WIDTHxHEIGHT of the generated frames (default: %(default)s)")
     args = parser.parse_args()
 
     logger.info("Starting StrikePoint")
@@ -87,11 +193,22 @@ if __name__ == "__main__":
     if args.input_recording:
         logger.info(f"Using recording file: {args.input_recording}")
         frameInfoProvider = FileBasedFrameInfoProvider(
-            args.input_recording, timestampScale=0.1)
+            args.input_recording, timestampScale=0.1,
+            paced=not args.as_fast_as_possible)
+    elif args.synthetic:
+        width, height = (int(a) for a in args.synthetic_size.split('x'))
+        logger.info(f"Using synthetic {width}x{height} frames at "
+                    f"{args.synthetic_fps:g} fps")
+        frameInfoProvider = SyntheticFrameInfoProvider(
+            fps=args.synthetic_fps, throttle=not args.synthetic_unthrottled,
+            visualSize=(width, height))
     else:
         from picamera2 import Picamera2
         frameInfoProvider = DeviceBasedFrameInfoProvider()
 
     threading.current_thread().name = f"StrikePoint main thread"
-    app_instance = StrikePointDashApp(frameInfoProvider, msgQueue)
+    app_instance = StrikePointDashApp(
+        frameInfoProvider, msgQueue,
+        recordingOverflowPolicy=args.recording_overflow,
+        asyncEvents=args.async_events)
     app_instance.run()
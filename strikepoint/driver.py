@@ -4,6 +4,43 @@ import ctypes.util
 import numpy as np
 
 from logging import DEBUG, INFO, WARNING, ERROR, CRITICAL
+from threading import Lock
+
+
+class FrameBufferPool:
+    """Pool of reusable, fixed-shape NumPy frame buffers.
+
+    `acquire` hands out a free buffer, allocating only when the pool has
+    run dry, and `release` hands one back for reuse.  Consumers that never
+    release a buffer simply leave it to the garbage collector, and at most
+    `size` free buffers are retained.
+    """
+
+    def __init__(self, shape: tuple, dtype=np.float32, size: int = 4):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.size = size
+        self.allocationCount = size
+        self._freeList = [np.empty(self.shape, self.dtype)
+                          for _ in range(size)]
+        self._lock = Lock()
+
+    def acquire(self) -> np.ndarray:
+        with self._lock:
+            if self._freeList:
+                return self._freeList.pop()
+            self.allocationCount += 1
+        return np.empty(self.shape, self.dtype)
+
+    def release(self, buffer: np.ndarray):
+        if buffer.shape != self.shape or buffer.dtype != self.dtype or \
+                not buffer.flags.owndata:
+            raise ValueError("Buffer was not allocated by this pool")
+        with self._lock:
+            if any(a is buffer for a in self._freeList):
+                raise ValueError("Buffer released twice")
+            if len(self._freeList) < self.size:
+                self._freeList.append(buffer)
 
 
 class SplibDriver:
@@ -17,6 +54,45 @@ class SplibDriver:
             ("frameHeight", ctypes.c_uint16),
         ]
 
+    class SPLIB_LogEntryInfo(ctypes.Structure):
+        _fields_ = [
+            ("level", ctypes.c_int32),
+            ("messageOffset", ctypes.c_uint32),
+            ("messageLength", ctypes.c_uint32),
+            ("reserved", ctypes.c_uint32),
+            ("timestamp", ctypes.c_int64),
+        ]
+
+    class SPLIB_AudioEvent(ctypes.Structure):
+        _fields_ = [
+            ("t_ns", ctypes.c_uint64),
+            ("rms", ctypes.c_float),
+            ("eventSeq", ctypes.c_uint32),
+        ]
+
+    class SPLIB_DriverCounters(ctypes.Structure):
+        _fields_ = [
+            ("frameCount", ctypes.c_uint64),
+            ("overwrittenFrameCount", ctypes.c_uint64),
+            ("resyncCount", ctypes.c_uint64),
+            ("retryCount", ctypes.c_uint64),
+            ("rebootCount", ctypes.c_uint64),
+            ("staleFrameCount", ctypes.c_uint64),
+            ("audioBlockCount", ctypes.c_uint64),
+            ("audioEventCount", ctypes.c_uint64),
+            ("audioDroppedEventCount", ctypes.c_uint64),
+        ]
+
+    class SPLIB_TimerStats(ctypes.Structure):
+        _fields_ = [
+            ("name", ctypes.c_char * 48),
+            ("callCount", ctypes.c_uint32),
+            ("reserved", ctypes.c_uint32),
+            ("elapsedReal", ctypes.c_double),
+            ("elapsedUser", ctypes.c_double),
+            ("elapsedSys", ctypes.c_double),
+        ]
+
     _logLevelMap = {
         0: DEBUG,
         1: INFO,
@@ -28,9 +104,9 @@ class SplibDriver:
     allFnNameList = [
         "SPLIB_Shutdown", "SPLIB_Init", "SPLIB_LeptonGetFrame",
         "SPLIB_LogGetNextEntry", "SPLIB_LogHasEntries",
-        "SPLIB_AudioGetEvents"]
+        "SPLIB_LogGetEntries", "SPLIB_AudioGetEvents", "SPLIB_GetStats"]
 
-    def __init__(self, logPath: str = None):
+    def __init__(self, logPath: str = None, frameBufferCount: int = 4):
         libPath = SplibDriver.find_library_path()
         lib = ctypes.CDLL(libPath)
 
@@ -46,8 +122,10 @@ class SplibDriver:
             ctypes.POINTER(ctypes.c_void_p),
             ctypes.POINTER(SplibDriver.SPLIB_DriverInfo),
             ctypes.c_char_p]
+        # The frame buffer is passed as a raw address so pooled NumPy
+        # buffers can be handed over without building a ctypes pointer
         self.fnMap["SPLIB_LeptonGetFrame"].argtypes = [
-            ctypes.c_void_p, ctypes.POINTER(ctypes.c_float),
+            ctypes.c_void_p, ctypes.c_void_p,
             ctypes.c_size_t, ctypes.POINTER(ctypes.c_uint32),
             ctypes.POINTER(ctypes.c_uint64)]
         self.fnMap["SPLIB_LogGetNextEntry"].argtypes = [
@@ -55,9 +133,17 @@ class SplibDriver:
             ctypes.c_size_t]
         self.fnMap["SPLIB_LogHasEntries"].argtypes = [
             ctypes.c_void_p, ctypes.POINTER(ctypes.c_int)]
+        self.fnMap["SPLIB_LogGetEntries"].argtypes = [
+            ctypes.c_void_p, ctypes.POINTER(SplibDriver.SPLIB_LogEntryInfo),
+            ctypes.c_size_t, ctypes.c_char_p, ctypes.c_size_t,
+            ctypes.POINTER(ctypes.c_size_t)]
         self.fnMap["SPLIB_AudioGetEvents"].argtypes = [
-            ctypes.c_void_p, ctypes.POINTER(ctypes.c_uint64),
+            ctypes.c_void_p, ctypes.POINTER(SplibDriver.SPLIB_AudioEvent),
             ctypes.c_size_t, ctypes.POINTER(ctypes.c_size_t)]
+        self.fnMap["SPLIB_GetStats"].argtypes = [
+            ctypes.c_void_p, ctypes.POINTER(SplibDriver.SPLIB_DriverCounters),
+            ctypes.POINTER(SplibDriver.SPLIB_TimerStats), ctypes.c_size_t,
+            ctypes.POINTER(ctypes.c_size_t)]
 
         info = SplibDriver.SPLIB_DriverInfo()
         self.hndl = ctypes.c_void_p()
@@ -69,39 +155,118 @@ class SplibDriver:
 
         self.frameWidth = info.framwidth
         self.frameHeight = info.frameHeight
+        self.framePool = FrameBufferPool(
+            (self.frameHeight, self.frameWidth), np.float32,
+            size=frameBufferCount)
+
+        # Bind the per-frame entry points and their output arguments once
+        self._leptonGetFrameFn = self.fnMap["SPLIB_LeptonGetFrame"]
+        self._audioGetEventsFn = self.fnMap["SPLIB_AudioGetEvents"]
+        self._eventId = ctypes.c_uint32()
+        self._eventIdRef = ctypes.byref(self._eventId)
+        self._timestampNs = ctypes.c_uint64()
+        self._timestampNsRef = ctypes.byref(self._timestampNs)
+        self._numEvents = ctypes.c_size_t()
+        self._numEventsRef = ctypes.byref(self._numEvents)
+        self._eventsBufferLen = 32
+        self._eventsBuffer = \
+            (SplibDriver.SPLIB_AudioEvent * self._eventsBufferLen)()
+        self._eventsArray = np.ctypeslib.as_array(self._eventsBuffer)
+
+        self._logGetEntriesFn = self.fnMap["SPLIB_LogGetEntries"]
+        self._logEntriesLen = 256
+        self._logEntries = \
+            (SplibDriver.SPLIB_LogEntryInfo * self._logEntriesLen)()
+        self._logEntriesArray = np.ctypeslib.as_array(self._logEntries)
+        self._logBufferLen = 64 * 1024
+        self._logBuffer = ctypes.create_string_buffer(self._logBufferLen)
+        self._numLogEntries = ctypes.c_size_t()
+        self._numLogEntriesRef = ctypes.byref(self._numLogEntries)
+
+        # The native timers are not re-entrant, so stats requests coming
+        # from several web handlers at once are serialized here
+        self._statsLock = Lock()
+        self._statsCounters = SplibDriver.SPLIB_DriverCounters()
+        self._statsTimersLen = 64
+        self._statsTimers = \
+            (SplibDriver.SPLIB_TimerStats * self._statsTimersLen)()
+        self._numStatsTimers = ctypes.c_size_t()
 
     def _makeApiCall(self, fnName: str, *args):
-        if fnName not in self.allFnNameList:
+        fn = self.fnMap.get(fnName)
+        if fn is None:
             raise RuntimeError(f"Method '{fnName}' not a valid API call")
-        rc = self.fnMap[fnName](self.hndl, *args)
+        rc = fn(self.hndl, *args)
         if rc != 0:
             raise RuntimeError(f"Call to {fnName} failed rc={rc}")
         return rc
 
     def getFrameWithMetadata(self):
-        """Get a single frame from the driver."""
-        buf = np.empty(self.frameWidth * self.frameHeight, dtype=np.float32)
-        buf_ptr = buf.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-        eventId = ctypes.c_uint32()
-        timestamp_ns = ctypes.c_uint64()
-        self._makeApiCall("SPLIB_LeptonGetFrame", buf_ptr,
-                          ctypes.c_size_t(buf.nbytes), ctypes.byref(eventId),
-                          ctypes.byref(timestamp_ns))
-        
-        bufferLen = 32
-        numEvents = ctypes.c_size_t(0)
-        eventsBuffer = (ctypes.c_uint64 * bufferLen)()
-        self._makeApiCall(
-            "SPLIB_AudioGetEvents", eventsBuffer,
-            ctypes.c_size_t(bufferLen), ctypes.byref(numEvents))
+        """Get a single frame from the driver.
+
+        The frame is taken from `framePool`; hand it back with
+        `releaseFrame` once it is no longer needed so it can be reused.
+        `audioEvents` lists every strike heard since the previous call,
+        each with the monotonic time it was heard (`t_ns`, the same clock
+        as `timestamp_ns`), its `rms` and `eventSeq`.
+        """
+        buf = self.framePool.acquire()
+        rc = self._leptonGetFrameFn(
+            self.hndl, buf.ctypes.data, buf.size,
+            self._eventIdRef, self._timestampNsRef)
+        if rc != 0:
+            self.framePool.release(buf)
+            raise RuntimeError(f"Call to SPLIB_LeptonGetFrame failed rc={rc}")
+
+        rc = self._audioGetEventsFn(
+            self.hndl, self._eventsBuffer, self._eventsBufferLen,
+            self._numEventsRef)
+        if rc != 0:
+            self.framePool.release(buf)
+            raise RuntimeError(f"Call to SPLIB_AudioGetEvents failed rc={rc}")
+
+        numEvents = self._numEvents.value
+        audioEvents = [dict(t_ns=t_ns, rms=rms, eventSeq=eventSeq)
+                       for t_ns, rms, eventSeq in
+                       self._eventsArray[:numEvents].tolist()]
 
         return {
-            "frame": buf.reshape((self.frameHeight, self.frameWidth)),
-            "eventId": eventId.value,
-            "timestamp_ns": timestamp_ns.value,
-            "audioStrikeDetected": numEvents.value > 0
+            "frame": buf,
+            "eventId": self._eventId.value,
+            "timestamp_ns": self._timestampNs.value,
+            "audioEvents": audioEvents,
+            "audioStrikeDetected": numEvents > 0
         }
 
+    def getStats(self) -> dict:
+        """Live driver counters and timers.
+
+        Counters cover the thermal capture thread (frames published or
+        overwritten before being read, SPI resyncs, retries, reboots and
+        repeated frames) and the audio thread (blocks, strikes and strikes
+        dropped from a full queue).  `timers` maps each SPLIB call and
+        capture loop to its call count and wall/user/sys seconds; user
+        and sys time are for the whole process.
+        """
+        with self._statsLock:
+            self._makeApiCall(
+                "SPLIB_GetStats", ctypes.byref(self._statsCounters),
+                self._statsTimers, self._statsTimersLen,
+                ctypes.byref(self._numStatsTimers))
+            stats = {name: getattr(self._statsCounters, name)
+                     for name, _ in self._statsCounters._fields_}
+            stats['timers'] = {
+                a.name.decode('utf8'): dict(
+                    callCount=a.callCount, realSec=a.elapsedReal,
+                    userSec=a.elapsedUser, sysSec=a.elapsedSys)
+                for a in self._statsTimers[:self._numStatsTimers.value]}
+        return stats
+
+    def releaseFrame(self, frame: np.ndarray):
+        """Return a frame from `getFrameWithMetadata` to the buffer pool.
+        """
+        self.framePool.release(frame)
+
     def shutdown(self):
         """Shutdown the driver.
         """
@@ -126,6 +291,34 @@ class SplibDriver:
             ctypes.c_size_t(bufferLen))
         return (self._logLevelMap[level.value], buffer.value.decode('utf8'))
 
+    def drainLogs(self, maxEntries: int = 4096):
+        """Drain pending log entries from the driver in bulk.
+
+        Each SPLIB call returns a batch of entries packed into one buffer,
+        so an error storm costs one round trip per batch rather than two
+        per entry.  Stops after `maxEntries` so a flood of new entries
+        cannot hold the caller indefinitely.  Returns a list of
+        (level, timestamp, message) tuples, timestamp in epoch seconds.
+        """
+        entries = list()
+        while len(entries) < maxEntries:
+            rc = self._logGetEntriesFn(
+                self.hndl, self._logEntries, self._logEntriesLen,
+                self._logBuffer, self._logBufferLen, self._numLogEntriesRef)
+            if rc != 0:
+                raise RuntimeError(f"Call to SPLIB_LogGetEntries failed rc={rc}")
+            numEntries = self._numLogEntries.value
+            if numEntries == 0:
+                break
+
+            buffer = memoryview(self._logBuffer)
+            for level, offset, length, _, timestamp in \
+                    self._logEntriesArray[:numEntries].tolist():
+                message = bytes(buffer[offset:offset + length])
+                entries.append((self._logLevelMap[level], timestamp,
+                                message.decode('utf8', errors='replace')))
+        return entries
+
     @staticmethod
     def find_library_path(name_hint="libstrikepoint.so"):
         """Search common locations for the SDK shared library; return path or None."""
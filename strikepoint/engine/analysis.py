@@ -0,0 +1,96 @@
+import cv2
+import numpy as np
+
+from functools import partial
+from threading import Lock
+
+from strikepoint.engine.params import DEFAULT_PARAMS, DetectionParams
+from strikepoint.engine.util import \
+    findBrightestThermalCircles, findBrightestVisualCircles, \
+    smoothThermalFrame, smoothVisualFrame
+
+
+class FrameAnalysis:
+    """Derived images and detections for one frame, computed on first use
+    and shared by every engine that looks at the frame.
+
+    The capture loop attaches one to each `FrameEvent`, so calibration and
+    strike detection convert, smooth and search the same image once
+    between them.  Every product is treated as read-only; engines that
+    draw on a frame must copy it first.  Circles are found with the
+    thresholds in `params`.
+    """
+
+    class Sensor:
+        """The memoized products of one sensor's rgb frame."""
+
+        def __init__(self, rgbFrames, key: str, smooth, findCircles):
+            self._rgbFrames = rgbFrames
+            self._key = key
+            self._smooth = smooth
+            self._findCircles = findCircles
+            self._gray = None
+            self._smoothed = None
+            self._circlesMap = dict()
+            self._lock = Lock()
+
+        @property
+        def frame(self) -> np.ndarray:
+            return self._rgbFrames[self._key]
+
+        @property
+        def shape(self) -> tuple:
+            return self.frame.shape
+
+        @property
+        def gray(self) -> np.ndarray:
+            with self._lock:
+                if self._gray is None:
+                    self._gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+                return self._gray
+
+        @property
+        def smoothed(self) -> np.ndarray:
+            gray = self.gray
+            with self._lock:
+                if self._smoothed is None:
+                    self._smoothed = self._smooth(gray)
+                return self._smoothed
+
+        def findCircles(self, roi: tuple = None) -> list:
+            """Brightest circles in the whole frame or in `roi`, searched
+            once per distinct window."""
+            smoothed = self.smoothed
+            with self._lock:
+                circles = self._circlesMap.get(roi)
+            if circles is None:
+                circles = self._findCircles(
+                    self.frame, roi=roi, smoothed=smoothed)
+                with self._lock:
+                    circles = self._circlesMap.setdefault(roi, circles)
+            return list(circles)
+
+    def __init__(self, frameSeq: int, frameInfo,
+                 params: DetectionParams = DEFAULT_PARAMS):
+        self.frameSeq = frameSeq
+        self.frameInfo = frameInfo
+        self.params = params
+        self.visual = FrameAnalysis.Sensor(
+            frameInfo.rgbFrames, 'visual', smoothVisualFrame,
+            partial(findBrightestVisualCircles, params=params.visualCircles))
+        self.thermal = FrameAnalysis.Sensor(
+            frameInfo.rgbFrames, 'thermal', smoothThermalFrame,
+            partial(findBrightestThermalCircles,
+                    params=params.thermalCircles))
+        self._thermalNormalized = None
+        self._lock = Lock()
+
+    @property
+    def thermalNormalized(self) -> np.ndarray:
+        """The raw thermal frame scaled to 0-255 as uint8."""
+        with self._lock:
+            if self._thermalNormalized is None:
+                self._thermalNormalized = cv2.normalize(
+                    self.frameInfo.rawFrames['thermal'], None, 0, 255,
+                    cv2.NORM_MINMAX).astype(np.uint8)
+            return self._thermalNormalized
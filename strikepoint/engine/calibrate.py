@@ -7,8 +7,8 @@ from logging import getLogger
 from typing import Any
 
 from strikepoint.events import EventBus
-from strikepoint.engine.util import \
-    findBrightestThermalCircles, findBrightestVisualCircles
+from strikepoint.engine.analysis import FrameAnalysis
+from strikepoint.engine.util import CircleTracker
 
 
 RED, GREEN, BLUE = (0, 0, 255), (0, 255, 0), (255, 0, 0)
@@ -40,19 +40,26 @@ class CalibrationEngine:
         self.phaseResultMap = dict()
         self.lastCalibFrame = -1
         self.phase = CalibrationEngine.CalibrationPhase.INACTIVE
+        self.visualTracker = CircleTracker()
+        self.thermalTracker = CircleTracker()
 
     def start(self):
+        self.visualTracker.reset()
+        self.thermalTracker.reset()
         self.runningPointList.clear()
         self.phaseResultMap.clear()
         self.lastCalibFrame = -1
         self.phase = CalibrationEngine.CalibrationPhase.POINT_1
 
-    def process(self, eventBus: EventBus, frameSeq: int, frameInfo: dict):
+    def process(self, eventBus: EventBus, frameSeq: int, frameInfo: dict,
+                analysis: FrameAnalysis = None):
         if self.phase not in (CalibrationEngine.CalibrationPhase.POINT_1,
                               CalibrationEngine.CalibrationPhase.POINT_2,
                               CalibrationEngine.CalibrationPhase.POINT_3):
             return
 
+        if analysis is None:
+            analysis = FrameAnalysis(frameSeq, frameInfo)
         visFrame = frameInfo.rgbFrames['visual'].copy()
         thermFrame = frameInfo.rgbFrames['thermal'].copy()
         radius = 3
@@ -61,13 +68,13 @@ class CalibrationEngine:
             cv2.circle(
                 visFrame, r['visPoint'], radius*r['visR'], BLUE, 1)
 
-        visCircles = findBrightestVisualCircles(visFrame)
+        visCircles = self.visualTracker.find(analysis.visual)
         if len(visCircles) > 0:
             visCircle, visR = np.array(visCircles[0][:2]), visCircles[0][2]
             cv2.circle(visFrame, visCircle, visR, GREEN, 2)
             cv2.circle(visFrame, visCircle, 2, RED, 3)
 
-        thermCircles = findBrightestThermalCircles(thermFrame)
+        thermCircles = self.thermalTracker.find(analysis.thermal)
         if len(thermCircles) > 0:
             thermCircle, thermR = np.array(
                 thermCircles[0][:2]), thermCircles[0][2]
@@ -0,0 +1,75 @@
+import cv2
+
+from dataclasses import dataclass, field, fields, replace
+
+
+@dataclass(frozen=True)
+class CircleParams:
+    """Hough transform settings for one sensor's circle finder, plus how
+    much brighter than the whole frame a circle must be to count."""
+    method: int
+    dp: float
+    minDist: float
+    param1: float
+    param2: float
+    minRadius: int
+    maxRadius: int
+    brightnessFactor: float = 1.5
+
+    def houghArgs(self) -> dict:
+        return dict(method=self.method, dp=self.dp, minDist=self.minDist,
+                    param1=self.param1, param2=self.param2,
+                    minRadius=self.minRadius, maxRadius=self.maxRadius)
+
+
+@dataclass(frozen=True)
+class StrikeParams:
+    """How a strike's thermal difference is cleaned up before scoring."""
+    clipFraction: float = 0.1   # of the peak, below which heat is ignored
+    blurKernel: int = 5         # odd Gaussian kernel size, in pixels
+    denoiseH: float = 50.0      # fastNlMeansDenoising filter strength
+
+
+@dataclass(frozen=True)
+class DetectionParams:
+    """Every tunable threshold used to find the ball and score strikes.
+
+    Frozen so one instance can be shared between engines, threads and
+    sweep workers; `withOverrides` builds variations from dotted names
+    such as "visualCircles.param2".
+    """
+    visualCircles: CircleParams = field(default_factory=lambda: CircleParams(
+        method=cv2.HOUGH_GRADIENT_ALT, dp=1.2, minDist=30, param1=100,
+        param2=0.8, minRadius=10, maxRadius=50))
+    thermalCircles: CircleParams = field(default_factory=lambda: CircleParams(
+        method=cv2.HOUGH_GRADIENT, dp=1.0, minDist=30, param1=40,
+        param2=10, minRadius=10, maxRadius=50))
+    strike: StrikeParams = field(default_factory=StrikeParams)
+
+    def withOverrides(self, **overrideMap) -> 'DetectionParams':
+        groupMap = dict()
+        for name, value in overrideMap.items():
+            groupName, _, fieldName = name.partition('.')
+            if groupName not in (a.name for a in fields(self)):
+                raise ValueError(f"Unknown parameter group '{groupName}'")
+            groupMap.setdefault(groupName, dict())[fieldName] = value
+        changeMap = dict()
+        for groupName, valueMap in groupMap.items():
+            group = getattr(self, groupName)
+            unknownList = set(valueMap) - set(a.name for a in fields(group))
+            if unknownList:
+                raise ValueError(
+                    f"Unknown parameter(s) {sorted(unknownList)} "
+                    f"in '{groupName}'")
+            changeMap[groupName] = replace(group, **valueMap)
+        return replace(self, **changeMap)
+
+    def toDict(self) -> dict:
+        """Flat {dotted name: value} map of every parameter."""
+        return {f"{group.name}.{a.name}": getattr(getattr(self, group.name),
+                                                  a.name)
+                for group in fields(self)
+                for a in fields(getattr(self, group.name))}
+
+
+DEFAULT_PARAMS = DetectionParams()
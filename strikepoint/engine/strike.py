@@ -2,10 +2,15 @@ from dataclasses import dataclass
 import cv2
 import numpy as np
 
+from collections import deque
+from concurrent.futures import Executor
 from logging import getLogger
+from time import monotonic
 from typing import Dict, Any
 
-from strikepoint.engine.util import findBrightestVisualCircles
+from strikepoint.engine.analysis import FrameAnalysis
+from strikepoint.engine.params import DEFAULT_PARAMS, DetectionParams, \
+    StrikeParams
 from strikepoint.events import EventBus
 
 RED, GREEN, BLUE = (0, 0, 255), (0, 255, 0), (255, 0, 0)
@@ -20,101 +25,270 @@ class StrikeDetectedEvent:
     diffDegF: float
     leftScore: float
     rightScore: float
+    queueDelaySec: float = 0.0
+    processingSec: float = 0.0
+    strikeNs: int = None
 
 
 class StrikeDetectionEngine:
     """Engine to detect strike events in thermal frames.
+
+    Audio strike events carry the monotonic time they were heard (`t_ns`,
+    the same clock as the thermal `timestamp_ns`), so the engine keeps a
+    fixed-size history of frames and compares the average of the
+    `beforeCount` frames captured before each strike with the average of
+    the `afterCount` frames captured at or after it.  Strikes wait until
+    enough frames have arrived after them.  Recordings without
+    `audioEvents` fall back to `audioStrikeDetected`, treating the strike
+    as lying between the flagged frame and the one before it.
+
+    The thermal sums are kept as running totals, so averaging over more
+    frames costs no extra per-frame work.  Ball detection only runs on the
+    frames a strike compares, and searches each of them in full: the ball
+    must be the only circle anywhere in the frame before the strike and
+    gone from the whole frame after it, which a tracker's windowed search
+    cannot tell.  Searches are memoized on the frame's `FrameAnalysis`, so
+    they are shared with other engines and never repeated.
+
+    `params` supplies the strike scoring thresholds, and the ball finder
+    thresholds for frames that arrive without a `FrameAnalysis`.
     """
 
-    def __init__(self):
-        self.observedSeq = list()
+    class _FrameEntry:
+        __slots__ = ('frameInfo', 'timestampNs', 'thermal', 'visual')
+
+        def __init__(self, frameInfo, timestampNs, visual):
+            self.frameInfo = frameInfo
+            self.timestampNs = timestampNs
+            self.thermal = frameInfo.rawFrames['thermal']
+            self.visual = visual
+
+        @property
+        def visCircles(self) -> list:
+            return self.visual.findCircles()
+
+    class _PendingStrike:
+        __slots__ = ('strikeNs', 'beforeEntries', 'beforeSum',
+                     'afterEntries', 'afterSum')
+
+        def __init__(self, strikeNs, beforeEntries, beforeSum):
+            self.strikeNs = strikeNs
+            self.beforeEntries = beforeEntries
+            self.beforeSum = beforeSum
+            self.afterEntries = list()
+            self.afterSum = None
+
+        def addAfter(self, entry):
+            self.afterEntries.append(entry)
+            if self.afterSum is None:
+                self.afterSum = entry.thermal.astype(np.float64)
+            else:
+                self.afterSum += entry.thermal
+
+    def __init__(self, beforeCount: int = 1, afterCount: int = 1,
+                 historySize: int = 8, executor: Executor = None,
+                 params: DetectionParams = DEFAULT_PARAMS):
+        if beforeCount < 1 or afterCount < 1:
+            raise ValueError("beforeCount and afterCount must be at least 1")
+        if historySize < beforeCount + afterCount:
+            raise ValueError(
+                "historySize must hold beforeCount + afterCount frames")
+        self.beforeCount = beforeCount
+        self.afterCount = afterCount
+        self.executor = executor
+        self.params = params
+        self.entrySeq = deque(maxlen=historySize)
+        self.reset()
 
     def reset(self):
-        self.observedSeq = list()
+        self.entrySeq.clear()
+        self.rollingSum = None
+        self.pendingStrikeList = list()
+        self.lastStrikeDetected = False
 
-    def process(self, eventBus: EventBus, frameInfo: dict, thermalVisualTransform: np.ndarray):
-        self.observedSeq.append(frameInfo)
-        while len(self.observedSeq) > 2:
-            self.observedSeq = self.observedSeq[1:]
-        if len(self.observedSeq) != 2:
-            return None
+    def process(self, eventBus: EventBus, frameInfo: dict, thermalVisualTransform: np.ndarray,
+                analysis: FrameAnalysis = None):
+        if analysis is None:
+            analysis = FrameAnalysis(None, frameInfo, self.params)
+        metadata = frameInfo.metadata
+        timestampNs = metadata.get('timestamp_ns')
+        if timestampNs is None:
+            timestampNs = round(frameInfo.timestamp * 1e9)
+        entry = self._addEntry(frameInfo, analysis, timestampNs)
+
+        if 'audioEvents' in metadata and 'timestamp_ns' in metadata:
+            strikeNsList = [a['t_ns'] for a in metadata['audioEvents']]
+        elif metadata['audioStrikeDetected'] and not self.lastStrikeDetected:
+            strikeNsList = [timestampNs]
+        else:
+            strikeNsList = list()
+        self.lastStrikeDetected = metadata['audioStrikeDetected']
+
+        # Existing strikes collect the new frame before any new strikes,
+        # which pick up everything already in the history themselves
+        for strike in self.pendingStrikeList:
+            if timestampNs >= strike.strikeNs:
+                strike.addAfter(entry)
+        for strikeNs in strikeNsList:
+            self._addStrike(strikeNs)
+
+        pendingStrikeList, self.pendingStrikeList = \
+            self.pendingStrikeList, list()
+        for strike in pendingStrikeList:
+            if len(strike.afterEntries) < self.afterCount:
+                self.pendingStrikeList.append(strike)
+            else:
+                self._processStrike(eventBus, strike, thermalVisualTransform)
+
+    def _addEntry(self, frameInfo, analysis: FrameAnalysis, timestampNs: int):
+        entry = StrikeDetectionEngine._FrameEntry(
+            frameInfo, timestampNs, analysis.visual)
+        self.entrySeq.append(entry)
+
+        # Running total over the newest beforeCount frames
+        if self.rollingSum is None or \
+                self.rollingSum.shape != entry.thermal.shape:
+            self.rollingSum = np.zeros(entry.thermal.shape, dtype=np.float64)
+            for a in list(self.entrySeq)[-self.beforeCount:]:
+                self.rollingSum += a.thermal
+        else:
+            self.rollingSum += entry.thermal
+            if len(self.entrySeq) > self.beforeCount:
+                self.rollingSum -= self.entrySeq[-self.beforeCount - 1].thermal
+        return entry
 
-        # Check whether this frame we heard something versus last
-        strikeHeardSeq = tuple(a.metadata['audioStrikeDetected']
-                               for a in self.observedSeq)
-        if strikeHeardSeq != (False, True):
+    def _addStrike(self, strikeNs: int):
+        beforeEntries = [a for a in self.entrySeq
+                         if a.timestampNs < strikeNs][-self.beforeCount:]
+        if len(beforeEntries) == 0:
+            logger.debug("Strike heard before the oldest frame, ignoring")
+            return
+
+        # Strikes reported as they happen line up with the running total;
+        # ones reported late sum their window directly
+        if beforeEntries[-1] is self.entrySeq[-1]:
+            beforeSum = self.rollingSum.copy()
+        else:
+            beforeSum = np.zeros(beforeEntries[0].thermal.shape,
+                                 dtype=np.float64)
+            for a in beforeEntries:
+                beforeSum += a.thermal
+        strike = StrikeDetectionEngine._PendingStrike(
+            strikeNs, beforeEntries, beforeSum)
+        for a in self.entrySeq:
+            if a.timestampNs >= strikeNs and \
+                    len(strike.afterEntries) < self.afterCount:
+                strike.addAfter(a)
+        self.pendingStrikeList.append(strike)
+
+    def _processStrike(self, eventBus: EventBus, strike: _PendingStrike,
+                       thermalVisualTransform: np.ndarray):
+        # The ball must be on the tee before the strike and gone after it
+        beforeCirclesList = [a.visCircles for a in strike.beforeEntries]
+        if not all(len(a) == 1 for a in beforeCirclesList):
             return None
+        if any(len(a.visCircles) == 1 for a in strike.afterEntries):
+            return None
+
+        beforeEntry = strike.beforeEntries[-1]
+
+        # Average the frames before and after the ball disappears
+        diff = (strike.afterSum / len(strike.afterEntries) -
+                strike.beforeSum / len(strike.beforeEntries))
+        diff = diff.astype(np.float32)
+
+        args = (diff, beforeEntry.frameInfo.rgbFrames['thermal'],
+                beforeEntry.frameInfo.rgbFrames['visual'],
+                beforeCirclesList[-1][0], thermalVisualTransform,
+                monotonic(), strike.strikeNs, self.params.strike)
+        if self.executor is None:
+            self._publishResult(eventBus, postProcessStrike(*args))
+        else:
+            future = self.executor.submit(postProcessStrike, *args)
+            future.add_done_callback(
+                lambda a: self._onPostProcessDone(eventBus, a))
+
+    def _onPostProcessDone(self, eventBus: EventBus, future):
+        try:
+            self._publishResult(eventBus, future.result())
+        except Exception as ex:
+            logger.error(f"Strike post-processing exception: {ex}")
+
+    def _publishResult(self, eventBus: EventBus, event: StrikeDetectedEvent):
+        # EventBus.publish is thread-safe; the event is delivered by the
+        # capture thread's next pump
+        if event is not None:
+            logger.info(
+                f"Strike post-processing waited {event.queueDelaySec:.3f}s, "
+                f"took {event.processingSec:.3f}s")
+            eventBus.publish(event)
+
+
+def postProcessStrike(diff: np.ndarray, t1: np.ndarray, v1: np.ndarray,
+                      c: tuple, thermalVisualTransform: np.ndarray,
+                      submitTime: float, strikeNs: int = None,
+                      params: StrikeParams = None) -> StrikeDetectedEvent:
+    """Render and score a confirmed strike from its thermal difference
+    `diff`, the thermal and visual rgb frames from before the strike and
+    the ball circle `c` found in the visual frame.  `strikeNs`, when the
+    time the strike was heard is known, is passed through to the event.
+    This is the slow part of detection (denoising, warps, scoring), so it
+    is kept free of engine state and can run on a worker.  Returns None if
+    there is no heat to score.
+    """
+    startTime = monotonic()
+    params = params or DEFAULT_PARAMS.strike
+
+    # Clip, clean and then denoise the image so we only see
+    # POSITIVE heat delta.  In scenarios where a ball is warmer
+    # than the scene, this is required
+    thermalDiff = np.clip(diff, diff.max()*params.clipFraction, None)
+    thermalDiff = cv2.GaussianBlur(
+        thermalDiff, (params.blurKernel, params.blurKernel), 0)
+    thermalDiff = cv2.resize(thermalDiff, t1.shape[:2][::-1],
+                             interpolation=cv2.INTER_NEAREST)
+    thermalDiff = cv2.normalize(
+        thermalDiff, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    thermalDiff = cv2.applyColorMap(thermalDiff, cv2.COLORMAP_HOT)
+    thermalDenoised = cv2.fastNlMeansDenoising(
+        thermalDiff, None, h=params.denoiseH, templateWindowSize=7,
+        searchWindowSize=21)
+
+    # Warp the thermal images to visual space
+    Hv, Wv = v1.shape[:2]
+    thermalDiffW = cv2.warpAffine(
+        thermalDiff, thermalVisualTransform, (Wv, Hv),
+        flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
+        borderValue=0)
+    thermalDenoisedW = cv2.warpAffine(
+        thermalDenoised, thermalVisualTransform, (Wv, Hv),
+        flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
+        borderValue=0)
+
+    # Build final images and compute left/right scores
+    diffGrayW = cv2.cvtColor(thermalDiffW, cv2.COLOR_RGB2GRAY)
+    visualFinal = cv2.add(v1, thermalDenoisedW)
+    diffShape = tuple(visualFinal.shape[:2][::-1])
+    leftDiff, rightDiff = diffGrayW.copy(), diffGrayW.copy()
+    cv2.rectangle(rightDiff, (0, 0), (c[0]+c[2], diffShape[1]), 0, -1, 1)
+    cv2.rectangle(leftDiff, (c[0]-c[2], 0), diffShape, 0, -1, 1)
+    totalScore = leftDiff.sum() + rightDiff.sum()
+    if totalScore > 0:
+        leftScore = leftDiff.sum() / totalScore
+        rightScore = rightDiff.sum() / totalScore
+
+        cv2.circle(
+            thermalDiffW, (int(c[0]), int(c[1])), c[2], GREEN, 2)
+        cv2.circle(visualFinal, (int(c[0]), int(c[1])), c[2], GREEN, 2)
 
-        # If the observed sequence doesn't match the expected, discard
-        localSeq = list()
-        for frameInfo, strikeHeard in zip(self.observedSeq, strikeHeardSeq):
-            visCircles = findBrightestVisualCircles(
-                frameInfo.rgbFrames['visual'])
-            foundSingleCircle = len(visCircles) == 1
-            visCircle = visCircles[0] if foundSingleCircle else None
-            localSeq.append(
-                (frameInfo, foundSingleCircle, visCircle))
-            if foundSingleCircle == strikeHeard:
-                return None
-
-        t1 = localSeq[0][0].rgbFrames['thermal']
-        v1 = localSeq[0][0].rgbFrames['visual']
-        c = localSeq[0][2]
-
-        # Based on the foundHistory config, build an average of the
-        # frames before and after the ball disappears from the frame
-        beforeFrames = list(a[0].rawFrames['thermal']
-                            for a in localSeq if a[1])
-        afterFrames = list(a[0].rawFrames['thermal']
-                           for a in localSeq if not a[1])
-        diff = ((sum(afterFrames) / len(afterFrames)) -
-                (sum(beforeFrames) / len(beforeFrames)))
-
-        # Clip, clean and then denoise the image so we only see
-        # POSITIVE heat delta.  In scenarios where a ball is warmer
-        # than the scene, this is required
-        thermalDiff = np.clip(diff, diff.max()*0.1, None)
-        thermalDiff = cv2.GaussianBlur(thermalDiff, (5, 5), 0)
-        thermalDiff = cv2.resize(thermalDiff, t1.shape[:2][::-1],
-                                 interpolation=cv2.INTER_NEAREST)
-        thermalDiff = cv2.normalize(
-            thermalDiff, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-        thermalDiff = cv2.applyColorMap(thermalDiff, cv2.COLORMAP_HOT)
-        thermalDenoised = cv2.fastNlMeansDenoising(
-            thermalDiff, None, h=50, templateWindowSize=7,
-            searchWindowSize=21)
-
-        # Warp the thermal images to visual space
-        Hv, Wv = frameInfo.rgbFrames['visual'].shape[:2]
-        thermalDiffW = cv2.warpAffine(
-            thermalDiff, thermalVisualTransform, (Wv, Hv),
-            flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
-            borderValue=0)
-        thermalDenoisedW = cv2.warpAffine(
-            thermalDenoised, thermalVisualTransform, (Wv, Hv),
-            flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
-            borderValue=0)
-
-        # Build final images and compute left/right scores
-        diffGrayW = cv2.cvtColor(thermalDiffW, cv2.COLOR_RGB2GRAY)
-        visualFinal = cv2.add(v1, thermalDenoisedW)
-        diffShape = tuple(visualFinal.shape[:2][::-1])
-        leftDiff, rightDiff = diffGrayW.copy(), diffGrayW.copy()
-        cv2.rectangle(rightDiff, (0, 0), (c[0]+c[2], diffShape[1]), 0, -1, 1)
-        cv2.rectangle(leftDiff, (c[0]-c[2], 0), diffShape, 0, -1, 1)
-        totalScore = leftDiff.sum() + rightDiff.sum()
-        if totalScore > 0:
-            leftScore = leftDiff.sum() / totalScore
-            rightScore = rightDiff.sum() / totalScore
-
-            cv2.circle(
-                thermalDiffW, (int(c[0]), int(c[1])), c[2], GREEN, 2)
-            cv2.circle(visualFinal, (int(c[0]), int(c[1])), c[2], GREEN, 2)
-
-            eventBus.publish(StrikeDetectedEvent(
-                visualImage=visualFinal,
-                thermalImage=thermalDiffW,
-                diffDegF=diff,
-                leftScore=leftScore,
-                rightScore=rightScore
-            ))
+        return StrikeDetectedEvent(
+            visualImage=visualFinal,
+            thermalImage=thermalDiffW,
+            diffDegF=diff,
+            leftScore=leftScore,
+            rightScore=rightScore,
+            queueDelaySec=startTime - submitTime,
+            processingSec=monotonic() - startTime,
+            strikeNs=strikeNs,
+        )
+    return None
@@ -1,42 +1,50 @@
 import cv2
 import numpy as np
 
+from functools import lru_cache, partial
 from logging import getLogger
 
+from strikepoint.engine.params import CircleParams, DEFAULT_PARAMS
+
 RED, GREEN, BLUE = (0, 0, 255), (0, 255, 0), (255, 0, 0)
 
 logger = getLogger("strikepoint")
 
 
-def findBrightestVisualCircles(frame):
-    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    frame = cv2.medianBlur(frame, 5)
-    circles = cv2.HoughCircles(
-        frame, cv2.HOUGH_GRADIENT_ALT, dp=1.2, minDist=30, param1=100,
-        param2=0.8, minRadius=10, maxRadius=50)
-    if circles is None:
-        return list()
+@lru_cache(maxsize=64)
+def _discMask(r: int) -> np.ndarray:
+    """Filled circle of radius `r` centered in a (2r+1) square mask."""
+    mask = np.zeros((2*r + 1, 2*r + 1), dtype=np.uint8)
+    cv2.circle(mask, (r, r), r, 255, -1)
+    mask.flags.writeable = False
+    return mask
 
-    overallMeanVal = cv2.mean(frame)[0]
-    intensityCircleList = list()
-    circles = np.round(circles[0]).astype(int)
-    for (x, y, r) in circles:
-        mask = np.zeros(frame.shape, dtype=np.uint8)
-        cv2.circle(mask, (x, y), r, 255, -1)
-        meanVal = cv2.mean(frame, mask=mask)[0]
-        if meanVal > overallMeanVal*1.5:
-            intensityCircleList.append((meanVal, (x, y, r)))
 
-    intensityCircleList.sort(key=lambda t: t[0], reverse=True)
-    return list(a[1] for a in intensityCircleList)
+def _discMean(frame, x: int, y: int, r: int) -> float:
+    """Mean of `frame` over the filled circle at (x, y), clipped to the
+    frame.  Same result as drawing the circle into a full-frame mask, but
+    only the circle's bounding box is touched.
+    """
+    x0, y0 = max(x - r, 0), max(y - r, 0)
+    x1 = min(x + r + 1, frame.shape[1])
+    y1 = min(y + r + 1, frame.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return 0.0
+    mask = _discMask(int(r))[y0 - y + r:y1 - y + r, x0 - x + r:x1 - x + r]
+    return cv2.mean(frame[y0:y1, x0:x1], mask=mask)[0]
 
 
-def findBrightestThermalCircles(frame):
-    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    frame = cv2.GaussianBlur(frame, (5, 5), sigmaX=1.5)
-    circles = cv2.HoughCircles(
-        frame, cv2.HOUGH_GRADIENT, dp=1.0, minDist=30, param1=40,
-        param2=10, minRadius=10, maxRadius=50)
+def _findBrightestCircles(frame, roi, params: CircleParams):
+    """Hough circles in `frame` (already grayscale and smoothed) that are
+    at least `params.brightnessFactor` times brighter than the whole frame,
+    brightest first.  When `roi` is given as (x0, y0, x1, y1), only that
+    window is searched, but the brightness test still compares against
+    the whole frame.
+    """
+    x0, y0, x1, y1 = roi if roi is not None else \
+        (0, 0, frame.shape[1], frame.shape[0])
+    window = frame[y0:y1, x0:x1]
+    circles = cv2.HoughCircles(window, **params.houghArgs())
     if circles is None:
         return list()
 
@@ -44,12 +52,106 @@ def findBrightestThermalCircles(frame):
     intensityCircleList = list()
     circles = np.round(circles[0]).astype(int)
     for (x, y, r) in circles:
-        mask = np.zeros(frame.shape, dtype=np.uint8)
-        cv2.circle(mask, (x, y), r, 255, -1)
-        meanVal = cv2.mean(frame, mask=mask)[0]
-        if meanVal > overallMeanVal*1.5:
-            intensityCircleList.append((meanVal, (x, y, r)))
+        meanVal = _discMean(window, x, y, r)
+        if meanVal > overallMeanVal*params.brightnessFactor:
+            intensityCircleList.append((meanVal, (x + x0, y + y0, r)))
 
     intensityCircleList.sort(key=lambda t: t[0], reverse=True)
     return list(a[1] for a in intensityCircleList)
 
+
+def smoothVisualFrame(gray):
+    return cv2.medianBlur(gray, 5)
+
+
+def smoothThermalFrame(gray):
+    return cv2.GaussianBlur(gray, (5, 5), sigmaX=1.5)
+
+
+def findBrightestVisualCircles(frame, roi=None, smoothed=None,
+                               params: CircleParams = None):
+    """Brightest circles in a BGR visual frame.  Pass `smoothed` to reuse
+    an already computed `smoothVisualFrame` of its grayscale image, and
+    `params` to override `DEFAULT_PARAMS.visualCircles`.
+    """
+    if smoothed is None:
+        smoothed = smoothVisualFrame(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    return _findBrightestCircles(
+        smoothed, roi, params or DEFAULT_PARAMS.visualCircles)
+
+
+def findBrightestThermalCircles(frame, roi=None, smoothed=None,
+                                params: CircleParams = None):
+    """Brightest circles in a colorized thermal frame.  Pass `smoothed` to
+    reuse an already computed `smoothThermalFrame` of its grayscale image,
+    and `params` to override `DEFAULT_PARAMS.thermalCircles`.
+    """
+    if smoothed is None:
+        smoothed = smoothThermalFrame(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    return _findBrightestCircles(
+        smoothed, roi, params or DEFAULT_PARAMS.thermalCircles)
+
+
+class CircleTracker:
+    """Remembers the last circle found by `findCircles` and searches a
+    small window around it first, falling back to the full frame only
+    when the window comes up empty.
+
+    The ball sits still on the tee for seconds at a time, so most frames
+    are answered from the window.  A window search only reports circles
+    inside it, so while tracking, a second bright circle elsewhere in the
+    frame goes unnoticed until the tracked one is lost.  Callers that
+    count the circles in a frame, like strike detection, must search the
+    whole frame instead.
+
+    Without `findCircles`, `find` expects a `FrameAnalysis.Sensor` and
+    uses its memoized finder, so trackers in different engines share
+    each other's searches of the same frame.
+    """
+
+    def __init__(self, findCircles=None, searchScale: float = 2.0,
+                 searchMargin: int = 8):
+        self.findCircles = findCircles
+        self.searchScale = searchScale
+        self.searchMargin = searchMargin
+        self.lastCircle = None
+        self.hitCount = 0
+        self.missCount = 0
+        self.fullFrameCount = 0
+
+    def reset(self):
+        self.lastCircle = None
+
+    def getStats(self) -> dict:
+        return dict(hitCount=self.hitCount, missCount=self.missCount,
+                    fullFrameCount=self.fullFrameCount)
+
+    def searchWindow(self, frameShape: tuple):
+        """The (x0, y0, x1, y1) window around the last circle, if any."""
+        if self.lastCircle is None:
+            return None
+        x, y, r = self.lastCircle
+        halfSize = int(self.searchScale * r) + self.searchMargin
+        height, width = frameShape[:2]
+        return (max(x - halfSize, 0), max(y - halfSize, 0),
+                min(x + halfSize, width), min(y + halfSize, height))
+
+    def find(self, frame) -> list:
+        if self.findCircles is not None:
+            findCircles = partial(self.findCircles, frame)
+        else:
+            findCircles = frame.findCircles
+
+        roi = self.searchWindow(frame.shape)
+        if roi is not None:
+            circles = findCircles(roi=roi)
+            if len(circles) > 0:
+                self.hitCount += 1
+                self.lastCircle = circles[0]
+                return circles
+            self.missCount += 1
+
+        self.fullFrameCount += 1
+        circles = findCircles()
+        self.lastCircle = circles[0] if len(circles) > 0 else None
+        return circles
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+from collections import deque
 from dataclasses import dataclass
+from enum import Enum
 from queue import Queue, Empty
+from threading import Condition, Thread, current_thread
+from time import monotonic
 from typing import Any, Callable, DefaultDict, Dict, List, Type, TypeVar
 from logging import getLogger
 
@@ -13,49 +17,235 @@ T = TypeVar("T")
 class EventBus:
     """Very small in-process pub/sub bus.
 
-    Serial/pumped contract:
+    Serial/pumped contract (the default):
     - `publish(event)` enqueues the event.
     - `pump()` processes queued events *synchronously* in FIFO order.
     - Subscribers run on the caller's thread (usually the capture loop).
 
     This makes control flow deterministic and avoids an additional dispatcher
     thread. The tradeoff is that slow subscribers will slow the pump caller.
+
+    With `asyncDispatch=True`, every subscriber instead gets its own worker
+    thread and bounded queue, `publish` hands the event straight to those
+    queues and `pump` has nothing to do.  Each subscription's
+    `DeliveryPolicy` decides what happens when its handler falls behind:
+    - LOSSLESS delivers every event, blocking the publisher when full.
+    - LATEST_ONLY keeps just the newest undelivered event.
+    - BATCH delivers everything queued as one list, blocking when full.
+    BATCH handlers always receive a list, also when pumped synchronously.
+
+    A handler that publishes an event it is itself subscribed to would
+    wait forever on its own full queue, so such events are queued past
+    `maxQueue` instead.  Handlers of different subscriptions that publish
+    to each other can still deadlock once both of their queues are full;
+    break such cycles with LATEST_ONLY or a larger `maxQueue`.
     """
 
-    def __init__(self, *, maxQueue: int = 0):
+    class DeliveryPolicy(Enum):
+        LOSSLESS = 'lossless'
+        LATEST_ONLY = 'latest-only'
+        BATCH = 'batch'
+
+    class _Subscriber:
+        """One handler's queue, worker and delivery statistics."""
+
+        def __init__(self, eventType: Type[object], handler: Callable,
+                     policy: EventBus.DeliveryPolicy, maxQueue: int):
+            self.eventType = eventType
+            self.handler = handler
+            self.policy = policy
+            self.maxQueue = 1 if policy == EventBus.DeliveryPolicy.LATEST_ONLY \
+                else maxQueue
+            self.name = f"{eventType.__name__}:" + \
+                getattr(handler, '__qualname__', repr(handler))
+            self._queue = deque()
+            self._cond = Condition()
+            self._isRunning = False
+            self._isBusy = False
+            self._thread = None
+            self.deliveredCount = 0
+            self.droppedCount = 0
+            self.errorCount = 0
+            self.maxQueueDepth = 0
+            self.totalHandlerSec = 0.0
+            self.maxHandlerSec = 0.0
+            self.totalWaitSec = 0.0
+            self.maxWaitSec = 0.0
+
+        def start(self):
+            self._isRunning = True
+            self._thread = Thread(
+                name=f"StrikePoint event handler {self.name}",
+                target=self._workerThreadMain, daemon=True)
+            self._thread.start()
+
+        def stop(self):
+            with self._cond:
+                self._isRunning = False
+                self._cond.notify_all()
+            if self._thread is not None:
+                self._thread.join()
+
+        def offer(self, event: object):
+            with self._cond:
+                while len(self._queue) >= self.maxQueue:
+                    if self.policy == EventBus.DeliveryPolicy.LATEST_ONLY:
+                        self._queue.popleft()
+                        self.droppedCount += 1
+                    elif not self._isRunning:
+                        return
+                    elif current_thread() is self._thread:
+                        # Only this worker drains the queue; waiting here
+                        # would block it forever
+                        break
+                    else:
+                        self._cond.wait()
+                self._queue.append((monotonic(), event))
+                self.maxQueueDepth = max(self.maxQueueDepth, len(self._queue))
+                self._cond.notify_all()
+
+        def deliver(self, itemList: list):
+            """Run the handler on [(publishTime, event)], on this thread."""
+            startTime = monotonic()
+            eventList = [a[1] for a in itemList]
+            try:
+                if self.policy == EventBus.DeliveryPolicy.BATCH:
+                    self.handler(eventList)
+                else:
+                    for event in eventList:
+                        self.handler(event)
+            except Exception as e:
+                self.errorCount += 1
+                logger.error(
+                    f"EventBus exception encountered processing event "
+                    f"{eventList[-1]}: {e}")
+            endTime = monotonic()
+
+            self.deliveredCount += len(itemList)
+            self.totalHandlerSec += endTime - startTime
+            self.maxHandlerSec = max(self.maxHandlerSec, endTime - startTime)
+            for publishTime, _ in itemList:
+                self.totalWaitSec += startTime - publishTime
+                self.maxWaitSec = max(self.maxWaitSec, startTime - publishTime)
+
+        def drain(self):
+            """Block until everything queued so far has been handled."""
+            with self._cond:
+                while self._queue or self._isBusy:
+                    self._cond.wait()
+
+        def getStats(self) -> dict:
+            return dict(
+                policy=self.policy.value,
+                queueDepth=len(self._queue),
+                maxQueueDepth=self.maxQueueDepth,
+                deliveredCount=self.deliveredCount,
+                droppedCount=self.droppedCount,
+                errorCount=self.errorCount,
+                meanHandlerSec=self.totalHandlerSec / max(self.deliveredCount, 1),
+                maxHandlerSec=self.maxHandlerSec,
+                meanWaitSec=self.totalWaitSec / max(self.deliveredCount, 1),
+                maxWaitSec=self.maxWaitSec,
+            )
+
+        def _workerThreadMain(self):
+            while True:
+                with self._cond:
+                    while not self._queue and self._isRunning:
+                        self._cond.wait()
+                    if not self._queue:
+                        return
+                    if self.policy == EventBus.DeliveryPolicy.BATCH:
+                        itemList = list(self._queue)
+                        self._queue.clear()
+                    else:
+                        itemList = [self._queue.popleft()]
+                    self._isBusy = True
+                    self._cond.notify_all()
+
+                self.deliver(itemList)
+                with self._cond:
+                    self._isBusy = False
+                    self._cond.notify_all()
+
+    def __init__(self, *, maxQueue: int = 0, asyncDispatch: bool = False):
+        self.asyncDispatch = asyncDispatch
         self._q: Queue[object] = Queue(maxsize=maxQueue)
         self._subs: DefaultDict[Type[object],
-                                List[Callable[[Any], None]]] = DefaultDict(list)
-
-    def subscribe(self, eventType: Type[T], handler: Callable[[T], None]) -> None:
-        self._subs[eventType].append(handler)  # type: ignore[arg-type]
+                                List[EventBus._Subscriber]] = DefaultDict(list)
+
+    def subscribe(self, eventType: Type[T], handler: Callable[[T], None],
+                  policy: DeliveryPolicy = DeliveryPolicy.LOSSLESS,
+                  maxQueue: int = 64) -> None:
+        if maxQueue < 1:
+            raise ValueError("maxQueue must be at least 1")
+        subscriber = EventBus._Subscriber(
+            eventType, handler, EventBus.DeliveryPolicy(policy), maxQueue)
+        if self.asyncDispatch:
+            subscriber.start()
+        # Copy on write, so publishers never iterate a list being changed
+        self._subs[eventType] = self._subs[eventType] + [subscriber]
 
     def unsubscribe(self, eventType: Type[T], handler: Callable[[T], None]) -> None:
-        self._subs[eventType].remove(handler)
+        subscriber = next(
+            (a for a in self._subs.get(eventType, ()) if a.handler == handler),
+            None)
+        if subscriber is None:
+            raise ValueError(
+                f"{handler!r} is not subscribed to {eventType.__name__}")
+        self._subs[eventType] = \
+            [a for a in self._subs[eventType] if a is not subscriber]
+        subscriber.stop()
 
     def publish(self, event: object) -> None:
-        self._q.put(event)
+        if not self.asyncDispatch:
+            self._q.put((monotonic(), event))
+            return
+        for subscriber in self._subs.get(type(event), ()):
+            subscriber.offer(event)
 
-    def pump(self) -> int:
+    def pump(self, maxEvents: int = None) -> int:
         """Process up to `maxEvents` queued events. Returns number processed."""
-        while not self._q.empty():
-            ev = self._q.get_nowait()
-            for handler in self._subs[type(ev)]:
-                try:
-                    handler(ev)
-                except Exception as e:
-                    logger.error(
-                        f"EventBus exception encountered processing event {ev}: {e}")
+        count = 0
+        while maxEvents is None or count < maxEvents:
+            try:
+                item = self._q.get_nowait()
+            except Empty:
+                break
+            count += 1
+            for subscriber in self._subs.get(type(item[1]), ()):
+                subscriber.deliver([item])
+        return count
+
+    def drain(self) -> None:
+        """Wait until every subscriber has handled what was published so
+        far.  Pumps first in synchronous mode."""
+        self.pump()
+        for subscriberList in list(self._subs.values()):
+            for subscriber in subscriberList:
+                subscriber.drain()
+
+    def close(self) -> None:
+        """Stop the async workers once their queues are empty."""
+        for subscriberList in list(self._subs.values()):
+            for subscriber in subscriberList:
+                subscriber.stop()
+
+    def getStats(self) -> Dict[str, dict]:
+        """Per-subscription delivery statistics, keyed by
+        "EventType:handler"."""
+        return {subscriber.name: subscriber.getStats()
+                for subscriberList in list(self._subs.values())
+                for subscriber in subscriberList}
 
 
 @dataclass(frozen=True)
 class FrameEvent:
     frameSeq: int
     frameInfo: Any
+    analysis: Any = None
 
 
 @dataclass(frozen=True)
 class LogBatchEvent:
     lines: List[str]
-
-
@@ -1,16 +1,159 @@
+import os
+import mmap
 import cv2
 import numpy as np
 
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from enum import Enum
 from logging import getLogger
+from threading import Condition, Lock, Thread
 from time import sleep, monotonic
-from struct import pack, unpack
+from struct import pack, unpack, unpack_from
 from msgpack import packb, unpackb
 
 _HEADER_MAGIC_STR = b'STRKPT25'
+_INDEX_MAGIC_STR = b'STRKIDX3'
+_FORMAT_VERSION = 3
+_SUPPORTED_FORMAT_VERSIONS = (1, 2, 3)
+
+# Format v3 records (map version 4) store a length-prefixed msgpack
+# metadata map followed by the raw frame bytes, each aligned in the file so
+# a reader can wrap them in place (e.g. straight out of a memory map)
+# without copying.  Format v1/v2 records are a single msgpack map (map
+# version 3) with the raw frame bytes embedded in it.
+_RAW_ALIGNMENT = 16
+
+# Index trailer (format v3), written after a zero-length end-of-frames
+# record: big-endian uint64 frame offsets, big-endian float64 timestamps,
+# then a fixed footer of (index offset, frame count) and the index magic
+_INDEX_FOOTER_FORMAT = ">QI"
+_INDEX_FOOTER_SIZE = 12 + len(_INDEX_MAGIC_STR)
 
 logger = getLogger("strikepoint")
 
 
+def _align(offset: int) -> int:
+    return (offset + _RAW_ALIGNMENT - 1) & ~(_RAW_ALIGNMENT - 1)
+
+
+class _DecodeCache:
+    """Small thread-safe LRU of decoded images, keyed by (record, key).
+    """
+
+    def __init__(self, maxSize: int):
+        self._maxSize = maxSize
+        self._frameMap = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, cacheKey):
+        with self._lock:
+            frame = self._frameMap.get(cacheKey)
+            if frame is not None:
+                self._frameMap.move_to_end(cacheKey)
+            return frame
+
+    def put(self, cacheKey, frame: np.ndarray):
+        with self._lock:
+            self._frameMap[cacheKey] = frame
+            self._frameMap.move_to_end(cacheKey)
+            while len(self._frameMap) > self._maxSize:
+                self._frameMap.popitem(last=False)
+
+
+def encodeJpeg(frame: np.ndarray) -> bytes:
+    ok, encoded = cv2.imencode(".jpg", frame)
+    if not ok:
+        raise RuntimeError("Failed to encode frame")
+    return encoded.tobytes()
+
+
+class RgbFrameMap(MutableMapping):
+    """Mapping of rgb frames that also caches each frame's JPEG encoding,
+    so every image is decoded and encoded at most once per frame.
+
+    Frames assigned directly (`rgbFrames[key] = frame`) behave exactly as
+    in a dict, and `getEncoded` encodes them on first request so the web
+    streams and the recording writer share the same bytes.  Frames loaded
+    from a recording are stored with `setEncoded` and decoded on demand, so
+    consumers that only look at raw frames or metadata never pay for
+    `cv2.imdecode`.  Decoded images that come from the optional shared
+    decode cache are read-only, since other FrameInfo instances may hold
+    the same array.  Frames must not be modified in place once encoded.
+    """
+
+    def __init__(self, decodeCache: _DecodeCache = None):
+        self._itemMap = dict()
+        self._decodeCache = decodeCache
+        self._lock = Lock()
+
+    def setEncoded(self, key: str, encoded: bytes, cacheKey=None):
+        """Store a JPEG-encoded frame to be decoded when first accessed."""
+        self._itemMap[key] = [None, encoded, cacheKey]
+
+    def getEncoded(self, key: str) -> bytes:
+        """The JPEG bytes for `key`, encoded on the first request only."""
+        item = self._itemMap[key]
+        if item[1] is None:
+            with self._lock:
+                if item[1] is None:
+                    item[1] = encodeJpeg(item[0])
+        return item[1]
+
+    def isEncoded(self, key: str) -> bool:
+        return self._itemMap[key][1] is not None
+
+    def isDecoded(self, key: str) -> bool:
+        return self._itemMap[key][0] is not None
+
+    def decodeAll(self):
+        """Decode every frame that is still only encoded, so later reads
+        (e.g. on another thread) find them ready."""
+        for key in list(self._itemMap):
+            self[key]
+
+    def _decode(self, key: str, item: list) -> np.ndarray:
+        _, encoded, cacheKey = item
+        cache = self._decodeCache if cacheKey is not None else None
+        if cache is not None and (frame := cache.get(cacheKey)) is not None:
+            return frame
+
+        frame = cv2.imdecode(
+            np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if frame is None:
+            raise RuntimeError(f"Failed to decode frame for key {key}")
+        if cache is not None:
+            frame.flags.writeable = False
+            cache.put(cacheKey, frame)
+        return frame
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        item = self._itemMap[key]
+        if item[0] is None:
+            with self._lock:
+                if item[0] is None:
+                    item[0] = self._decode(key, item)
+        return item[0]
+
+    def __setitem__(self, key: str, frame: np.ndarray):
+        self._itemMap[key] = [frame, None, None]
+
+    def __delitem__(self, key: str):
+        del self._itemMap[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._itemMap
+
+    def __iter__(self):
+        return iter(self._itemMap)
+
+    def __len__(self):
+        return len(self._itemMap)
+
+    def __repr__(self):
+        return f"RgbFrameMap({list(self._itemMap)})"
+
+
 class FrameInfo:
     """Container for frame information including thermal and visual frames
     and raw thermal data.
@@ -18,7 +161,7 @@ class FrameInfo:
 
     def __init__(self, timestamp: float):
         self.timestamp = timestamp
-        self.rgbFrames = dict()
+        self.rgbFrames = RgbFrameMap()
         self.rawFrames = dict()
         self.metadata = dict()
 
@@ -28,40 +171,162 @@ class FrameInfoProvider:
     def getFrameInfo(self):
         raise NotImplementedError()
 
+    def getDriverStats(self):
+        """Counters and timers from the capture hardware's driver, as
+        returned by `SplibDriver.getStats`, or None without one."""
+        return None
+
+    def close(self):
+        """Release the frame source; a blocked `getFrameInfo` may raise."""
+        pass
+
+
+class TimestampedFrameRing:
+    """Small thread-safe ring of the most recent frames from one sensor,
+    each tagged with its capture time in CLOCK_MONOTONIC nanoseconds.
+
+    An acquisition thread `put`s frames as fast as its sensor delivers
+    them, overwriting the oldest once the ring is full.  Consumers either
+    walk the frames in order with `waitForNext`, or ask for the frame
+    captured `closest` to another sensor's timestamp.
+
+    Events `put` alongside a frame (e.g. the audio strikes heard while it
+    was captured) are kept apart from the frames, so a consumer that falls
+    behind and skips overwritten frames still `takeEvents` every one of
+    them.  Events are held until taken, so a ring fed events needs a
+    consumer that takes them.
+    """
+
+    def __init__(self, size: int = 4):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self._entries = deque(maxlen=size)
+        self._pendingEvents = deque()
+        self._cond = Condition()
+        self._lastSeq = 0
+        self._isClosed = False
+
+    def put(self, timestampNs: int, frame, events: list = None) -> int:
+        """Add a frame and the events that came with it, returning its
+        sequence number (starting at 1)."""
+        with self._cond:
+            self._lastSeq += 1
+            self._entries.append((self._lastSeq, timestampNs, frame))
+            if events:
+                self._pendingEvents.extend(
+                    (self._lastSeq, a) for a in events)
+            self._cond.notify_all()
+            return self._lastSeq
+
+    def takeEvents(self, seq: int) -> list:
+        """Every event not yet taken that was `put` with frame `seq` or an
+        earlier one, including frames overwritten before they were read.
+        """
+        with self._cond:
+            eventList = list()
+            while self._pendingEvents and self._pendingEvents[0][0] <= seq:
+                eventList.append(self._pendingEvents.popleft()[1])
+            return eventList
+
+    def waitForNext(self, seq: int, timeout: float = None):
+        """Oldest (seq, timestampNs, frame) still held that is newer than
+        `seq`, waiting for one if needed.  Returns None on timeout or once
+        the ring has been closed.
+        """
+        with self._cond:
+            if not self._cond.wait_for(
+                    lambda: self._lastSeq > seq or self._isClosed, timeout):
+                return None
+            for entry in self._entries:
+                if entry[0] > seq:
+                    return entry
+            return None
+
+    def closest(self, timestampNs: int):
+        """The (seq, timestampNs, frame) captured closest to `timestampNs`,
+        or None if the ring is empty.
+        """
+        with self._cond:
+            if not self._entries:
+                return None
+            return min(self._entries, key=lambda a: abs(a[1] - timestampNs))
+
+    def close(self):
+        """Wake up any waiting consumers; later waits return immediately."""
+        with self._cond:
+            self._isClosed = True
+            self._cond.notify_all()
+
 
 class FrameInfoWriter:
+    """Writes FrameInfo records to a recording file.
+
+    Each record is a length-prefixed msgpack metadata map followed by the
+    aligned raw frame bytes.  On close, an index of every record's file
+    offset and timestamp is appended as a trailer so readers can seek
+    without scanning the whole recording.
+    """
 
     def __init__(self, fileName: str):
         self._file = open(fileName, "wb")
         self._file.write(_HEADER_MAGIC_STR)
-        self._formatVersion = 2
+        self._formatVersion = _FORMAT_VERSION
         self._file.write(pack(">I", self._formatVersion))
+        self._frameOffsets = list()
+        self._frameTimestamps = list()
 
     def writeFrameInfo(self, frameInfo: FrameInfo):
-        outputMap = dict(mapVersion=3,
+        outputMap = dict(mapVersion=4,
                          timestamp=frameInfo.timestamp,
                          rgbFrames=dict(), rawFrames=dict(),
                          metadata=frameInfo.metadata)
-        for key, frame in frameInfo.rgbFrames.items():
-            ok, encoded = cv2.imencode(".jpg", frame)
-            if not ok:
-                raise RuntimeError(f"Failed to encode frame for key {key}")
-            outputMap['rgbFrames'][key] = encoded.tobytes()
+        for key in frameInfo.rgbFrames:
+            # Reuses bytes already encoded for streaming, or still encoded
+            # from another recording, rather than encoding again
+            outputMap['rgbFrames'][key] = frameInfo.rgbFrames.getEncoded(key)
+        rawFrameList, payloadSize = list(), 0
         for key, frame in frameInfo.rawFrames.items():
             if not isinstance(frame, np.ndarray):
                 raise RuntimeError(f"rawFrames[{key}] must be a numpy array")
-            # store shape and dtype so reader can reconstruct the array
+            # store shape, dtype and payload offset so the reader can
+            # reconstruct the array over the bytes that follow the metadata
+            frame = np.ascontiguousarray(frame)
             outputMap['rawFrames'][key] = {
                 "shape": list(frame.shape),
-                "dtype": str(frame.dtype),
-                "bytes": frame.tobytes()
+                "dtype": frame.dtype.str,
+                "offset": payloadSize,
+                "nbytes": frame.nbytes
             }
-
-        frame = packb(outputMap)
-        self._file.write(pack(">I", len(frame)))
-        self._file.write(frame)
+            rawFrameList.append((payloadSize, frame))
+            payloadSize = _align(payloadSize + frame.nbytes)
+
+        meta = packb(outputMap)
+        recordOffset = self._file.tell()
+        payloadOffset = _align(recordOffset + 8 + len(meta))
+        self._frameOffsets.append(recordOffset)
+        self._frameTimestamps.append(frameInfo.timestamp)
+        self._file.write(pack(">II", payloadOffset - recordOffset - 4 +
+                              payloadSize, len(meta)))
+        self._file.write(meta)
+        for offset, frame in rawFrameList:
+            self._file.write(
+                bytes(payloadOffset + offset - self._file.tell()))
+            self._file.write(memoryview(frame).cast('B'))
+        self._file.write(
+            bytes(payloadOffset + payloadSize - self._file.tell()))
 
     def close(self):
+        if self._file.closed:
+            return
+        self._file.write(pack(">I", 0))
+        indexOffset = self._file.tell()
+        self._file.write(
+            np.asarray(self._frameOffsets, dtype=">u8").tobytes())
+        self._file.write(
+            np.asarray(self._frameTimestamps, dtype=">f8").tobytes())
+        self._file.write(pack(_INDEX_FOOTER_FORMAT,
+                              indexOffset, len(self._frameOffsets)))
+        self._file.write(_INDEX_MAGIC_STR)
         self._file.close()
 
     def __enter__(self):
@@ -71,11 +336,158 @@ class FrameInfoWriter:
         self.close()
 
 
+class BackgroundFrameInfoWriter:
+    """FrameInfoWriter that does its encoding and file IO on a dedicated
+    thread, fed by a bounded queue.
+
+    `writeFrameInfo` only enqueues the frame, so the capture loop does not
+    pay for JPEG encoding, packing or blocking writes.  When the queue is
+    full, `overflowPolicy` decides whether the caller blocks, the oldest
+    queued frame is dropped, or the new frame is dropped.  Frames must not
+    be modified after they are handed to the writer.  `writerFactory`
+    opens the FrameInfoWriter the thread writes through.
+    """
+
+    class OverflowPolicy(Enum):
+        BLOCK = 'block'
+        DROP_OLDEST = 'drop-oldest'
+        DROP_NEWEST = 'drop-newest'
+
+    def __init__(self, fileName: str, maxQueue: int = 32,
+                 overflowPolicy: OverflowPolicy = OverflowPolicy.BLOCK,
+                 writerFactory=FrameInfoWriter):
+        if maxQueue < 1:
+            raise ValueError("maxQueue must be at least 1")
+        self._writer = writerFactory(fileName)
+        self._queue = deque()
+        self._cond = Condition()
+        self._isWriting = False
+        self._isClosing = False
+        self.maxQueue = maxQueue
+        self.overflowPolicy = \
+            BackgroundFrameInfoWriter.OverflowPolicy(overflowPolicy)
+        self.writtenFrameCount = 0
+        self.droppedFrameCount = 0
+        self.errorCount = 0
+
+        self._thread = Thread(
+            name='StrikePoint recording writer',
+            target=self._writerThreadMain, daemon=True)
+        self._thread.start()
+
+    @property
+    def queueDepth(self) -> int:
+        return len(self._queue)
+
+    def getStats(self) -> dict:
+        return dict(queueDepth=self.queueDepth,
+                    writtenFrameCount=self.writtenFrameCount,
+                    droppedFrameCount=self.droppedFrameCount,
+                    errorCount=self.errorCount)
+
+    def writeFrameInfo(self, frameInfo: FrameInfo) -> bool:
+        """Queue a frame for writing.  Returns False if it was dropped.
+        """
+        policy = BackgroundFrameInfoWriter.OverflowPolicy
+        with self._cond:
+            if self._isClosing:
+                raise RuntimeError("Writer has been closed")
+            while len(self._queue) >= self.maxQueue:
+                if self.overflowPolicy == policy.DROP_NEWEST:
+                    self.droppedFrameCount += 1
+                    return False
+                if self.overflowPolicy == policy.DROP_OLDEST:
+                    self._queue.popleft()
+                    self.droppedFrameCount += 1
+                else:
+                    self._cond.wait()
+                    if self._isClosing:
+                        # The writer thread may already have drained the
+                        # queue and exited, so this frame would be lost
+                        raise RuntimeError("Writer has been closed")
+            self._queue.append(frameInfo)
+            self._cond.notify_all()
+        return True
+
+    def flush(self):
+        """Block until every queued frame has been written."""
+        with self._cond:
+            while self._queue or self._isWriting:
+                self._cond.wait()
+
+    def close(self):
+        """Write out everything still queued, then close the file."""
+        with self._cond:
+            if self._isClosing:
+                return
+            self._isClosing = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._writer.close()
+
+    def _writerThreadMain(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._isClosing:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                frameInfo = self._queue.popleft()
+                self._isWriting = True
+                self._cond.notify_all()
+
+            try:
+                self._writer.writeFrameInfo(frameInfo)
+                self.writtenFrameCount += 1
+            except Exception as ex:
+                self.errorCount += 1
+                logger.error(f"Recording writer exception: {ex}")
+
+            with self._cond:
+                self._isWriting = False
+                self._cond.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
 class FrameInfoReader:
+    """Reads FrameInfo records from a recording file.
+
+    Reading is sequential via `readFrameInfo`, but the reader also supports
+    random access: `seek`, `seekTime`, `len(reader)` and `reader[i]` /
+    `reader[i:j]`.  Random access uses the index trailer written by
+    `FrameInfoWriter`; for older recordings (or ones never closed cleanly)
+    the index is rebuilt in memory by scanning the record headers once.
+
+    With `useMmap=True` the recording is memory mapped and, for v3
+    recordings, `rawFrames` arrays are read-only views straight into the
+    mapping rather than per-frame copies.  Several processes reading the
+    same recording then share one page-cache copy of it.
+
+    `rgbFrames` are decoded lazily on first access.  A `decodeCacheSize`
+    greater than zero keeps that many decoded images across reads, which
+    helps when scrubbing back and forth over the same frames.
+    """
 
-    def __init__(self, fileName: str):
+    def __init__(self, fileName: str, useMmap: bool = False,
+                 decodeCacheSize: int = 0):
         self._file = open(fileName, "rb")
+        self._fileSize = os.fstat(self._file.fileno()).st_size
+        self._mmap, self._mmapView = None, None
+        if useMmap:
+            self._mmap = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmapView = memoryview(self._mmap)
+        self._decodeCache = \
+            _DecodeCache(decodeCacheSize) if decodeCacheSize > 0 else None
+        self._frameOffsets = None
+        self._frameTimestamps = None
         self.rewind()
+        self._dataOffset = self._offset
 
     def rewind(self):
         self._file.seek(0)
@@ -83,48 +495,209 @@ class FrameInfoReader:
         if header != _HEADER_MAGIC_STR:
             raise RuntimeError("Invalid file format")
         (formatVersion,) = unpack(">I", self._file.read(4))
-        if formatVersion not in (1, 2):
+        if formatVersion not in _SUPPORTED_FORMAT_VERSIONS:
             raise RuntimeError(
                 f"Unsupported file format version {formatVersion}")
+        self._formatVersion = formatVersion
+        self._offset = self._file.tell()
+        self._frameIndex = 0
+
+    def tell(self) -> int:
+        """Index of the frame the next `readFrameInfo` call will return."""
+        return self._frameIndex
+
+    def seek(self, frameIndex: int):
+        """Position the reader so the next read returns frame `frameIndex`.
+        """
+        self._loadIndex()
+        frameCount = len(self._frameOffsets)
+        if frameIndex < 0:
+            frameIndex += frameCount
+        if not 0 <= frameIndex <= frameCount:
+            raise IndexError(f"Frame index {frameIndex} out of range")
+        if frameIndex == frameCount:
+            self._offset = self._endOffset
+        else:
+            self._offset = int(self._frameOffsets[frameIndex])
+        self._frameIndex = frameIndex
+
+    def seekTime(self, timestamp: float) -> int:
+        """Seek to the last frame at or before `timestamp` (or the first
+        frame if `timestamp` precedes the recording).  Returns the index.
+        """
+        self._loadIndex()
+        frameIndex = int(np.searchsorted(
+            self._frameTimestamps, timestamp, side='right')) - 1
+        frameIndex = min(max(frameIndex, 0), len(self._frameOffsets))
+        self.seek(frameIndex)
+        return frameIndex
+
+    def timestamps(self) -> np.ndarray:
+        """Timestamps of every frame in the recording, in file order."""
+        self._loadIndex()
+        return self._frameTimestamps
+
+    def __len__(self):
+        self._loadIndex()
+        return len(self._frameOffsets)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(len(self)))]
+
+        offset, frameIndex = self._offset, self._frameIndex
+        try:
+            self.seek(key)
+            frameInfo = self.readFrameInfo()
+        finally:
+            self._offset, self._frameIndex = offset, frameIndex
+        if frameInfo is None:
+            raise IndexError(f"Frame index {key} out of range")
+        return frameInfo
 
-    def readFrameInfo(self) -> np.ndarray:
+    def _readRecord(self, offset: int):
+        """Read the record at `offset`, returning (data, nextOffset) or
+        (None, offset) at the end of the frame stream.  When memory mapped,
+        `data` is a zero-copy memoryview into the mapping.
+        """
+        if self._mmap is not None:
+            if offset >= self._fileSize:
+                return None, offset
+            if offset + 4 > self._fileSize:
+                raise EOFError("Unexpected end of stream")
+            (size,) = unpack_from(">I", self._mmap, offset)
+            if size == 0:
+                return None, offset
+            if offset + 4 + size > self._fileSize:
+                raise EOFError("Unexpected end of stream")
+            return self._mmapView[offset + 4:offset + 4 + size], \
+                offset + 4 + size
+
+        if self._file.tell() != offset:
+            self._file.seek(offset)
         header = self._file.read(4)
         if not header:
-            return None
-
+            return None, offset
         (size,) = unpack(">I", header)
+        if size == 0:
+            # End-of-frames marker ahead of the index trailer
+            return None, offset
         fileData = self._file.read(size)
         if len(fileData) != size:
             raise EOFError("Unexpected end of stream")
-        inputMap = unpackb(fileData)
+        return fileData, offset + 4 + size
+
+    def _loadIndex(self):
+        if self._frameOffsets is not None:
+            return
+        if not self._readIndexTrailer():
+            self._rebuildIndex()
+
+    def _readIndexTrailer(self) -> bool:
+        if self._formatVersion < 3:
+            return False
+        footerOffset = self._fileSize - _INDEX_FOOTER_SIZE
+        if footerOffset < self._dataOffset:
+            return False
+        self._file.seek(footerOffset)
+        footer = self._file.read(_INDEX_FOOTER_SIZE)
+        if footer[-len(_INDEX_MAGIC_STR):] != _INDEX_MAGIC_STR:
+            return False
+        indexOffset, frameCount = unpack(
+            _INDEX_FOOTER_FORMAT, footer[:-len(_INDEX_MAGIC_STR)])
+        if indexOffset + 16 * frameCount != footerOffset:
+            return False
+
+        self._file.seek(indexOffset)
+        indexData = self._file.read(16 * frameCount)
+        self._frameOffsets = np.frombuffer(
+            indexData, dtype=">u8", count=frameCount).astype(np.int64)
+        self._frameTimestamps = np.frombuffer(
+            indexData, dtype=">f8", offset=8 * frameCount).astype(np.float64)
+        self._endOffset = indexOffset - 4
+        return True
+
+    def _rebuildIndex(self):
+        """Scan every record once to recover offsets and timestamps, used
+        for v1/v2 recordings and v3 recordings that were never closed.
+        """
+        logger.debug("Rebuilding recording index")
+        offsets, timestamps = list(), list()
+        offset = self._dataOffset
+        while True:
+            try:
+                fileData, nextOffset = self._readRecord(offset)
+            except EOFError:
+                logger.warning("Recording ends with a truncated frame")
+                break
+            if fileData is None:
+                break
+            offsets.append(offset)
+            timestamps.append(self._unpackMeta(fileData)['timestamp'])
+            offset = nextOffset
+        self._frameOffsets = np.asarray(offsets, dtype=np.int64)
+        self._frameTimestamps = np.asarray(timestamps, dtype=np.float64)
+        self._endOffset = offset
+
+    def _unpackMeta(self, fileData):
+        if self._formatVersion < 3:
+            return unpackb(fileData)
+        (metaSize,) = unpack_from(">I", fileData, 0)
+        return unpackb(fileData[4:4 + metaSize])
+
+    def readFrameInfo(self) -> FrameInfo:
+        recordOffset = self._offset
+        fileData, self._offset = self._readRecord(recordOffset)
+        if fileData is None:
+            return None
+        self._frameIndex += 1
+
+        inputMap = self._unpackMeta(fileData)
         frameInfo = FrameInfo(inputMap['timestamp'])
+        frameInfo.rgbFrames = RgbFrameMap(self._decodeCache)
 
-        if inputMap['mapVersion'] == 3:
-            frameInfo.metadata = inputMap['metadata']
-            if inputMap['mapVersion'] == 1:
-                inputMap['rawFrames'] = dict(
-                    thermal=inputMap['thermalRawFrame'])
-            for key, data in inputMap['rgbFrames'].items():
-                encoded = np.frombuffer(data, dtype=np.uint8)
-                frame = cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
-                frameInfo.rgbFrames[key] = frame
-            for key, data in inputMap['rawFrames'].items():
-                dtype = np.dtype(data['dtype'])
+        mapVersion = inputMap['mapVersion']
+        if mapVersion not in (3, 4):
+            raise RuntimeError(
+                f"Unsupported frame info map version {mapVersion}")
+
+        frameInfo.metadata = inputMap['metadata']
+        for key, data in inputMap['rgbFrames'].items():
+            frameInfo.rgbFrames.setEncoded(
+                key, data, cacheKey=(recordOffset, key))
+        if mapVersion == 4:
+            (metaSize,) = unpack_from(">I", fileData, 0)
+            payloadOffset = _align(recordOffset + 8 + metaSize) - \
+                recordOffset - 4
+        for key, data in inputMap['rawFrames'].items():
+            dtype = np.dtype(data['dtype'])
+            if mapVersion == 4:
+                arr = np.frombuffer(
+                    fileData, dtype=dtype,
+                    count=data['nbytes'] // dtype.itemsize,
+                    offset=payloadOffset + data['offset'])
+            else:
                 arr = np.frombuffer(data['bytes'], dtype=dtype)
-                shape = tuple(data.get('shape', (arr.size,)))
-                frameInfo.rawFrames[key] = arr.reshape(shape)
-            return frameInfo
-
-        raise RuntimeError(f"Unsupported frame info map version "
-                           f"{inputMap['mapVersion']}")
+            frameInfo.rawFrames[key] = \
+                arr.reshape(tuple(data.get('shape', (arr.size,))))
+        return frameInfo
 
-    def readAllFrameInfo(self) -> list[np.ndarray]:
+    def readAllFrameInfo(self) -> list[FrameInfo]:
         frameInfoList = []
         while (frameInfo := self.readFrameInfo()) is not None:
             frameInfoList.append(frameInfo)
         return frameInfoList
 
     def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmapView.release()
+                self._mmap.close()
+            except BufferError:
+                # Frames handed out still view the mapping; it is unmapped
+                # once the last of them is garbage collected
+                logger.debug("Recording still mapped by live frames")
+            self._mmap, self._mmapView = None, None
         self._file.close()
 
     def __enter__(self):
@@ -136,29 +709,160 @@ class FrameInfoReader:
 
 class FileBasedFrameInfoProvider(FrameInfoProvider):
     """A fake thermal driver that reads frames from a binary file.
+
+    A prefetch thread reads, unpacks and JPEG-decodes up to
+    `prefetchCount` frames ahead of playback, so `getFrameInfo` only waits
+    out the time until the next frame is due.  At the end of the file the
+    thread rewinds on its own and playback carries on from the first frame
+    one frame period after the last, as if the recording were continuous.
+    With `paced=False` frames are handed out as fast as they are asked
+    for; otherwise they follow the recording's timestamps, with each wait
+    scaled by `timestampScale`.
     """
 
-    def __init__(self, fileName: str, timestampScale: float = 1.0):
+    def __init__(self, fileName: str, timestampScale: float = 1.0,
+                 paced: bool = True, prefetchCount: int = 8):
+        if prefetchCount < 1:
+            raise ValueError("prefetchCount must be at least 1")
         self.reader = FrameInfoReader(fileName)
         self.timestampScale = timestampScale
+        self.paced = paced
+        self.prefetchCount = prefetchCount
         self.lastFrameTimestamp = None
         self.lastLocalTimestamp = None
+        self.loopCount = 0
+
+        # The prefetch thread owns the reader except while a seek, which
+        # holds `_readerLock`, moves it.  Each seek bumps `_generation` so
+        # frames read from the old position are never handed out.
+        self._readerLock = Lock()
+        self._queue = deque()
+        self._cond = Condition()
+        self._generation = 0
+        self._loopOffset = 0.0
+        self._previousTimestamp = None
+        # Gaps between the most recent frames read back to back, for the
+        # gap between loops; asking the reader would scan the whole of a
+        # recording without an index before the first frame
+        self._frameGapList = deque(maxlen=256)
+        self._error = None
+        self._isClosing = False
+
+        self._thread = Thread(
+            name='StrikePoint recording prefetch',
+            target=self._prefetchThreadMain, daemon=True)
+        self._thread.start()
+
+    @property
+    def queueDepth(self) -> int:
+        return len(self._queue)
+
+    def seek(self, frameIndex: int):
+        """Jump playback to `frameIndex`, restarting real-time pacing there.
+        """
+        with self._readerLock:
+            self.reader.seek(frameIndex)
+            self._restart()
+
+    def seekTime(self, timestamp: float) -> int:
+        """Jump playback to the frame at or before `timestamp`."""
+        with self._readerLock:
+            frameIndex = self.reader.seekTime(timestamp)
+            self._restart()
+        return frameIndex
+
+    def _restart(self):
+        """Drop everything prefetched; called with `_readerLock` held."""
+        self._loopOffset = 0.0
+        self._previousTimestamp = None
+        with self._cond:
+            self._generation += 1
+            self._queue.clear()
+            self.lastFrameTimestamp = None
+            self._cond.notify_all()
 
     def getFrameInfo(self):
+        with self._cond:
+            while not self._queue:
+                if self._error is not None:
+                    raise RuntimeError(
+                        f"Unable to read recording: {self._error}")
+                if self._isClosing:
+                    raise RuntimeError("Provider has been closed")
+                self._cond.wait()
+            playbackTimestamp, frameInfo = self._queue.popleft()
+            self._cond.notify_all()
+            if not self.paced:
+                return frameInfo
+            if self.lastFrameTimestamp is None:
+                self.lastFrameTimestamp = playbackTimestamp
+                self.lastLocalTimestamp = monotonic()
+            fileDuration = playbackTimestamp - self.lastFrameTimestamp
+            lastLocalTimestamp = self.lastLocalTimestamp
+
+        localDuration = monotonic() - lastLocalTimestamp
+        durationDelta = self.timestampScale * (fileDuration - localDuration)
+        if durationDelta > 0:
+            sleep(durationDelta)
+        return frameInfo
+
+    def close(self):
+        """Stop prefetching and close the recording."""
+        with self._cond:
+            if self._isClosing:
+                return
+            self._isClosing = True
+            self._queue.clear()
+            self._cond.notify_all()
+        self._thread.join()
+        self.reader.close()
+
+    def _readNext(self):
+        """Read and fully decode the next frame, looping at the end of the
+        file.  Returns (playback timestamp, frameInfo); called with
+        `_readerLock` held.
+        """
         frameInfo = self.reader.readFrameInfo()
         if frameInfo is None:
             self.reader.rewind()
             frameInfo = self.reader.readFrameInfo()
-            self.lastFrameTimestamp = None
+            if frameInfo is None:
+                raise RuntimeError("Recording has no frames")
+            if self._previousTimestamp is not None:
+                loopGap = float(np.median(self._frameGapList)) \
+                    if self._frameGapList else 0.0
+                self._loopOffset += self._previousTimestamp + \
+                    loopGap - frameInfo.timestamp
+            self.loopCount += 1
             logger.debug("Rewound recording file")
-        if self.lastFrameTimestamp is None:
-            self.lastFrameTimestamp = frameInfo.timestamp
-            self.lastLocalTimestamp = monotonic()
-            frameInfo = self.reader.readFrameInfo()
-
-        localDuration = monotonic() - self.lastLocalTimestamp
-        fileDuration = frameInfo.timestamp - self.lastFrameTimestamp
-        durationDelta = self.timestampScale * (fileDuration - localDuration)
-        if durationDelta > 0:
-            sleep(durationDelta)
-        return frameInfo
+        elif self._previousTimestamp is not None:
+            self._frameGapList.append(
+                frameInfo.timestamp - self._previousTimestamp)
+        self._previousTimestamp = frameInfo.timestamp
+        frameInfo.rgbFrames.decodeAll()
+        return frameInfo.timestamp + self._loopOffset, frameInfo
+
+    def _prefetchThreadMain(self):
+        while True:
+            with self._cond:
+                while len(self._queue) >= self.prefetchCount and \
+                        not self._isClosing:
+                    self._cond.wait()
+                if self._isClosing:
+                    return
+
+            try:
+                with self._readerLock:
+                    generation = self._generation
+                    entry = self._readNext()
+            except Exception as ex:
+                logger.exception("Failed to prefetch recording frame")
+                with self._cond:
+                    self._error = ex
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                if generation == self._generation and not self._isClosing:
+                    self._queue.append(entry)
+                    self._cond.notify_all()
@@ -0,0 +1,148 @@
+import numpy as np
+
+from collections import deque
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic, perf_counter
+
+
+class RollingHistogram:
+    """Durations recorded over the last `windowSec` seconds, summarized on
+    request as count, rate and p50/p95/p99.
+
+    Recording only appends to a bounded deque, so it is cheap enough for
+    every stage of every frame; the percentiles are computed when someone
+    asks for them.  Lifetime count and sum are kept as well, for
+    Prometheus-style counters.
+    """
+
+    def __init__(self, windowSec: float = 60.0, maxSamples: int = 4096):
+        self.windowSec = windowSec
+        self._sampleSeq = deque(maxlen=maxSamples)
+        self._lock = Lock()
+        self.totalCount = 0
+        self.totalSec = 0.0
+
+    def record(self, seconds: float, now: float = None):
+        now = monotonic() if now is None else now
+        with self._lock:
+            self._sampleSeq.append((now, seconds))
+            self.totalCount += 1
+            self.totalSec += seconds
+
+    def getStats(self, now: float = None) -> dict:
+        now = monotonic() if now is None else now
+        with self._lock:
+            while self._sampleSeq and \
+                    self._sampleSeq[0][0] < now - self.windowSec:
+                self._sampleSeq.popleft()
+            sampleList = list(self._sampleSeq)
+            totalCount, totalSec = self.totalCount, self.totalSec
+
+        stats = dict(count=len(sampleList), rate=0.0, mean=0.0, p50=0.0,
+                     p95=0.0, p99=0.0, max=0.0, totalCount=totalCount,
+                     totalSec=totalSec)
+        if sampleList:
+            values = np.array([a[1] for a in sampleList])
+            p50, p95, p99 = np.percentile(values, (50, 95, 99))
+            # Rate over the span actually covered, once the window has
+            # some history, so a fresh start doesn't read as a burst
+            spanSec = max(now - sampleList[0][0], 1.0)
+            stats.update(rate=len(sampleList) / min(spanSec, self.windowSec),
+                         mean=float(values.mean()), p50=float(p50),
+                         p95=float(p95), p99=float(p99),
+                         max=float(values.max()))
+        return stats
+
+
+class MetricsRegistry:
+    """Named rolling histograms for the stages of the frame pipeline.
+    """
+
+    def __init__(self, windowSec: float = 60.0, maxSamples: int = 4096):
+        self.windowSec = windowSec
+        self.maxSamples = maxSamples
+        self._histogramMap = dict()
+        self._lock = Lock()
+
+    def histogram(self, name: str) -> RollingHistogram:
+        with self._lock:
+            histogram = self._histogramMap.get(name)
+            if histogram is None:
+                histogram = RollingHistogram(self.windowSec, self.maxSamples)
+                self._histogramMap[name] = histogram
+            return histogram
+
+    def record(self, name: str, seconds: float):
+        self.histogram(name).record(seconds)
+
+    @contextmanager
+    def time(self, name: str):
+        """Record how long the `with` block takes under `name`."""
+        startTime = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - startTime)
+
+    def getStats(self) -> dict:
+        with self._lock:
+            histogramList = sorted(self._histogramMap.items())
+        now = monotonic()
+        return {name: histogram.getStats(now)
+                for name, histogram in histogramList}
+
+    def toPrometheus(self, prefix: str = 'strikepoint',
+                     gaugeMap: dict = None, counterMap: dict = None) -> str:
+        """Prometheus text exposition: each histogram as a summary of
+        `<prefix>_stage_seconds` labelled by stage, plus its recent rate.
+        `gaugeMap` adds `<prefix>_<name>` gauges, each given as a plain
+        value or as a list of (labelMap, value) pairs.  `counterMap` adds
+        counters the same way; their names should end in `_total`.
+        """
+        lineList = [
+            f"# HELP {prefix}_stage_seconds Time spent in each pipeline "
+            f"stage over the last {self.windowSec:g}s",
+            f"# TYPE {prefix}_stage_seconds summary"]
+        statsMap = self.getStats()
+        for name, stats in statsMap.items():
+            label = f'stage="{_escapeLabel(name)}"'
+            for quantile in ('0.5', '0.95', '0.99'):
+                key = 'p' + quantile[2:].ljust(2, '0')
+                lineList.append(
+                    f'{prefix}_stage_seconds{{{label},quantile="{quantile}"}} '
+                    f'{stats[key]:.9g}')
+            lineList.append(
+                f"{prefix}_stage_seconds_sum{{{label}}} "
+                f"{stats['totalSec']:.9g}")
+            lineList.append(
+                f"{prefix}_stage_seconds_count{{{label}}} "
+                f"{stats['totalCount']}")
+
+        lineList += [
+            f"# HELP {prefix}_stage_rate Stage executions per second over "
+            f"the last {self.windowSec:g}s",
+            f"# TYPE {prefix}_stage_rate gauge"]
+        for name, stats in statsMap.items():
+            lineList.append(
+                f'{prefix}_stage_rate{{stage="{_escapeLabel(name)}"}} '
+                f"{stats['rate']:.9g}")
+
+        metricList = \
+            [(a, b, 'gauge') for a, b in (gaugeMap or dict()).items()] + \
+            [(a, b, 'counter') for a, b in (counterMap or dict()).items()]
+        for name, valueList, metricType in metricList:
+            lineList.append(f"# TYPE {prefix}_{name} {metricType}")
+            if not isinstance(valueList, list):
+                valueList = [(dict(), valueList)]
+            for labelMap, value in valueList:
+                label = ",".join(f'{k}="{_escapeLabel(str(v))}"'
+                                 for k, v in labelMap.items())
+                label = f"{{{label}}}" if label else ""
+                lineList.append(f"{prefix}_{name}{label} {value:.9g}")
+        return "\n".join(lineList) + "\n"
+
+
+def _escapeLabel(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
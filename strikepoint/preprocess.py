@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+
+
+def _nearestIndices(srcLength: int, dstLength: int) -> np.ndarray:
+    """Source index cv2.resize(INTER_NEAREST) picks for each output index.
+    """
+    indices = np.arange(srcLength, dtype=np.float32).reshape(1, -1)
+    return cv2.resize(indices, (dstLength, 1),
+                      interpolation=cv2.INTER_NEAREST)[0]
+
+
+class VisualPreprocessor:
+    """Orients, scales and color-converts camera frames in two passes.
+
+    The flips and scale are folded into a single nearest-neighbor remap
+    table built once for the camera's frame shape, which is followed by an
+    in-place RGB to BGR conversion.  `flipCode` follows `cv2.flip`, with
+    None meaning no flip.  Results are bit-identical to running the
+    equivalent chain of `cv2.flip` and `cv2.resize(INTER_NEAREST)` calls.
+    """
+
+    def __init__(self, inputShape: tuple, outputSize: tuple,
+                 flipCode: int = None):
+        inputHeight, inputWidth = inputShape[:2]
+        outputWidth, outputHeight = outputSize
+        colMap = _nearestIndices(inputWidth, outputWidth)
+        rowMap = _nearestIndices(inputHeight, outputHeight)
+        if flipCode is not None and flipCode != 0:
+            colMap = inputWidth - 1 - colMap
+        if flipCode is not None and flipCode <= 0:
+            rowMap = inputHeight - 1 - rowMap
+
+        self.inputShape = tuple(inputShape)
+        self.outputSize = outputSize
+        mapX, mapY = np.meshgrid(colMap, rowMap)
+        self._map, _ = cv2.convertMaps(
+            mapX, mapY, cv2.CV_16SC2, nninterpolation=True)
+
+    def process(self, frame: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """Preprocess an RGB camera frame into a BGR frame of `outputSize`,
+        written into `out` when given.
+        """
+        if frame.shape != self.inputShape:
+            raise ValueError(
+                f"Expected a frame of shape {self.inputShape}, "
+                f"got {frame.shape}")
+        out = cv2.remap(frame, self._map, None, cv2.INTER_NEAREST, dst=out)
+        return cv2.cvtColor(out, cv2.COLOR_RGB2BGR, dst=out)
+
+
+class ThermalPreprocessor:
+    """Orients the raw thermal frame and renders its false-color image.
+
+    This is still four passes (flip, normalize, colormap, resize) rather
+    than one remap, but normalization and the colormap are per-pixel, so
+    they are applied at the sensor's native resolution and only the
+    finished 8-bit image is upscaled.  With nearest-neighbor upscaling every source pixel still
+    appears in the output, so the min/max used for normalization and the
+    resulting image are identical to colorizing after the resize.
+    """
+
+    def __init__(self, inputShape: tuple, outputSize: tuple,
+                 flipCode: int = None,
+                 colorMap: int = cv2.COLORMAP_HOT):
+        self.inputShape = tuple(inputShape)
+        self.outputSize = outputSize
+        self.flipCode = flipCode
+        self.colorMap = colorMap
+        self._normalized = np.empty(self.inputShape, dtype=np.float32)
+        self._gray = np.empty(self.inputShape, dtype=np.uint8)
+        self._colored = np.empty(self.inputShape + (3, ), dtype=np.uint8)
+
+    def process(self, frame: np.ndarray, rawOut: np.ndarray = None,
+                rgbOut: np.ndarray = None) -> tuple:
+        """Returns (raw, rgb): the oriented raw frame and its colorized
+        image at `outputSize`, written into `rawOut` and `rgbOut` when given.
+        Both are otherwise freshly allocated, since callers keep them.
+        """
+        if frame.shape != self.inputShape:
+            raise ValueError(
+                f"Expected a frame of shape {self.inputShape}, "
+                f"got {frame.shape}")
+        if self.flipCode is not None:
+            raw = cv2.flip(frame, self.flipCode, dst=rawOut)
+        elif rawOut is not None:
+            np.copyto(rawOut, frame)
+            raw = rawOut
+        else:
+            raw = frame.copy()
+
+        cv2.normalize(raw, self._normalized, 0, 255, cv2.NORM_MINMAX,
+                      dtype=cv2.CV_32F)
+        np.copyto(self._gray, self._normalized, casting='unsafe')
+        cv2.applyColorMap(self._gray, self.colorMap, dst=self._colored)
+        rgb = cv2.resize(self._colored, self.outputSize, dst=rgbOut,
+                         interpolation=cv2.INTER_NEAREST)
+        return raw, rgb
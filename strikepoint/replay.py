@@ -0,0 +1,234 @@
+"""Replays recordings through strike detection as fast as the CPU allows.
+
+Frames go straight from the recording to the engines, with no real-time
+pacing and no web encoding, and several recordings are replayed at once
+on a process pool.  Detected strikes and their scores are written as JSON
+and optionally CSV.
+
+Run from the repository root:
+    python -m strikepoint.replay recording.bin [...] -o strikes.json
+"""
+import argparse
+import csv
+import json
+import numpy as np
+import os
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from logging import getLogger
+from time import perf_counter
+
+from strikepoint.events import EventBus
+from strikepoint.frames import FrameInfoReader
+from strikepoint.engine.analysis import FrameAnalysis
+from strikepoint.engine.calibrate import CalibrationEngine, \
+    CalibrationProgressEvent
+from strikepoint.engine.params import DEFAULT_PARAMS, DetectionParams
+from strikepoint.engine.strike import StrikeDetectionEngine, \
+    StrikeDetectedEvent
+
+logger = getLogger("strikepoint")
+
+CSV_FIELD_LIST = ['recording', 'strikeIndex', 'frameIndex', 'timestamp',
+                  'strikeNs', 'leftScore', 'rightScore', 'processingSec']
+
+
+class ReplayRunner:
+    """Feeds one recording's frames through the engines on the calling
+    thread, collecting every strike detected.
+
+    With `calibrate`, the recording is expected to start with a
+    calibration session: frames go to a `CalibrationEngine` until it
+    produces a transform, and strike detection runs on the frames after
+    that.  Otherwise `thermalVisualTransform` is used from the first frame.
+    Frames are analyzed with the thresholds in `params`.
+    """
+
+    def __init__(self, thermalVisualTransform: np.ndarray = None,
+                 calibrate: bool = False, beforeCount: int = 1,
+                 afterCount: int = 1,
+                 params: DetectionParams = DEFAULT_PARAMS):
+        if thermalVisualTransform is None and not calibrate:
+            raise ValueError(
+                "Either a thermal-visual transform or calibrate is required")
+        self.thermalVisualTransform = None if calibrate else \
+            np.asarray(thermalVisualTransform, dtype=np.float32)
+        self.params = params
+        self.calibrationEngine = None
+        if calibrate:
+            self.calibrationEngine = CalibrationEngine()
+            self.calibrationEngine.start()
+        self.strikeEngine = StrikeDetectionEngine(
+            beforeCount=beforeCount, afterCount=afterCount,
+            historySize=max(8, beforeCount + afterCount), params=params)
+        self.eventBus = EventBus()
+        self.eventBus.subscribe(
+            CalibrationProgressEvent, self._onCalibrationProgress)
+        self.eventBus.subscribe(StrikeDetectedEvent, self._onStrikeDetected)
+        self.frameIndex = -1
+        self.frameInfo = None
+        self.strikeList = list()
+
+    def _onCalibrationProgress(self, event: CalibrationProgressEvent):
+        if event.thermalVisualTransform is not None:
+            logger.info(f"Calibrated at frame {self.frameIndex}")
+            self.thermalVisualTransform = event.thermalVisualTransform
+            self.calibrationEngine = None
+
+    def _onStrikeDetected(self, event: StrikeDetectedEvent):
+        self.strikeList.append(dict(
+            strikeIndex=len(self.strikeList),
+            frameIndex=self.frameIndex,
+            timestamp=self.frameInfo.timestamp,
+            strikeNs=event.strikeNs,
+            leftScore=float(event.leftScore),
+            rightScore=float(event.rightScore),
+            processingSec=event.processingSec,
+        ))
+
+    def processFrame(self, frameInfo):
+        self.frameIndex += 1
+        self.frameInfo = frameInfo
+        analysis = FrameAnalysis(self.frameIndex, frameInfo, self.params)
+        if self.calibrationEngine is not None:
+            self.calibrationEngine.process(
+                self.eventBus, self.frameIndex, frameInfo, analysis)
+        elif self.thermalVisualTransform is not None:
+            self.strikeEngine.process(
+                self.eventBus, frameInfo, self.thermalVisualTransform,
+                analysis)
+        self.eventBus.pump()
+
+    def run(self, fileName: str, maxFrames: int = None) -> dict:
+        """Replay `fileName` and return its strikes along with frame count,
+        timing and the transform used."""
+        startTime = perf_counter()
+        with FrameInfoReader(fileName, useMmap=True) as reader:
+            while maxFrames is None or self.frameIndex + 1 < maxFrames:
+                frameInfo = reader.readFrameInfo()
+                if frameInfo is None:
+                    break
+                self.processFrame(frameInfo)
+        elapsedSec = perf_counter() - startTime
+
+        frameCount = self.frameIndex + 1
+        transform = self.thermalVisualTransform
+        return dict(
+            recording=fileName,
+            frameCount=frameCount,
+            elapsedSec=elapsedSec,
+            framesPerSec=frameCount / elapsedSec if elapsedSec > 0 else 0.0,
+            thermalVisualTransform=None if transform is None
+            else np.asarray(transform).tolist(),
+            strikes=self.strikeList,
+        )
+
+
+def replayRecording(fileName: str, thermalVisualTransform=None,
+                    calibrate: bool = False, beforeCount: int = 1,
+                    afterCount: int = 1, maxFrames: int = None,
+                    params: DetectionParams = DEFAULT_PARAMS) -> dict:
+    """Replay one recording, see `ReplayRunner`.  Module level so it can be
+    handed to a process pool."""
+    runner = ReplayRunner(thermalVisualTransform, calibrate=calibrate,
+                          beforeCount=beforeCount, afterCount=afterCount,
+                          params=params)
+    return runner.run(fileName, maxFrames=maxFrames)
+
+
+def replayRecordings(fileNameList: list, jobs: int = None,
+                     **kwargs) -> list:
+    """Replay every recording on a pool of `jobs` processes (one per core
+    by default), returning results in the order given.  A recording that
+    fails gets an `error` entry instead of stopping the others."""
+    resultMap = dict()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futureMap = {
+            executor.submit(replayRecording, fileName, **kwargs): fileName
+            for fileName in fileNameList}
+        for future in as_completed(futureMap):
+            fileName = futureMap[future]
+            try:
+                resultMap[fileName] = future.result()
+            except Exception as ex:
+                logger.error(f"Replay of {fileName} failed: {ex}")
+                resultMap[fileName] = dict(
+                    recording=fileName, error=str(ex), strikes=list())
+    return [resultMap[a] for a in fileNameList]
+
+
+def writeStrikesCsv(fileName: str, resultList: list):
+    with open(fileName, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_FIELD_LIST)
+        writer.writeheader()
+        for result in resultList:
+            for strike in result['strikes']:
+                writer.writerow(dict(recording=result['recording'], **strike))
+
+
+def loadTransform(fileName: str = None) -> np.ndarray:
+    """The 2x3 thermal-visual transform stored as JSON in `fileName`, or
+    the latest one saved by the web app when no file is given."""
+    if fileName is not None:
+        with open(fileName) as file:
+            return np.array(json.load(file), dtype=np.float32)
+
+    from strikepoint.database import Database
+    transform = Database().loadLatestTransform()
+    if transform is None:
+        raise RuntimeError(
+            "No calibration saved; pass --transform or --calibrate")
+    return transform
+
+
+def main(argList: list = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m strikepoint.replay",
+        description="Replay recordings through strike detection")
+    parser.add_argument(
+        "recordings", nargs="+", help="recording files to replay")
+    parser.add_argument(
+        "-o", "--output", type=str, default="strikes.json",
+        help="JSON file to write results to (default: %(default)s)")
+    parser.add_argument(
+        "--csv", type=str, help="also write one CSV row per strike")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(),
+        help="recordings to replay in parallel (default: %(default)s)")
+    parser.add_argument(
+        "-t", "--transform", type=str,
+        help="JSON file holding the 2x3 thermal-visual transform "
+        "(default: the latest calibration in the database)")
+    parser.add_argument(
+        "--calibrate", action="store_true",
+        help="calibrate from the start of each recording instead")
+    parser.add_argument("--before-count", type=int, default=1)
+    parser.add_argument("--after-count", type=int, default=1)
+    parser.add_argument(
+        "-n", "--max-frames", type=int,
+        help="stop each recording after this many frames")
+    args = parser.parse_args(argList)
+
+    transform = None if args.calibrate else loadTransform(args.transform)
+    resultList = replayRecordings(
+        args.recordings, jobs=args.jobs, thermalVisualTransform=transform,
+        calibrate=args.calibrate, beforeCount=args.before_count,
+        afterCount=args.after_count, maxFrames=args.max_frames)
+
+    with open(args.output, "w") as file:
+        json.dump(resultList, file, indent=2)
+    if args.csv:
+        writeStrikesCsv(args.csv, resultList)
+
+    for result in resultList:
+        if 'error' in result:
+            print(f"{result['recording']}: FAILED ({result['error']})")
+            continue
+        print(f"{result['recording']}: {len(result['strikes'])} strikes in "
+              f"{result['frameCount']} frames, "
+              f"{result['framesPerSec']:.1f} frames/s")
+    return resultList
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Evaluates a grid of detection parameters against labelled recordings.
+
+Each recording is decoded once into shared memory, and every parameter
+combination is replayed over all of them on a process pool, so workers
+spend their time on detection rather than on reading and JPEG decoding.
+Every combination is scored for accuracy against the labelled strikes
+and for per-frame latency.
+
+Labels are a JSON map from recording file to its strikes, each given as
+the time it was heard in CLOCK_MONOTONIC nanoseconds, or as a map with
+`strikeNs` and optionally `side` ("left" or "right"):
+    {"range-01.bin": [12345678900, {"strikeNs": 23456789000, "side": "left"}]}
+
+Run from the repository root:
+    python -m strikepoint.sweep -l labels.json -t transform.json \\
+        -p visualCircles.param2=0.7,0.8,0.9 -p strike.denoiseH=30,50
+"""
+import argparse
+import itertools
+import json
+import numpy as np
+import os
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter
+
+from strikepoint.frames import FrameInfo, FrameInfoReader
+from strikepoint.engine.params import DEFAULT_PARAMS
+from strikepoint.replay import ReplayRunner, loadTransform
+
+
+class SharedRecording:
+    """The frames strike detection needs from one recording, decoded into
+    shared memory blocks that worker processes attach to by name.
+
+    Only the visual and thermal rgb frames and the raw thermal frames are
+    kept, at roughly 250KB per frame.  The process that `create`s the
+    recording owns the blocks and must `unlink` them when done.
+    """
+
+    _arrayKeyList = (('rgb', 'visual'), ('rgb', 'thermal'), ('raw', 'thermal'))
+
+    def __init__(self, fileName: str, arrayMap: dict, timestamps: list,
+                 metadataList: list, shmMap: dict):
+        self.fileName = fileName
+        self.arrayMap = arrayMap
+        self.timestamps = timestamps
+        self.metadataList = metadataList
+        self._shmMap = shmMap
+
+    @classmethod
+    def create(cls, fileName: str) -> 'SharedRecording':
+        arrayMap, shmMap = dict(), dict()
+        timestamps, metadataList = list(), list()
+        try:
+            with FrameInfoReader(fileName, useMmap=True) as reader:
+                frameCount = len(reader)
+                for index in range(frameCount):
+                    frameInfo = reader.readFrameInfo()
+                    for kind, key in cls._arrayKeyList:
+                        frameMap = frameInfo.rgbFrames if kind == 'rgb' \
+                            else frameInfo.rawFrames
+                        frame = frameMap[key]
+                        if (kind, key) not in arrayMap:
+                            shape = (frameCount, ) + frame.shape
+                            shm = SharedMemory(create=True, size=max(
+                                int(np.prod(shape)) * frame.dtype.itemsize,
+                                1))
+                            shmMap[(kind, key)] = shm
+                            arrayMap[(kind, key)] = np.ndarray(
+                                shape, frame.dtype, buffer=shm.buf)
+                        array = arrayMap[(kind, key)]
+                        if frame.shape != array.shape[1:]:
+                            raise ValueError(
+                                f"Frame {index} {kind} {key} is shaped "
+                                f"{frame.shape}, not {array.shape[1:]}")
+                        array[index] = frame
+                    timestamps.append(frameInfo.timestamp)
+                    metadataList.append(frameInfo.metadata)
+        except BaseException:
+            # Nothing else knows about the blocks yet, so free them here
+            arrayMap.clear()
+            for shm in shmMap.values():
+                shm.close()
+                shm.unlink()
+            raise
+        return cls(fileName, arrayMap, timestamps, metadataList, shmMap)
+
+    @classmethod
+    def attach(cls, descriptor: dict) -> 'SharedRecording':
+        arrayMap, shmMap = dict(), dict()
+        for (kind, key), (name, shape, dtype) in descriptor['arrays']:
+            shm = SharedMemory(name=name)
+            shmMap[(kind, key)] = shm
+            arrayMap[(kind, key)] = np.ndarray(
+                shape, np.dtype(dtype), buffer=shm.buf)
+        return cls(descriptor['fileName'], arrayMap,
+                   descriptor['timestamps'], descriptor['metadataList'],
+                   shmMap)
+
+    def descriptor(self) -> dict:
+        """Everything `attach` needs, small enough to pickle to workers."""
+        arrayList = [(arrayKey, (self._shmMap[arrayKey].name, array.shape,
+                                 array.dtype.str))
+                     for arrayKey, array in self.arrayMap.items()]
+        return dict(fileName=self.fileName, arrays=arrayList,
+                    timestamps=self.timestamps,
+                    metadataList=self.metadataList)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def frameInfo(self, index: int) -> FrameInfo:
+        """Frame `index` as a FrameInfo whose frames view shared memory."""
+        frameInfo = FrameInfo(self.timestamps[index])
+        frameInfo.metadata = self.metadataList[index]
+        for (kind, key), array in self.arrayMap.items():
+            frameMap = frameInfo.rgbFrames if kind == 'rgb' \
+                else frameInfo.rawFrames
+            frameMap[key] = array[index]
+        return frameInfo
+
+    def close(self):
+        # Views into a block must be gone before it can be closed
+        self.arrayMap = dict()
+        for shm in self._shmMap.values():
+            shm.close()
+
+    def unlink(self):
+        self.close()
+        for shm in self._shmMap.values():
+            shm.unlink()
+
+
+def matchStrikes(strikeList: list, labelList: list, toleranceNs: int) -> dict:
+    """Pair detected strikes with labelled ones heard within `toleranceNs`
+    of each other, closest pairs first, and count the outcome."""
+    pairList = sorted(
+        (abs(strike['strikeNs'] - label['strikeNs']), i, j)
+        for i, strike in enumerate(strikeList)
+        for j, label in enumerate(labelList)
+        if abs(strike['strikeNs'] - label['strikeNs']) <= toleranceNs)
+    strikeUsed, labelUsed = set(), set()
+    sideCount = sideCorrectCount = 0
+    for _, i, j in pairList:
+        if i in strikeUsed or j in labelUsed:
+            continue
+        strikeUsed.add(i)
+        labelUsed.add(j)
+        side = labelList[j].get('side')
+        if side is not None:
+            strike = strikeList[i]
+            sideCount += 1
+            sideCorrectCount += side == (
+                'left' if strike['leftScore'] >= strike['rightScore']
+                else 'right')
+    return dict(truePositives=len(strikeUsed),
+                falsePositives=len(strikeList) - len(strikeUsed),
+                falseNegatives=len(labelList) - len(labelUsed),
+                sideCount=sideCount, sideCorrectCount=sideCorrectCount)
+
+
+_workerState = dict()
+
+
+def _initWorker(descriptorList: list, thermalVisualTransform, labelMap: dict,
+                toleranceNs: int):
+    _workerState.update(
+        recordingList=[SharedRecording.attach(a) for a in descriptorList],
+        thermalVisualTransform=thermalVisualTransform,
+        labelMap=labelMap, toleranceNs=toleranceNs)
+
+
+def evaluateParams(overrideMap: dict) -> dict:
+    """Replay every shared recording with `overrideMap` applied to the
+    default parameters; runs in a sweep worker."""
+    params = DEFAULT_PARAMS.withOverrides(**overrideMap)
+    countMap = dict(truePositives=0, falsePositives=0, falseNegatives=0,
+                    sideCount=0, sideCorrectCount=0)
+    frameSecList = list()
+    for recording in _workerState['recordingList']:
+        runner = ReplayRunner(
+            _workerState['thermalVisualTransform'], params=params)
+        for index in range(len(recording)):
+            frameInfo = recording.frameInfo(index)
+            startTime = perf_counter()
+            runner.processFrame(frameInfo)
+            frameSecList.append(perf_counter() - startTime)
+        resultMap = matchStrikes(
+            runner.strikeList, _workerState['labelMap'][recording.fileName],
+            _workerState['toleranceNs'])
+        for name, value in resultMap.items():
+            countMap[name] += value
+    return dict(params=overrideMap, **countMap,
+                **summarize(countMap, frameSecList))
+
+
+def summarize(countMap: dict, frameSecList: list) -> dict:
+    truePositives = countMap['truePositives']
+    detectedCount = truePositives + countMap['falsePositives']
+    labelledCount = truePositives + countMap['falseNegatives']
+    precision = truePositives / detectedCount if detectedCount else 0.0
+    recall = truePositives / labelledCount if labelledCount else 0.0
+    frameSec = np.array(frameSecList or [0.0])
+    return dict(
+        precision=precision, recall=recall,
+        f1=2 * precision * recall / (precision + recall)
+        if precision + recall > 0 else 0.0,
+        sideAccuracy=countMap['sideCorrectCount'] / countMap['sideCount']
+        if countMap['sideCount'] else None,
+        frameCount=len(frameSecList),
+        meanFrameSec=float(frameSec.mean()),
+        p50FrameSec=float(np.percentile(frameSec, 50)),
+        p95FrameSec=float(np.percentile(frameSec, 95)),
+        maxFrameSec=float(frameSec.max()))
+
+
+def expandGrid(gridMap: dict) -> list:
+    """Every combination of the values in {dotted name: [values]}."""
+    nameList = sorted(gridMap)
+    return [dict(zip(nameList, values)) for values in
+            itertools.product(*(gridMap[a] for a in nameList))]
+
+
+def loadLabels(fileName: str) -> dict:
+    with open(fileName) as file:
+        labelMap = json.load(file)
+    return {recording: [a if isinstance(a, dict) else dict(strikeNs=a)
+                        for a in labelList]
+            for recording, labelList in labelMap.items()}
+
+
+def runSweep(labelMap: dict, gridMap: dict, thermalVisualTransform,
+             jobs: int = None, toleranceNs: int = 150_000_000) -> list:
+    """Evaluate every combination in `gridMap` over the recordings in
+    `labelMap`, best F1 score (then lowest mean latency) first."""
+    overrideList = expandGrid(gridMap)
+    for overrideMap in overrideList:
+        DEFAULT_PARAMS.withOverrides(**overrideMap)
+
+    recordingList = list()
+    try:
+        for fileName in labelMap:
+            recordingList.append(SharedRecording.create(fileName))
+        resultList = list()
+        with ProcessPoolExecutor(
+                max_workers=jobs, initializer=_initWorker,
+                initargs=([a.descriptor() for a in recordingList],
+                          np.asarray(thermalVisualTransform), labelMap,
+                          toleranceNs)) as executor:
+            futureList = [executor.submit(evaluateParams, a)
+                          for a in overrideList]
+            for future in as_completed(futureList):
+                resultList.append(future.result())
+    finally:
+        for recording in recordingList:
+            recording.unlink()
+
+    resultList.sort(key=lambda a: (-a['f1'], a['meanFrameSec']))
+    return resultList
+
+
+def _parseGridArg(arg: str) -> tuple:
+    name, _, valueStr = arg.partition('=')
+    if not valueStr:
+        raise argparse.ArgumentTypeError(
+            f"Expected name=value[,value...], got '{arg}'")
+    return name, [json.loads(a) for a in valueStr.split(',')]
+
+
+def main(argList: list = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m strikepoint.sweep",
+        description="Sweep detection parameters over labelled recordings")
+    parser.add_argument(
+        "-l", "--labels", type=str, required=True,
+        help="JSON map of recording file to its labelled strikes")
+    parser.add_argument(
+        "-p", "--param", type=_parseGridArg, action="append", default=[],
+        metavar="NAME=V1,V2", help="values to try for one parameter, "
+        "e.g. visualCircles.param2=0.7,0.8 (repeatable)")
+    parser.add_argument(
+        "-g", "--grid", type=str,
+        help="JSON map of parameter name to the values to try")
+    parser.add_argument(
+        "-t", "--transform", type=str,
+        help="JSON file holding the 2x3 thermal-visual transform "
+        "(default: the latest calibration in the database)")
+    parser.add_argument(
+        "-o", "--output", type=str, default="sweep.json",
+        help="JSON report to write (default: %(default)s)")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(),
+        help="worker processes (default: %(default)s)")
+    parser.add_argument(
+        "--tolerance-ms", type=float, default=150.0,
+        help="how far apart a detected and a labelled strike may be "
+        "heard and still match (default: %(default)s)")
+    args = parser.parse_args(argList)
+
+    gridMap = dict()
+    if args.grid:
+        with open(args.grid) as file:
+            gridMap.update(json.load(file))
+    gridMap.update(args.param)
+
+    labelMap = loadLabels(args.labels)
+    resultList = runSweep(
+        labelMap, gridMap, loadTransform(args.transform), jobs=args.jobs,
+        toleranceNs=int(args.tolerance_ms * 1e6))
+    with open(args.output, "w") as file:
+        json.dump(dict(recordings=list(labelMap), grid=gridMap,
+                       defaults=DEFAULT_PARAMS.toDict(),
+                       results=resultList), file, indent=2)
+
+    print(f"{len(resultList)} configurations over {len(labelMap)} "
+          f"recordings, best first:")
+    for result in resultList[:10]:
+        print(f"  f1={result['f1']:.3f} precision={result['precision']:.3f} "
+              f"recall={result['recall']:.3f} "
+              f"frame={result['meanFrameSec'] * 1e3:.1f}ms "
+              f"p95={result['p95FrameSec'] * 1e3:.1f}ms  {result['params']}")
+    return resultList
+
+
+if __name__ == "__main__":
+    main()
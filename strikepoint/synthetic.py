@@ -0,0 +1,180 @@
+import cv2
+import numpy as np
+
+from logging import getLogger
+from time import monotonic_ns, sleep
+
+from strikepoint.frames import FrameInfo, FrameInfoProvider
+from strikepoint.preprocess import ThermalPreprocessor
+
+logger = getLogger("strikepoint")
+
+
+class SyntheticFrameInfoProvider(FrameInfoProvider):
+    """Generated frames for load testing, at any rate and resolution.
+
+    The scene repeats every `strikePeriodSec`: a warm, bright ball sits on
+    the tee (drifting around its spot when `ballMotion` is set), is struck
+    `teeSec` into the cycle, and disappears, leaving a warm patch that
+    fades over `decaySec`.  Each strike is reported in the next frame's
+    metadata as an audio event heard at the time of the strike, exactly
+    like the device provider.  With `strikePeriodSec=None` the ball never
+    leaves the tee.
+
+    Scene time advances `1/fps` per frame.  With `throttle`, frames are
+    paced to that rate on the wall clock; without it they are produced as
+    fast as they can be generated, with timestamps still `1/fps` apart.
+    The thermal image is rendered at `thermalShape` and scaled to
+    `visualSize`, so the thermal-visual transform is the identity.
+    """
+
+    thermalVisualTransform = np.float32([[1, 0, 0], [0, 1, 0]])
+
+    def __init__(self, fps: float = 9.0, throttle: bool = True,
+                 visualSize: tuple = (320, 240),
+                 thermalShape: tuple = (60, 80),
+                 ballRadius: int = 18, ballMotion: float = 0.0,
+                 strikePeriodSec: float = 5.0, teeSec: float = 3.0,
+                 decaySec: float = 1.5, backgroundDegF: float = 70.0,
+                 ballDegF: float = 74.0, patchDegF: float = 80.0,
+                 backgroundLevel: int = 40, thermalNoiseDegF: float = 0.05,
+                 visualNoise: int = 10, noiseFrameCount: int = 8,
+                 seed: int = 0):
+        if fps <= 0:
+            raise ValueError("fps must be positive")
+        if strikePeriodSec is not None and \
+                not 0 < teeSec < strikePeriodSec:
+            raise ValueError("teeSec must fall inside strikePeriodSec")
+        self.fps = fps
+        self.throttle = throttle
+        self.visualSize = tuple(visualSize)
+        self.thermalShape = tuple(thermalShape)
+        self.ballRadius = ballRadius
+        self.ballMotion = ballMotion
+        self.strikePeriodSec = strikePeriodSec
+        self.teeSec = teeSec
+        self.decaySec = decaySec
+        self.backgroundDegF = backgroundDegF
+        self.ballDegF = ballDegF
+        self.patchDegF = patchDegF
+        self.frameIndex = 0
+        self.strikeCount = 0
+        self.startNs = None
+
+        # Noise is drawn once and cycled, so generating a frame costs a
+        # few copies and circles rather than a full-frame random draw
+        rng = np.random.default_rng(seed)
+        width, height = self.visualSize
+        self._visualBackgroundList = [
+            np.full((height, width, 3), backgroundLevel, dtype=np.uint8) +
+            rng.integers(0, visualNoise + 1, (height, width, 3),
+                         dtype=np.uint8)
+            for _ in range(noiseFrameCount)]
+        self._thermalBackgroundList = [
+            (backgroundDegF + rng.normal(0, thermalNoiseDegF,
+                                         self.thermalShape))
+            .astype(np.float32)
+            for _ in range(noiseFrameCount)]
+        self._thermalPreprocessor = ThermalPreprocessor(
+            self.thermalShape, self.visualSize)
+
+    def _ballCenter(self, sceneSec: float) -> tuple:
+        """Visual (x, y) of the ball at `sceneSec`."""
+        width, height = self.visualSize
+        x, y = width / 2, height * 5 / 8
+        if self.ballMotion:
+            angle = 2 * np.pi * sceneSec / 2.0
+            x += self.ballMotion * np.cos(angle)
+            y += self.ballMotion * np.sin(angle) / 2
+        return x, y
+
+    def _strikeState(self, sceneSec: float):
+        """(ball on tee, seconds since the last strike or None)."""
+        if self.strikePeriodSec is None:
+            return True, None
+        cycleSec = sceneSec % self.strikePeriodSec
+        if cycleSec < self.teeSec:
+            if sceneSec < self.strikePeriodSec:
+                return True, None
+            return True, cycleSec + self.strikePeriodSec - self.teeSec
+        return False, cycleSec - self.teeSec
+
+    def _strikeTimesBetween(self, startSec: float, endSec: float) -> list:
+        """Scene times of the strikes in (startSec, endSec]."""
+        if self.strikePeriodSec is None:
+            return list()
+        first = np.floor((startSec - self.teeSec) / self.strikePeriodSec) + 1
+        last = np.floor((endSec - self.teeSec) / self.strikePeriodSec)
+        return [self.teeSec + i * self.strikePeriodSec
+                for i in range(int(max(first, 0)), int(last) + 1)]
+
+    def _render(self, sceneSec: float):
+        """(raw thermal in degF, BGR visual) for the scene at `sceneSec`."""
+        index = self.frameIndex % len(self._visualBackgroundList)
+        visual = self._visualBackgroundList[index].copy()
+        thermal = self._thermalBackgroundList[index].copy()
+        width, height = self.visualSize
+        scaleX = self.thermalShape[1] / width
+        scaleY = self.thermalShape[0] / height
+        thermalRadius = max(int(round(self.ballRadius * scaleX)), 1)
+
+        ballOnTee, sinceStrikeSec = self._strikeState(sceneSec)
+        x, y = self._ballCenter(sceneSec)
+        if sinceStrikeSec is not None and sinceStrikeSec < self.decaySec:
+            # The club face leaves heat just behind where the ball sat
+            fade = 1.0 - sinceStrikeSec / self.decaySec
+            patchX, patchY = self._ballCenter(sceneSec - sinceStrikeSec)
+            cv2.circle(
+                thermal,
+                (int(round((patchX - self.ballRadius) * scaleX)),
+                 int(round(patchY * scaleY))),
+                thermalRadius, self.backgroundDegF +
+                fade * (self.patchDegF - self.backgroundDegF), -1)
+        if ballOnTee:
+            cv2.circle(visual, (int(round(x)), int(round(y))),
+                       self.ballRadius, (230, 230, 230), -1)
+            cv2.circle(thermal, (int(round(x * scaleX)),
+                                 int(round(y * scaleY))),
+                       thermalRadius, self.ballDegF, -1)
+        return thermal, visual
+
+    def getFrameInfo(self):
+        periodNs = round(1e9 / self.fps)
+        if self.startNs is None:
+            self.startNs = monotonic_ns()
+        timestampNs = self.startNs + self.frameIndex * periodNs
+        if self.throttle:
+            delayNs = timestampNs - monotonic_ns()
+            if delayNs > 0:
+                sleep(delayNs / 1e9)
+            elif delayNs < -periodNs:
+                # Fell more than a frame behind; stay behind rather than
+                # bursting to catch up
+                self.startNs -= delayNs
+                timestampNs -= delayNs
+
+        sceneSec = self.frameIndex / self.fps
+        previousSec = (self.frameIndex - 1) / self.fps
+        strikeSecList = self._strikeTimesBetween(previousSec, sceneSec) \
+            if self.frameIndex > 0 else list()
+        audioEvents = list()
+        for strikeSec in strikeSecList:
+            self.strikeCount += 1
+            audioEvents.append(dict(
+                t_ns=timestampNs - round((sceneSec - strikeSec) * 1e9),
+                rms=0.1, eventSeq=self.strikeCount))
+
+        rawThermal, visual = self._render(sceneSec)
+        _, thermal = self._thermalPreprocessor.process(rawThermal)
+
+        frameInfo = FrameInfo(timestampNs / 1e9)
+        frameInfo.rawFrames['thermal'] = rawThermal
+        frameInfo.rgbFrames['thermal'] = thermal
+        frameInfo.rawFrames['visual'] = visual
+        frameInfo.rgbFrames['visual'] = visual
+        frameInfo.metadata.update(
+            eventId=self.frameIndex, timestamp_ns=timestampNs,
+            visualTimestamp_ns=timestampNs, audioEvents=audioEvents,
+            audioStrikeDetected=len(audioEvents) > 0)
+        self.frameIndex += 1
+        return frameInfo
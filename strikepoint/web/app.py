@@ -2,14 +2,19 @@ import datetime
 import os
 import threading
 
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, Response, render_template, request, jsonify
+from functools import partial
 from threading import Lock, Thread
 from queue import Queue
 from logging import getLogger
+from time import perf_counter
 
 from strikepoint.database import Database
-from strikepoint.frames import FrameInfoWriter, FrameInfoProvider
+from strikepoint.frames import BackgroundFrameInfoWriter, FrameInfoProvider
+from strikepoint.metrics import MetricsRegistry
 from strikepoint.events import EventBus, FrameEvent, LogBatchEvent
+from strikepoint.engine.analysis import FrameAnalysis
 from strikepoint.engine.calibrate import CalibrationEngine, CalibrationProgressEvent
 from strikepoint.engine.strike import StrikeDetectionEngine, StrikeDetectedEvent
 from strikepoint.web.content import ContentManager
@@ -30,9 +35,29 @@ _PHASE_INSTRUCTIONS = {
 }
 
 
+def driverCounterMap(driverStats: dict) -> dict:
+    """Prometheus counters for `SplibDriver.getStats` output.  Every
+    driver counter and timer only grows until the driver restarts."""
+    timerMap = driverStats['timers']
+    return dict(
+        driver_events_total=[
+            (dict(counter=name), value)
+            for name, value in driverStats.items() if name != 'timers'],
+        driver_calls_total=[
+            (dict(timer=name), stats['callCount'])
+            for name, stats in timerMap.items()],
+        driver_seconds_total=[
+            (dict(timer=name, clock=clock), stats[clock + 'Sec'])
+            for name, stats in timerMap.items()
+            for clock in ('real', 'user', 'sys')],
+    )
+
+
 class StrikePointWebApp:
 
-    def __init__(self, frameInfoProvider: FrameInfoProvider, msgQueue: Queue):
+    def __init__(self, frameInfoProvider: FrameInfoProvider, msgQueue: Queue,
+                 recordingOverflowPolicy: str = 'block',
+                 asyncEvents: bool = False):
         self.flask = Flask(
             __name__,
             template_folder=os.path.join(_ROOT_DIR, 'templates'),
@@ -40,10 +65,11 @@ class StrikePointWebApp:
         )
         self.frameInfoProvider = frameInfoProvider
         self.msgQueue = msgQueue
-        self.contentManager = ContentManager(self.flask)
+        self.metrics = MetricsRegistry()
+        self.contentManager = ContentManager(self.flask, metrics=self.metrics)
         self.sseManager = SSEManager()
         self.database = Database()
-        self.eventBus = EventBus()
+        self.eventBus = EventBus(asyncDispatch=asyncEvents)
 
         # Calibration state
         self.calibrationEngine: CalibrationEngine | None = None
@@ -52,23 +78,43 @@ class StrikePointWebApp:
 
         # Detection state
         self.isDetecting = False
-        self.strikeEngine = StrikeDetectionEngine()
+        self.strikeExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='StrikePoint strike post-processing')
+        self.strikeEngine = StrikeDetectionEngine(executor=self.strikeExecutor)
+        # With async events the engine runs on a bus worker, so a reset
+        # from a request thread must not land in the middle of process()
+        self.strikeEngineLock = Lock()
         self.strikeHistory: list[dict] = []
 
         # Recording state
-        self.frameWriter: FrameInfoWriter | None = None
+        self.frameWriter: BackgroundFrameInfoWriter | None = None
         self.frameWriterLock = Lock()
+        self.recordingOverflowPolicy = \
+            BackgroundFrameInfoWriter.OverflowPolicy(recordingOverflowPolicy)
 
         # Log buffer for the logs page initial render (capped at 500)
         self.logBuffer: list[dict] = []
 
-        self.eventBus.subscribe(FrameEvent, self._onFrame)
-        self.eventBus.subscribe(CalibrationProgressEvent, self._onCalibrationProgress)
-        self.eventBus.subscribe(StrikeDetectedEvent, self._onStrikeDetected)
-        self.eventBus.subscribe(LogBatchEvent, self._onLogBatch)
+        # Calibration only shows the newest frame, so it may skip frames it
+        # can't keep up with, but strike detection needs every frame
+        policy = EventBus.DeliveryPolicy
+        self.eventBus.subscribe(
+            FrameEvent, self._onFrameCalibrate, policy=policy.LATEST_ONLY)
+        self.eventBus.subscribe(
+            FrameEvent, self._onFrameDetect, policy=policy.LOSSLESS)
+        self.eventBus.subscribe(
+            CalibrationProgressEvent, self._onCalibrationProgress,
+            policy=policy.LATEST_ONLY)
+        self.eventBus.subscribe(
+            StrikeDetectedEvent, self._onStrikeDetected,
+            policy=policy.LOSSLESS)
+        self.eventBus.subscribe(
+            LogBatchEvent, self._onLogBatches, policy=policy.BATCH,
+            maxQueue=1000)
 
         self._register_routes()
 
+        self.isRunning = True
         self.driverThread = Thread(
             name='ImageCaptureDriver', target=self._driverThreadMain, daemon=True)
         self.driverThread.start()
@@ -113,6 +159,40 @@ class StrikePointWebApp:
                 thermal_frame_src=self.contentManager.getLatestFrameEndpoint('thermal'),
             )
 
+        @app.route('/metrics')
+        def metrics():
+            eventStatsMap = self.eventBus.getStats()
+            gaugeMap = dict(
+                event_queue_depth=[
+                    (dict(handler=name), stats['queueDepth'])
+                    for name, stats in eventStatsMap.items()],
+            )
+            counterMap = dict(
+                event_dropped_total=[
+                    (dict(handler=name), stats['droppedCount'])
+                    for name, stats in eventStatsMap.items()],
+            )
+            frameWriter = self.frameWriter
+            if frameWriter is not None:
+                gaugeMap['recording_queue_depth'] = frameWriter.queueDepth
+            driverStats = self.frameInfoProvider.getDriverStats()
+            if driverStats is not None:
+                counterMap.update(driverCounterMap(driverStats))
+            return Response(
+                self.metrics.toPrometheus(
+                    gaugeMap=gaugeMap, counterMap=counterMap),
+                mimetype='text/plain; version=0.0.4')
+
+        @app.route('/metrics.json')
+        def metrics_json():
+            frameWriter = self.frameWriter
+            return jsonify({
+                'stages': self.metrics.getStats(),
+                'events': self.eventBus.getStats(),
+                'recording': frameWriter.getStats() if frameWriter else None,
+                'driver': self.frameInfoProvider.getDriverStats(),
+            })
+
         @app.route('/events')
         def sse_stream():
             return Response(
@@ -154,31 +234,49 @@ class StrikePointWebApp:
         def strike_toggle():
             self.isDetecting = not self.isDetecting
             if not self.isDetecting:
-                self.strikeEngine.reset()
+                with self.strikeEngineLock:
+                    self.strikeEngine.reset()
             return jsonify({'is_detecting': self.isDetecting})
 
         @app.route('/recording/toggle', methods=['POST'])
         def recording_toggle():
             with self.frameWriterLock:
-                if self.frameWriter is None:
-                    self.frameWriter = FrameInfoWriter('recording.bin')
-                    is_recording = True
+                frameWriter = self.frameWriter
+                if frameWriter is None:
+                    self.frameWriter = BackgroundFrameInfoWriter(
+                        'recording.bin',
+                        overflowPolicy=self.recordingOverflowPolicy)
                 else:
-                    self.frameWriter.close()
                     self.frameWriter = None
-                    is_recording = False
-            return jsonify({'is_recording': is_recording})
-
-    # --- EventBus handlers (all run on the capture driver thread) ---
-
-    def _onFrame(self, event: FrameEvent) -> None:
-        if self.calibrationEngine is not None:
-            self.calibrationEngine.process(
-                self.eventBus, event.frameSeq, event.frameInfo)
 
+            # Flush outside the lock so the capture loop never waits on it
+            if frameWriter is None:
+                return jsonify({'is_recording': True})
+            frameWriter.close()
+            stats = frameWriter.getStats()
+            if stats['droppedFrameCount'] > 0:
+                logger.warning(
+                    f"Recording dropped {stats['droppedFrameCount']} frames")
+            return jsonify({'is_recording': False, **stats})
+
+    # --- EventBus handlers (each on its own worker with async events,
+    # otherwise on the capture driver thread) ---
+
+    def _onFrameCalibrate(self, event: FrameEvent) -> None:
+        calibrationEngine = self.calibrationEngine
+        if calibrationEngine is not None:
+            with self.metrics.time('engine.calibration'):
+                calibrationEngine.process(
+                    self.eventBus, event.frameSeq, event.frameInfo,
+                    event.analysis)
+
+    def _onFrameDetect(self, event: FrameEvent) -> None:
         if self.isDetecting and self.thermalVisualTransform is not None:
-            self.strikeEngine.process(
-                self.eventBus, event.frameInfo, self.thermalVisualTransform)
+            with self.strikeEngineLock, \
+                    self.metrics.time('engine.detection'):
+                self.strikeEngine.process(
+                    self.eventBus, event.frameInfo,
+                    self.thermalVisualTransform, event.analysis)
 
     def _onCalibrationProgress(self, event: CalibrationProgressEvent) -> None:
         self.contentManager.registerVideoFrame('cal-vis-frame', event.visFrame)
@@ -203,6 +301,8 @@ class StrikePointWebApp:
             })
 
     def _onStrikeDetected(self, event: StrikeDetectedEvent) -> None:
+        self.metrics.record('strike.queue', event.queueDelaySec)
+        self.metrics.record('strike.postprocess', event.processingSec)
         visual_url = self.contentManager.registerImage('strike-visual', event.visualImage)
         thermal_url = self.contentManager.registerImage('strike-thermal', event.thermalImage)
         strike = {
@@ -210,40 +310,76 @@ class StrikePointWebApp:
             'thermal_url': thermal_url,
             'left_score': round(float(event.leftScore), 3),
             'right_score': round(float(event.rightScore), 3),
+            'queue_delay_sec': round(event.queueDelaySec, 3),
+            'processing_sec': round(event.processingSec, 3),
             'timestamp': datetime.datetime.now().strftime('%b %d, %Y  %H:%M'),
         }
         self.strikeHistory.append(strike)
         self.sseManager.push('strike_detected', strike)
 
-    def _onLogBatch(self, event: LogBatchEvent) -> None:
-        record, msg = event.lines
-        entry = {'level': record.levelname, 'message': msg}
-        self.logBuffer.append(entry)
-        if len(self.logBuffer) > 500:
-            self.logBuffer = self.logBuffer[-500:]
-        self.sseManager.push('log_entry', entry)
+    def _onLogBatches(self, eventList: list[LogBatchEvent]) -> None:
+        entryList = list()
+        for event in eventList:
+            record, msg = event.lines
+            entryList.append({'level': record.levelname, 'message': msg})
+        self.logBuffer = (self.logBuffer + entryList)[-500:]
+        for entry in entryList:
+            self.sseManager.push('log_entry', entry)
 
     # --- Capture driver thread ---
 
     def _driverThreadMain(self):
         threading.current_thread().name = 'StrikePoint capture driver'
+        metrics = self.metrics
         frameSeq = 0
-        while True:
+        while self.isRunning:
             try:
                 frameSeq += 1
-                frameInfo = self.frameInfoProvider.getFrameInfo()
-                self.contentManager.registerVideoFrame('visual', frameInfo.rgbFrames['visual'])
-                self.contentManager.registerVideoFrame('thermal', frameInfo.rgbFrames['thermal'])
-                self.eventBus.publish(FrameEvent(frameSeq=frameSeq, frameInfo=frameInfo))
-                with self.frameWriterLock:
+                frameStartTime = perf_counter()
+                with metrics.time('acquire'):
+                    frameInfo = self.frameInfoProvider.getFrameInfo()
+                with metrics.time('register'):
+                    self.contentManager.registerVideoFrame(
+                        'visual', partial(frameInfo.rgbFrames.getEncoded, 'visual'))
+                    self.contentManager.registerVideoFrame(
+                        'thermal', partial(frameInfo.rgbFrames.getEncoded, 'thermal'))
+                with metrics.time('publish'):
+                    self.eventBus.publish(FrameEvent(
+                        frameSeq=frameSeq, frameInfo=frameInfo,
+                        analysis=FrameAnalysis(frameSeq, frameInfo)))
+                with metrics.time('record'), self.frameWriterLock:
                     if self.frameWriter is not None:
                         self.frameWriter.writeFrameInfo(frameInfo)
                 while self.msgQueue.qsize() > 0:
                     rtn = self.msgQueue.get_nowait()
                     self.eventBus.publish(LogBatchEvent(lines=rtn))
-                self.eventBus.pump()
+                with metrics.time('pump'):
+                    self.eventBus.pump()
+                metrics.record('frame', perf_counter() - frameStartTime)
             except Exception as ex:
-                logger.error(f'StrikePointWebApp driver exception: {ex}')
+                if self.isRunning:
+                    logger.error(f'StrikePointWebApp driver exception: {ex}')
 
     def run(self):
-        self.flask.run(host='0.0.0.0', port=8050, threaded=True)
+        try:
+            self.flask.run(host='0.0.0.0', port=8050, threaded=True)
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop capturing, then let strike post-processing, event handlers
+        and the recording finish what they already have."""
+        if not self.isRunning:
+            return
+        self.isRunning = False
+        self.frameInfoProvider.close()
+        self.driverThread.join(timeout=5.0)
+        # Post-processing publishes its results, so it finishes before the
+        # bus does
+        self.strikeExecutor.shutdown(wait=True)
+        self.eventBus.drain()
+        self.eventBus.close()
+        with self.frameWriterLock:
+            frameWriter, self.frameWriter = self.frameWriter, None
+        if frameWriter is not None:
+            frameWriter.close()
@@ -1,20 +1,49 @@
 import numpy as np
-import cv2
 import threading
 
 from flask import Flask, Response, abort
-from threading import Condition
+from threading import Condition, Lock
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from time import perf_counter
+from typing import Callable
 
+from strikepoint.frames import encodeJpeg
+from strikepoint.metrics import MetricsRegistry
+
+logger = getLogger("strikepoint")
 
-class ContentManager:
-    """Serves MJPEG video streams and static JPEG images via Flask routes."""
 
-    def __init__(self, app: Flask):
+class ContentManager:
+    """Serves MJPEG video streams and static JPEG images via Flask routes.
+
+    Video frames are registered unencoded and only JPEG-encoded when a
+    client asks for them, at most once per frame sequence number, so
+    streams nobody is watching cost nothing to publish.  Streams that do
+    have MJPEG subscribers are encoded ahead of demand on a small thread
+    pool (cv2 releases the GIL), one job per stream at a time so frames
+    within a stream stay in order while separate streams encode in
+    parallel.  The caller of `registerVideoFrame` never waits on encoding.
+    """
+
+    def __init__(self, app: Flask, encodeWorkers: int = 2,
+                 metrics: MetricsRegistry = None):
+        self._metrics = metrics
         self._encodedImageMap = dict()
         self._videoCondMap = defaultdict(Condition)
+        self._videoEncodeLockMap = defaultdict(Lock)
         self._videoSeqMap = defaultdict(int)
+        self._videoContentMap = dict()
         self._videoJpegMap = dict()
+        self._videoJpegSeqMap = defaultdict(int)
+        self._subscriberCountMap = defaultdict(int)
+        self._encodePendingMap = defaultdict(bool)
+        self._encodePool = None
+        if encodeWorkers > 0:
+            self._encodePool = ThreadPoolExecutor(
+                max_workers=encodeWorkers,
+                thread_name_prefix='StrikePoint JPEG encoder')
         self._imageSeq = 0
 
         @app.route("/content/video/<path:subpath>.mjpg", methods=["GET"])
@@ -30,7 +59,7 @@ class ContentManager:
 
         @app.route("/content/frame/<path:subpath>.jpg", methods=["GET"])
         def serve_latest_frame(subpath):
-            encoded = self._videoJpegMap.get(subpath)
+            encoded = self.getVideoFrame(subpath)
             if encoded is None:
                 abort(404)
             response = Response(encoded, mimetype="image/jpeg")
@@ -44,35 +73,76 @@ class ContentManager:
         cond = self._videoCondMap[name]
 
         with cond:
-            lastSeq = self._videoSeqMap[name]
-            encoded = self._videoJpegMap.get(name)
-        if encoded is not None:
-            yield boundary + encoded + b"\r\n"
+            self._subscriberCountMap[name] += 1
+        try:
+            lastSeq, encoded = self._getEncodedVideoFrame(name)
+            if encoded is not None:
+                yield boundary + encoded + b"\r\n"
 
-        while True:
-            with cond:
-                while self._videoSeqMap[name] == lastSeq:
-                    notified = cond.wait(timeout=timeout)
-                    if self._videoSeqMap[name] == lastSeq and not notified:
-                        idleSec += timeout
-                        if idleSec >= maxIdleSec:
-                            return
-
-                if self._videoSeqMap[name] == lastSeq:
-                    encoded = self._videoJpegMap.get(name)
-                else:
-                    lastSeq = self._videoSeqMap[name]
-                    encoded = self._videoJpegMap.get(name)
+            while True:
+                with cond:
+                    while self._videoSeqMap[name] == lastSeq:
+                        notified = cond.wait(timeout=timeout)
+                        if self._videoSeqMap[name] == lastSeq and not notified:
+                            idleSec += timeout
+                            if idleSec >= maxIdleSec:
+                                return
                     idleSec = 0.0
 
-            if encoded is not None:
-                yield boundary + encoded + b"\r\n"
+                lastSeq, encoded = self._getEncodedVideoFrame(name)
+                if encoded is not None:
+                    yield boundary + encoded + b"\r\n"
+        finally:
+            with cond:
+                self._subscriberCountMap[name] -= 1
+
+    def _getEncodedVideoFrame(self, name: str):
+        """Return (seq, jpeg) for the latest frame of a stream, encoding it
+        if no one has asked for this sequence number yet.
+        """
+        with self._videoEncodeLockMap[name]:
+            cond = self._videoCondMap[name]
+            with cond:
+                seq = self._videoSeqMap[name]
+                if self._videoJpegSeqMap[name] == seq:
+                    return seq, self._videoJpegMap.get(name)
+                content = self._videoContentMap.get(name)
+            if content is None:
+                return seq, None
+
+            startTime = perf_counter()
+            encoded = self._encodeImageAsJpeg(content)
+            if self._metrics is not None:
+                self._metrics.record('encode', perf_counter() - startTime)
+            with cond:
+                self._videoJpegMap[name] = encoded
+                self._videoJpegSeqMap[name] = seq
+            return seq, encoded
+
+    def _encodeLatestVideoFrames(self, name: str):
+        """Encode-pool job: keep encoding the newest frame of a stream
+        until it is caught up or no subscribers remain.
+        """
+        cond = self._videoCondMap[name]
+        try:
+            while True:
+                seq, _ = self._getEncodedVideoFrame(name)
+                with cond:
+                    if self._videoSeqMap[name] == seq or \
+                            self._subscriberCountMap[name] == 0:
+                        self._encodePendingMap[name] = False
+                        return
+        except Exception as ex:
+            logger.error(f"JPEG encoding failed for stream '{name}': {ex}")
+            with cond:
+                self._encodePendingMap[name] = False
 
-    def _encodeImageAsJpeg(self, frame: np.ndarray) -> bytes:
-        ok, encoded = cv2.imencode(".jpg", frame)
-        if not ok:
-            raise RuntimeError("Failed to encode frame")
-        return encoded.tobytes()
+    def _encodeImageAsJpeg(self, frame: np.ndarray | bytes | Callable) -> bytes:
+        if callable(frame):
+            frame = frame()
+        if isinstance(frame, bytes):
+            return frame
+        return encodeJpeg(frame)
 
     def getVideoFrameEndpoint(self, name: str) -> str:
         return f"/content/video/{name}.mjpg"
@@ -83,12 +153,35 @@ class ContentManager:
     def getImageEndpoint(self, name: str) -> str:
         return f"/content/image/{name}.jpg"
 
-    def registerVideoFrame(self, name: str, content: np.ndarray):
-        encoded = self._encodeImageAsJpeg(content)
+    def getVideoFrame(self, name: str) -> bytes | None:
+        """JPEG of the latest frame of a stream, encoded on first request,
+        or None if nothing has been registered for it yet."""
+        return self._getEncodedVideoFrame(name)[1]
+
+    def getSubscriberCount(self, name: str) -> int:
+        """Number of MJPEG clients currently streaming `name`."""
+        with self._videoCondMap[name]:
+            return self._subscriberCountMap[name]
+
+    def registerVideoFrame(self, name: str,
+                           content: np.ndarray | bytes | Callable[[], bytes]):
+        """Publish the next frame of a video stream.
+
+        `content` is an image, JPEG bytes that were already encoded, or a
+        callable returning JPEG bytes (e.g. `FrameInfo.rgbFrames.getEncoded`
+        bound to a key).  It is only encoded once a client requests it.
+        """
         with self._videoCondMap[name]:
-            self._videoJpegMap[name] = encoded
+            self._videoContentMap[name] = content
             self._videoSeqMap[name] += 1
             self._videoCondMap[name].notify_all()
+            submitEncode = self._encodePool is not None and \
+                self._subscriberCountMap[name] > 0 and \
+                not self._encodePendingMap[name]
+            if submitEncode:
+                self._encodePendingMap[name] = True
+        if submitEncode:
+            self._encodePool.submit(self._encodeLatestVideoFrames, name)
 
     def registerImage(self, name: str, content: np.ndarray) -> str:
         contentName = f"{name}_{self._imageSeq:08d}"
@@ -27,15 +27,31 @@ class SSEManager:
             for q in dead:
                 self._clients.remove(q)
 
+    def subscribe(self, maxsize: int = 200) -> queue.Queue:
+        """Register a client queue that receives every pushed payload.
+
+        A client whose queue fills up is dropped by push(); maxsize=0
+        makes the queue unbounded.
+        """
+        q: queue.Queue = queue.Queue(maxsize=maxsize)
+        with self._lock:
+            self._clients.append(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            try:
+                self._clients.remove(q)
+            except ValueError:
+                pass
+
     def stream(self):
         """Generator yielded as a Flask SSE response.
 
         Registers a per-client queue, yields events as they arrive,
         and deregisters the queue when the client disconnects.
         """
-        q: queue.Queue = queue.Queue(maxsize=200)
-        with self._lock:
-            self._clients.append(q)
+        q = self.subscribe()
         try:
             while True:
                 try:
@@ -43,8 +59,4 @@ class SSEManager:
                 except queue.Empty:
                     yield ": keepalive\n\n"
         finally:
-            with self._lock:
-                try:
-                    self._clients.remove(q)
-                except ValueError:
-                    pass
+            self.unsubscribe(q)
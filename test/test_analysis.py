@@ -0,0 +1,77 @@
+import unittest
+import cv2
+import numpy as np
+
+from strikepoint.engine.analysis import FrameAnalysis
+from strikepoint.engine.util import CircleTracker, \
+    findBrightestThermalCircles, findBrightestVisualCircles
+from strikepoint.frames import FrameInfo
+
+
+def makeFrameInfo():
+    rng = np.random.default_rng(0)
+    visual = np.full((240, 320, 3), 40, dtype=np.uint8)
+    visual += rng.integers(0, 10, visual.shape, dtype=np.uint8)
+    cv2.circle(visual, (160, 150), 18, (230, 230, 230), -1)
+
+    thermal = np.full((60, 80), 70.0, dtype=np.float32)
+    cv2.circle(thermal, (39, 37), 5, 95.0, -1)
+    thermalRgb = cv2.resize(thermal, (320, 240),
+                            interpolation=cv2.INTER_NEAREST)
+    thermalRgb = cv2.normalize(
+        thermalRgb, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+    frameInfo = FrameInfo(timestamp=0.0)
+    frameInfo.rawFrames['thermal'] = thermal
+    frameInfo.rgbFrames['visual'] = visual
+    frameInfo.rgbFrames['thermal'] = cv2.applyColorMap(
+        thermalRgb, cv2.COLORMAP_HOT)
+    return frameInfo
+
+
+class FrameAnalysisTests(unittest.TestCase):
+
+    def test_matches_standalone_finders(self):
+        frameInfo = makeFrameInfo()
+        analysis = FrameAnalysis(1, frameInfo)
+        self.assertEqual(
+            analysis.visual.findCircles(),
+            findBrightestVisualCircles(frameInfo.rgbFrames['visual']))
+        self.assertEqual(
+            analysis.thermal.findCircles(roi=(100, 90, 220, 210)),
+            findBrightestThermalCircles(
+                frameInfo.rgbFrames['thermal'], roi=(100, 90, 220, 210)))
+        np.testing.assert_array_equal(
+            analysis.visual.gray,
+            cv2.cvtColor(frameInfo.rgbFrames['visual'], cv2.COLOR_BGR2GRAY))
+        self.assertEqual(analysis.thermalNormalized.dtype, np.uint8)
+        self.assertGreaterEqual(analysis.thermalNormalized.max(), 254)
+
+    def test_products_computed_once(self):
+        frameInfo = makeFrameInfo()
+        analysis = FrameAnalysis(1, frameInfo)
+        self.assertIs(analysis.visual.gray, analysis.visual.gray)
+        self.assertIs(analysis.visual.smoothed, analysis.visual.smoothed)
+        self.assertIs(analysis.thermalNormalized, analysis.thermalNormalized)
+
+        # Two engines' trackers locked on the same ball share searches
+        callList = list()
+
+        def findCircles(frame, roi=None, smoothed=None):
+            callList.append(roi)
+            return findBrightestVisualCircles(frame, roi, smoothed)
+
+        analysis.visual = FrameAnalysis.Sensor(
+            frameInfo.rgbFrames, 'visual', analysis.visual._smooth,
+            findCircles)
+        trackerList = [CircleTracker(), CircleTracker()]
+        for tracker in trackerList:
+            tracker.lastCircle = (160, 150, 18)
+        resultList = [a.find(analysis.visual) for a in trackerList]
+        self.assertEqual(resultList[0], resultList[1])
+        self.assertEqual(len(callList), 1)
+        self.assertEqual(trackerList[1].getStats()['hitCount'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import threading
+import time
+import unittest
+import cv2
+import numpy as np
+
+from flask import Flask
+
+from strikepoint.web.content import ContentManager
+
+
+class ContentManagerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.flask = Flask(__name__)
+        self.contentManager = ContentManager(self.flask, encodeWorkers=0)
+        self.client = self.flask.test_client()
+        self.encodeCount = 0
+
+    def makeFrame(self, value):
+        return np.full((60, 80, 3), value, dtype=np.uint8)
+
+    def countingEncoder(self, frame):
+        def encode():
+            self.encodeCount += 1
+            ok, encoded = cv2.imencode(".jpg", frame)
+            return encoded.tobytes()
+        return encode
+
+    def decode(self, data):
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    def decodePart(self, part):
+        """The image in one part of a multipart MJPEG stream."""
+        return self.decode(part[part.index(b"\r\n\r\n") + 4:-2])
+
+    def openStream(self, client, name):
+        """(response, part iterator) for the MJPEG stream `name`."""
+        response = client.get(f'/content/video/{name}.mjpg', buffered=False)
+        return response, iter(response.response)
+
+    def test_frames_encoded_only_on_demand(self):
+        for value in range(10):
+            self.contentManager.registerVideoFrame(
+                'visual', self.countingEncoder(self.makeFrame(value)))
+        self.assertEqual(self.encodeCount, 0)
+
+        for _ in range(3):
+            response = self.client.get('/content/frame/visual.jpg')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.encodeCount, 1)
+        self.assertAlmostEqual(
+            self.decode(response.data).mean(), 9, delta=2)
+
+        self.assertEqual(
+            self.client.get('/content/frame/thermal.jpg').status_code, 404)
+
+    def test_get_video_frame(self):
+        self.assertIsNone(self.contentManager.getVideoFrame('visual'))
+        self.contentManager.registerVideoFrame(
+            'visual', self.countingEncoder(self.makeFrame(50)))
+        encoded = self.contentManager.getVideoFrame('visual')
+        self.assertEqual(self.contentManager.getVideoFrame('visual'), encoded)
+        self.assertEqual(self.encodeCount, 1)
+        self.assertEqual(self.decode(encoded).shape, (60, 80, 3))
+
+    def test_mjpeg_stream_tracks_subscribers(self):
+        self.contentManager.registerVideoFrame('visual', self.makeFrame(10))
+        self.assertEqual(self.contentManager.getSubscriberCount('visual'), 0)
+
+        response, partIter = self.openStream(self.client, 'visual')
+        first = next(partIter)
+        self.assertEqual(self.contentManager.getSubscriberCount('visual'), 1)
+        self.assertTrue(first.startswith(b"--frame\r\n"))
+
+        self.contentManager.registerVideoFrame('visual', self.makeFrame(200))
+        self.assertAlmostEqual(
+            self.decodePart(next(partIter)).mean(), 200, delta=2)
+
+        response.close()
+        self.assertEqual(self.contentManager.getSubscriberCount('visual'), 0)
+
+    def test_encode_pool_encodes_subscribed_streams(self):
+        flask = Flask(__name__)
+        contentManager = ContentManager(flask, encodeWorkers=2)
+        encodeThreadNames = set()
+        encodedValues = set()
+
+        def encoder(value):
+            def encode():
+                encodeThreadNames.add(threading.current_thread().name)
+                encodedValues.add(value)
+                return self.countingEncoder(self.makeFrame(value))()
+            return encode
+
+        # No subscribers: nothing is encoded ahead of demand
+        contentManager.registerVideoFrame('visual', encoder(1))
+        time.sleep(0.05)
+        self.assertEqual(self.encodeCount, 0)
+
+        response, partIter = self.openStream(flask.test_client(), 'visual')
+        next(partIter)
+        self.assertEqual(self.encodeCount, 1)
+        for value in range(2, 12):
+            contentManager.registerVideoFrame('visual', encoder(value))
+
+        deadline = time.monotonic() + 5.0
+        while 11 not in encodedValues:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.001)
+        self.assertTrue(any(a.startswith('StrikePoint JPEG encoder')
+                            for a in encodeThreadNames))
+        self.assertAlmostEqual(
+            self.decodePart(next(partIter)).mean(), 11, delta=2)
+        response.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
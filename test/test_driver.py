@@ -1,7 +1,8 @@
+import ctypes
 import unittest
 import numpy as np
 
-from strikepoint.driver import SplibDriver
+from strikepoint.driver import FrameBufferPool, SplibDriver
 from logging import getLogger
 
 
@@ -19,6 +20,9 @@ class LeptonDriverTests(unittest.TestCase):
         self.assertIn("frame", info)
         self.assertIn("eventId", info)
         self.assertIn("timestamp_ns", info)
+        self.assertIsInstance(info["audioEvents"], list)
+        self.assertEqual(
+            info["audioStrikeDetected"], len(info["audioEvents"]) > 0)
         self.assertIsInstance(info["frame"], np.ndarray)
         self.assertEqual(info["frame"].shape, (60, 80))
 
@@ -35,6 +39,70 @@ class LeptonDriverTests(unittest.TestCase):
 
         self.assertGreaterEqual(len(entries), 1)
 
+    def test_bulk_log_drain(self):
+        self.splibDriver.getFrameWithMetadata()
+
+        entries = self.splibDriver.drainLogs()
+        self.assertGreaterEqual(len(entries), 1)
+        for level, timestamp, msg in entries:
+            self.assertIn(level, SplibDriver._logLevelMap.values())
+            self.assertGreater(timestamp, 0)
+            self.assertIsInstance(msg, str)
+        self.assertFalse(self.splibDriver.logHasEntries())
+
+    def test_get_stats(self):
+        self.splibDriver.getFrameWithMetadata()
+
+        stats = self.splibDriver.getStats()
+        self.assertGreaterEqual(stats['frameCount'], 1)
+        for name in ('resyncCount', 'retryCount', 'rebootCount',
+                     'staleFrameCount', 'audioDroppedEventCount'):
+            self.assertGreaterEqual(stats[name], 0)
+        timerStats = stats['timers']['SPLIB_LeptonGetFrame']
+        self.assertEqual(timerStats['callCount'], 1)
+        self.assertGreater(timerStats['realSec'], 0.0)
+        self.assertIn('thermal_frame', stats['timers'])
+        self.assertIn('audio_block', stats['timers'])
+
+
+class SplibStructureTests(unittest.TestCase):
+
+    def test_stats_structure_layout(self):
+        # Must match SPLIB_DriverCounters and SPLIB_TimerStats in driver.h
+        self.assertEqual(ctypes.sizeof(SplibDriver.SPLIB_DriverCounters), 72)
+        self.assertEqual(ctypes.sizeof(SplibDriver.SPLIB_TimerStats), 80)
+        self.assertEqual(SplibDriver.SPLIB_TimerStats.elapsedReal.offset, 56)
+
+
+class FrameBufferPoolTests(unittest.TestCase):
+
+    def test_buffers_are_recycled(self):
+        pool = FrameBufferPool((60, 80), np.float32, size=2)
+        a, b = pool.acquire(), pool.acquire()
+        self.assertEqual(a.shape, (60, 80))
+        self.assertEqual(a.dtype, np.float32)
+        self.assertIsNot(a, b)
+        self.assertEqual(pool.allocationCount, 2)
+
+        c = pool.acquire()
+        self.assertEqual(pool.allocationCount, 3)
+        pool.release(a)
+        self.assertIs(pool.acquire(), a)
+
+        pool.release(b)
+        pool.release(c)
+        with self.assertRaises(ValueError):
+            pool.release(c)
+        pool.release(a)
+        self.assertEqual(pool.allocationCount, 3)
+
+    def test_foreign_buffers_rejected(self):
+        pool = FrameBufferPool((60, 80), np.float32, size=1)
+        with self.assertRaises(ValueError):
+            pool.release(np.empty((80, 60), np.float32))
+        with self.assertRaises(ValueError):
+            pool.release(pool.acquire()[::2])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,152 @@
+import threading
+import time
+import unittest
+
+from dataclasses import dataclass
+
+from strikepoint.events import EventBus
+
+
+@dataclass(frozen=True)
+class NumberEvent:
+    value: int
+
+
+@dataclass(frozen=True)
+class OtherEvent:
+    value: int
+
+
+class EventBusTests(unittest.TestCase):
+
+    def test_sync_pump_limit_and_count(self):
+        eventBus = EventBus()
+        seenList, batchList = list(), list()
+        eventBus.subscribe(NumberEvent, lambda a: seenList.append(a.value))
+        eventBus.subscribe(OtherEvent, batchList.append,
+                           policy=EventBus.DeliveryPolicy.BATCH)
+        for i in range(5):
+            eventBus.publish(NumberEvent(i))
+        eventBus.publish(OtherEvent(9))
+
+        self.assertEqual(eventBus.pump(maxEvents=2), 2)
+        self.assertEqual(seenList, [0, 1])
+        self.assertEqual(eventBus.pump(), 4)
+        self.assertEqual(seenList, [0, 1, 2, 3, 4])
+        self.assertEqual(batchList, [[OtherEvent(9)]])
+        self.assertEqual(eventBus.pump(), 0)
+
+    def test_unsubscribe_unknown_handler(self):
+        eventBus = EventBus()
+        eventBus.subscribe(NumberEvent, print)
+        with self.assertRaises(ValueError):
+            eventBus.unsubscribe(NumberEvent, repr)
+        with self.assertRaises(ValueError):
+            eventBus.unsubscribe(OtherEvent, print)
+        eventBus.unsubscribe(NumberEvent, print)
+        self.assertEqual(eventBus.getStats(), dict())
+
+    def test_handler_errors_are_counted(self):
+        eventBus = EventBus()
+
+        def handler(event):
+            raise RuntimeError("boom")
+
+        eventBus.subscribe(NumberEvent, handler)
+        eventBus.publish(NumberEvent(1))
+        self.assertEqual(eventBus.pump(), 1)
+        stats = eventBus.getStats()[f"NumberEvent:{handler.__qualname__}"]
+        self.assertEqual(stats['errorCount'], 1)
+        self.assertEqual(stats['deliveredCount'], 1)
+
+    def test_async_slow_subscriber_does_not_block_publisher(self):
+        eventBus = EventBus(asyncDispatch=True)
+        release = threading.Event()
+        latestList, losslessList, batchList = list(), list(), list()
+
+        def slowHandler(event):
+            release.wait()
+            latestList.append(event.value)
+
+        eventBus.subscribe(NumberEvent, slowHandler,
+                           policy=EventBus.DeliveryPolicy.LATEST_ONLY)
+        eventBus.subscribe(NumberEvent, lambda a: losslessList.append(a.value))
+        eventBus.subscribe(OtherEvent, batchList.append,
+                           policy=EventBus.DeliveryPolicy.BATCH)
+
+        startTime = time.monotonic()
+        for i in range(20):
+            eventBus.publish(NumberEvent(i))
+        self.assertLess(time.monotonic() - startTime, 1.0)
+        release.set()
+        eventBus.drain()
+
+        # The slow handler saw whatever it was given first, then only the
+        # newest event; the lossless one saw everything in order
+        self.assertEqual(latestList[-1], 19)
+        self.assertLessEqual(len(latestList), 2)
+        self.assertEqual(losslessList, list(range(20)))
+
+        statsMap = eventBus.getStats()
+        latestStats = statsMap[f"NumberEvent:{slowHandler.__qualname__}"]
+        self.assertEqual(latestStats['policy'], 'latest-only')
+        self.assertEqual(latestStats['deliveredCount'] +
+                         latestStats['droppedCount'], 20)
+        self.assertEqual(latestStats['queueDepth'], 0)
+
+        for i in range(5):
+            eventBus.publish(OtherEvent(i))
+        eventBus.drain()
+        self.assertEqual([a.value for b in batchList for a in b],
+                         list(range(5)))
+        self.assertTrue(all(isinstance(a, list) for a in batchList))
+        eventBus.close()
+
+    def test_async_lossless_blocks_when_full(self):
+        eventBus = EventBus(asyncDispatch=True)
+        release = threading.Event()
+        seenList = list()
+
+        def handler(event):
+            release.wait()
+            seenList.append(event.value)
+
+        eventBus.subscribe(NumberEvent, handler, maxQueue=2)
+        publisher = threading.Thread(
+            target=lambda: [eventBus.publish(NumberEvent(i))
+                            for i in range(6)])
+        publisher.start()
+        publisher.join(timeout=0.2)
+        self.assertTrue(publisher.is_alive())
+
+        release.set()
+        publisher.join()
+        eventBus.drain()
+        self.assertEqual(seenList, list(range(6)))
+        stats = next(iter(eventBus.getStats().values()))
+        self.assertEqual(stats['maxQueueDepth'], 2)
+        self.assertEqual(stats['droppedCount'], 0)
+        eventBus.close()
+
+    def test_async_handler_can_publish_to_its_own_full_queue(self):
+        eventBus = EventBus(asyncDispatch=True)
+        seenList = list()
+        done = threading.Event()
+
+        def handler(event):
+            seenList.append(event.value)
+            if event.value == 0:
+                for i in range(1, 4):
+                    eventBus.publish(NumberEvent(i))
+            if len(seenList) == 4:
+                done.set()
+
+        eventBus.subscribe(NumberEvent, handler, maxQueue=1)
+        eventBus.publish(NumberEvent(0))
+        self.assertTrue(done.wait(timeout=5))
+        self.assertEqual(seenList, list(range(4)))
+        eventBus.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
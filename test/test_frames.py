@@ -1,9 +1,29 @@
+import os
 import tempfile
+import threading
+import time
 import unittest
 import cv2
 import numpy as np
 
-from strikepoint.frames import FrameInfo, FrameInfoWriter, FrameInfoReader
+from struct import pack
+from msgpack import packb
+
+from strikepoint.frames import FrameInfo, FrameInfoWriter, FrameInfoReader, \
+    BackgroundFrameInfoWriter, TimestampedFrameRing, \
+    FileBasedFrameInfoProvider
+
+
+class StalledFrameInfoWriter(FrameInfoWriter):
+    """Holds every write until `release` is set, like a stalled disk."""
+
+    def __init__(self, fileName, release):
+        super().__init__(fileName)
+        self.release = release
+
+    def writeFrameInfo(self, frameInfo):
+        self.release.wait()
+        super().writeFrameInfo(frameInfo)
 
 
 class FrameInfoTests(unittest.TestCase):
@@ -78,6 +98,411 @@ class FrameInfoTests(unittest.TestCase):
         # self.assertTrue(np.array_equal(allFrames[0].rgbFrames["a"], img1))
         # self.assertTrue(np.array_equal(allFrames[1].rgbFrames["b"], img2))
 
+    def writeRecording(self, fileName, frameCount=10):
+        with FrameInfoWriter(fileName) as writer:
+            for i in range(frameCount):
+                fi = FrameInfo(timestamp=100.0 + 0.5 * i)
+                fi.rawFrames['thermal'] = np.full(
+                    (60, 80), i, dtype=np.float32)
+                fi.rgbFrames['visual'] = self.makeColorImage(80, 60)
+                fi.metadata = {"i": i}
+                writer.writeFrameInfo(fi)
+
+    def assertFrameAt(self, frameInfo, i):
+        self.assertIsNotNone(frameInfo)
+        self.assertEqual(frameInfo.metadata["i"], i)
+        self.assertEqual(frameInfo.timestamp, 100.0 + 0.5 * i)
+
+    def test_seek_and_random_access(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, "recording.bin")
+            self.writeRecording(fileName)
+
+            with FrameInfoReader(fileName) as reader:
+                self.assertEqual(len(reader), 10)
+                reader.seek(7)
+                self.assertEqual(reader.tell(), 7)
+                self.assertFrameAt(reader.readFrameInfo(), 7)
+                self.assertFrameAt(reader.readFrameInfo(), 8)
+
+                self.assertEqual(reader.seekTime(101.2), 2)
+                self.assertFrameAt(reader.readFrameInfo(), 2)
+                self.assertEqual(reader.seekTime(0.0), 0)
+                self.assertEqual(reader.seekTime(1e9), 9)
+
+                # Random access leaves the sequential cursor alone
+                self.assertFrameAt(reader[-1], 9)
+                self.assertEqual(
+                    [a.metadata["i"] for a in reader[2:8:2]], [2, 4, 6])
+                self.assertFrameAt(reader.readFrameInfo(), 9)
+                self.assertIsNone(reader.readFrameInfo())
+
+                reader.seek(len(reader))
+                self.assertIsNone(reader.readFrameInfo())
+                with self.assertRaises(IndexError):
+                    reader.seek(11)
+                with self.assertRaises(IndexError):
+                    reader[10]
+
+    def writeLegacyRecording(self, fileName, frameCount=4):
+        # Format v2: embedded raw bytes, no end marker and no index
+        with open(fileName, "wb") as f:
+            f.write(b'STRKPT25' + pack(">I", 2))
+            for i in range(frameCount):
+                thermal = np.full((60, 80), i, dtype=np.float32)
+                frame = packb(dict(
+                    mapVersion=3, timestamp=100.0 + 0.5 * i,
+                    metadata={"i": i}, rgbFrames=dict(),
+                    rawFrames=dict(thermal={
+                        "shape": list(thermal.shape),
+                        "dtype": str(thermal.dtype),
+                        "bytes": thermal.tobytes()})))
+                f.write(pack(">I", len(frame)))
+                f.write(frame)
+
+    def test_index_rebuilt_for_legacy_recording(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, "recording.bin")
+            self.writeLegacyRecording(fileName, frameCount=4)
+
+            with FrameInfoReader(fileName) as reader:
+                self.assertEqual(len(reader), 4)
+                self.assertEqual(reader.seekTime(101.0), 2)
+                self.assertFrameAt(reader.readFrameInfo(), 2)
+                self.assertFrameAt(reader.readFrameInfo(), 3)
+                self.assertIsNone(reader.readFrameInfo())
+                reader.rewind()
+                allFrames = reader.readAllFrameInfo()
+            self.assertEqual(len(allFrames), 4)
+            self.assertTrue(np.all(allFrames[3].rawFrames['thermal'] == 3))
+
+    def test_unsupported_format_version_rejected(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, "recording.bin")
+            self.writeRecording(fileName)
+            with open(fileName, "rb") as f:
+                self.assertEqual(f.read(12), b'STRKPT25' + pack(">I", 3))
+            with open(fileName, "r+b") as f:
+                f.seek(8)
+                f.write(pack(">I", 4))
+            with self.assertRaises(RuntimeError):
+                FrameInfoReader(fileName)
+
+    def test_mmap_reader_returns_views(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, "recording.bin")
+            self.writeRecording(fileName)
+            legacyFileName = os.path.join(tempDir, "legacy.bin")
+            self.writeLegacyRecording(legacyFileName)
+
+            with FrameInfoReader(fileName, useMmap=True) as reader:
+                allFrames = reader.readAllFrameInfo()
+                self.assertFrameAt(reader[4], 4)
+            self.assertEqual(len(allFrames), 10)
+            for i, frameInfo in enumerate(allFrames):
+                thermal = frameInfo.rawFrames['thermal']
+                self.assertEqual(thermal.shape, (60, 80))
+                self.assertEqual(thermal.dtype, np.float32)
+                self.assertFalse(thermal.flags.writeable)
+                self.assertFalse(thermal.flags.owndata)
+                self.assertEqual(thermal.ctypes.data % 16, 0)
+                self.assertTrue(np.all(thermal == i))
+                self.assertEqual(
+                    frameInfo.rgbFrames['visual'].shape, (60, 80, 3))
+
+            with FrameInfoReader(legacyFileName, useMmap=True) as reader:
+                self.assertEqual(len(reader.readAllFrameInfo()), 4)
+
+    def test_rgb_frames_decoded_on_demand(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, "recording.bin")
+            copyFileName = os.path.join(tempDir, "copy.bin")
+            self.writeRecording(fileName, frameCount=3)
+
+            with FrameInfoReader(fileName) as reader:
+                frameInfo = reader.readFrameInfo()
+                self.assertIn('visual', frameInfo.rgbFrames)
+                self.assertFalse(frameInfo.rgbFrames.isDecoded('visual'))
+                encoded = frameInfo.rgbFrames.getEncoded('visual')
+                self.assertEqual(
+                    frameInfo.rgbFrames['visual'].shape, (60, 80, 3))
+                self.assertTrue(frameInfo.rgbFrames.isDecoded('visual'))
+
+                frameInfo = reader.readFrameInfo()
+                frameInfo.rgbFrames.decodeAll()
+                self.assertTrue(all(frameInfo.rgbFrames.isDecoded(a)
+                                    for a in frameInfo.rgbFrames))
+
+                # Still-encoded frames are copied through unchanged
+                reader.rewind()
+                with FrameInfoWriter(copyFileName) as writer:
+                    writer.writeFrameInfo(reader.readFrameInfo())
+            with FrameInfoReader(copyFileName) as reader:
+                frameInfo = reader.readFrameInfo()
+            self.assertEqual(
+                frameInfo.rgbFrames.getEncoded('visual'), encoded)
+
+    def test_decode_cache_shared_across_reads(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, "recording.bin")
+            self.writeRecording(fileName, frameCount=3)
+
+            with FrameInfoReader(fileName, decodeCacheSize=2) as reader:
+                first = reader[1].rgbFrames['visual']
+                self.assertIs(reader[1].rgbFrames['visual'], first)
+                self.assertFalse(first.flags.writeable)
+                reader[0].rgbFrames['visual']
+                reader[2].rgbFrames['visual']
+                self.assertIsNot(reader[1].rgbFrames['visual'], first)
+
+    def test_rgb_frames_encoded_once(self):
+        frameInfo = self.makeFrameInfo(1)
+        self.assertFalse(frameInfo.rgbFrames.isEncoded('visual'))
+        encoded = frameInfo.rgbFrames.getEncoded('visual')
+        self.assertIs(frameInfo.rgbFrames.getEncoded('visual'), encoded)
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, "recording.bin")
+            with FrameInfoWriter(fileName) as writer:
+                writer.writeFrameInfo(frameInfo)
+            with FrameInfoReader(fileName) as reader:
+                self.assertEqual(
+                    reader[0].rgbFrames.getEncoded('visual'), encoded)
+
+        # Replacing a frame drops its cached encoding
+        frameInfo.rgbFrames['visual'] = self.makeColorImage(40, 30)
+        self.assertFalse(frameInfo.rgbFrames.isEncoded('visual'))
+        self.assertNotEqual(frameInfo.rgbFrames.getEncoded('visual'), encoded)
+
+    def makeFrameInfo(self, i):
+        fi = FrameInfo(timestamp=float(i))
+        fi.rawFrames['thermal'] = np.full((60, 80), i, dtype=np.float32)
+        fi.rgbFrames['visual'] = self.makeColorImage(80, 60)
+        fi.metadata = {"i": i}
+        return fi
+
+    def writeWithStalledWriter(self, fileName, policy, frameCount=5):
+        release = threading.Event()
+        writer = BackgroundFrameInfoWriter(
+            fileName, maxQueue=2, overflowPolicy=policy,
+            writerFactory=lambda a: StalledFrameInfoWriter(a, release))
+
+        writer.writeFrameInfo(self.makeFrameInfo(0))
+        while writer.queueDepth > 0:
+            time.sleep(0.001)
+        results = [writer.writeFrameInfo(self.makeFrameInfo(i))
+                   for i in range(1, frameCount)]
+        self.assertEqual(writer.queueDepth, 2)
+        release.set()
+        writer.close()
+        return writer, results
+
+    def test_background_writer_round_trip(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, "recording.bin")
+            with BackgroundFrameInfoWriter(fileName, maxQueue=4) as writer:
+                for i in range(20):
+                    self.assertTrue(
+                        writer.writeFrameInfo(self.makeFrameInfo(i)))
+                writer.flush()
+                self.assertEqual(writer.queueDepth, 0)
+            self.assertEqual(writer.writtenFrameCount, 20)
+            self.assertEqual(writer.droppedFrameCount, 0)
+
+            with FrameInfoReader(fileName) as reader:
+                self.assertEqual(
+                    [a.metadata["i"] for a in reader[:]], list(range(20)))
+
+    def test_background_writer_overflow_policies(self):
+        policy = BackgroundFrameInfoWriter.OverflowPolicy
+        expectedMap = {
+            policy.DROP_OLDEST: ([True] * 4, [0, 3, 4]),
+            policy.DROP_NEWEST: ([True, True, False, False], [0, 1, 2]),
+        }
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, "recording.bin")
+            for overflowPolicy, expected in expectedMap.items():
+                writer, results = self.writeWithStalledWriter(
+                    fileName, overflowPolicy)
+                self.assertEqual(results, expected[0])
+                self.assertEqual(writer.droppedFrameCount, 2)
+                with FrameInfoReader(fileName) as reader:
+                    self.assertEqual(
+                        [a.metadata["i"] for a in reader[:]], expected[1])
+
+    def test_background_writer_close_wakes_blocked_producer(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, "recording.bin")
+            release = threading.Event()
+            writer = BackgroundFrameInfoWriter(
+                fileName, maxQueue=1,
+                writerFactory=lambda a: StalledFrameInfoWriter(a, release))
+
+            writer.writeFrameInfo(self.makeFrameInfo(0))
+            while writer.queueDepth > 0:
+                time.sleep(0.001)
+            writer.writeFrameInfo(self.makeFrameInfo(1))
+
+            errorList = list()
+
+            def produce():
+                try:
+                    writer.writeFrameInfo(self.makeFrameInfo(2))
+                except RuntimeError as ex:
+                    errorList.append(ex)
+            producer = threading.Thread(target=produce, daemon=True)
+            producer.start()
+            time.sleep(0.05)
+            closer = threading.Thread(target=writer.close, daemon=True)
+            closer.start()
+            try:
+                producer.join(timeout=1)
+                self.assertFalse(producer.is_alive())
+                self.assertEqual(len(errorList), 1)
+            finally:
+                release.set()
+                closer.join(timeout=5)
+            with FrameInfoReader(fileName) as reader:
+                self.assertEqual(
+                    [a.metadata["i"] for a in reader[:]], [0, 1])
+
+
+class TimestampedFrameRingTests(unittest.TestCase):
+
+    def test_wait_for_next_walks_frames_in_order(self):
+        ring = TimestampedFrameRing(size=3)
+        for i in range(5):
+            ring.put(1000 * i, f"frame{i}")
+
+        # Frames 0 and 1 were overwritten, so the walk resumes at frame 2
+        seq, entryList = 0, list()
+        while (entry := ring.waitForNext(seq, timeout=0)) is not None:
+            seq = entry[0]
+            entryList.append(entry)
+        self.assertEqual([a[0] for a in entryList], [3, 4, 5])
+        self.assertEqual([a[2] for a in entryList],
+                         ["frame2", "frame3", "frame4"])
+
+    def test_closest(self):
+        ring = TimestampedFrameRing(size=4)
+        self.assertIsNone(ring.closest(0))
+        for timestampNs in (100, 200, 300, 400):
+            ring.put(timestampNs, timestampNs)
+        self.assertEqual(ring.closest(0)[2], 100)
+        self.assertEqual(ring.closest(240)[2], 200)
+        self.assertEqual(ring.closest(260)[2], 300)
+        self.assertEqual(ring.closest(10000)[2], 400)
+
+    def test_events_of_overwritten_frames_are_kept(self):
+        ring = TimestampedFrameRing(size=2)
+        for seq in range(1, 7):
+            ring.put(seq * 100, seq,
+                     events=[dict(eventSeq=seq)] if seq % 2 else None)
+
+        # Frames 1-4 were overwritten, but not the events they came with
+        seq, _, frame = ring.waitForNext(0, timeout=5)
+        self.assertEqual((seq, frame), (5, 5))
+        self.assertEqual([a['eventSeq'] for a in ring.takeEvents(seq)],
+                         [1, 3, 5])
+        self.assertEqual(ring.takeEvents(seq), [])
+
+        ring.put(700, 7, events=[dict(eventSeq=7)])
+        ring.put(800, 8, events=[dict(eventSeq=8)])
+        self.assertEqual([a['eventSeq'] for a in ring.takeEvents(7)], [7])
+        self.assertEqual([a['eventSeq'] for a in ring.takeEvents(8)], [8])
+
+    def test_wait_across_threads_and_close(self):
+        ring = TimestampedFrameRing()
+        producer = threading.Timer(0.05, ring.put, args=(123, "late"))
+        producer.start()
+        self.assertEqual(ring.waitForNext(0, timeout=5), (1, 123, "late"))
+        producer.join()
+
+        closer = threading.Timer(0.05, ring.close)
+        closer.start()
+        self.assertIsNone(ring.waitForNext(1, timeout=5))
+        closer.join()
+
+
+class FileBasedFrameInfoProviderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.fileName = os.path.join(self.tempDir.name, "frames.bin")
+        visual = np.zeros((60, 80, 3), dtype=np.uint8)
+        with FrameInfoWriter(self.fileName) as writer:
+            for i in range(5):
+                frameInfo = FrameInfo(timestamp=100.0 + 0.05 * i)
+                frameInfo.rgbFrames['visual'] = visual
+                frameInfo.metadata = {"frame_index": i}
+                writer.writeFrameInfo(frameInfo)
+
+    def tearDown(self):
+        self.tempDir.cleanup()
+
+    def makeProvider(self, **kwargs):
+        provider = FileBasedFrameInfoProvider(self.fileName, **kwargs)
+        self.addCleanup(provider.close)
+        return provider
+
+    def test_prefetched_frames_are_decoded_and_loop(self):
+        provider = self.makeProvider(paced=False, prefetchCount=3)
+        indexList = list()
+        for _ in range(12):
+            frameInfo = provider.getFrameInfo()
+            self.assertTrue(frameInfo.rgbFrames.isDecoded('visual'))
+            indexList.append(frameInfo.metadata["frame_index"])
+        self.assertEqual(indexList, [0, 1, 2, 3, 4] * 2 + [0, 1])
+        self.assertGreaterEqual(provider.loopCount, 2)
+        self.assertLessEqual(provider.queueDepth, 3)
+
+    def test_paced_playback_is_seamless_across_loops(self):
+        provider = self.makeProvider()
+        startTime = time.monotonic()
+        for _ in range(11):
+            provider.getFrameInfo()
+        # Ten frame periods, including the one between the loops
+        self.assertGreaterEqual(time.monotonic() - startTime, 0.45)
+
+    def test_unindexed_recording_not_scanned_up_front(self):
+        # Format v2: no index, so timestamps() would read every record
+        with open(self.fileName, "wb") as f:
+            f.write(b'STRKPT25' + pack(">I", 2))
+            for i in range(3):
+                frame = packb(dict(
+                    mapVersion=3, timestamp=100.0 + 0.05 * i,
+                    metadata={"frame_index": i}, rgbFrames=dict(),
+                    rawFrames=dict()))
+                f.write(pack(">I", len(frame)))
+                f.write(frame)
+
+        with self.assertLogs("strikepoint", level="DEBUG") as logs:
+            provider = self.makeProvider()
+            startTime = time.monotonic()
+            indexList = [provider.getFrameInfo().metadata["frame_index"]
+                         for _ in range(7)]
+            provider.close()
+        self.assertEqual(indexList, [0, 1, 2, 0, 1, 2, 0])
+        # Six frame periods, the loop gap taken from the frames seen
+        self.assertGreaterEqual(time.monotonic() - startTime, 0.27)
+        self.assertIn("Rewound recording file", " ".join(logs.output))
+        self.assertNotIn("Rebuilding recording index", " ".join(logs.output))
+
+    def test_seek_discards_prefetched_frames(self):
+        provider = self.makeProvider(paced=False)
+        self.assertEqual(provider.getFrameInfo().metadata["frame_index"], 0)
+        provider.seek(3)
+        self.assertEqual(provider.getFrameInfo().metadata["frame_index"], 3)
+        self.assertEqual(provider.seekTime(100.06), 1)
+        self.assertEqual(provider.getFrameInfo().metadata["frame_index"], 1)
+        self.assertEqual(provider.getFrameInfo().metadata["frame_index"], 2)
+
+    def test_closed_provider_raises(self):
+        provider = self.makeProvider(paced=False)
+        provider.close()
+        with self.assertRaises(RuntimeError):
+            provider.getFrameInfo()
+
 
 if __name__ == "__main__":
     unittest.main()
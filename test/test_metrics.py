@@ -0,0 +1,88 @@
+import time
+import unittest
+
+from strikepoint.metrics import MetricsRegistry, RollingHistogram
+from strikepoint.web.app import driverCounterMap
+
+
+class MetricsTests(unittest.TestCase):
+
+    def test_histogram_percentiles_and_window(self):
+        histogram = RollingHistogram(windowSec=10.0)
+        for i in range(100):
+            histogram.record((i + 1) / 1000, now=100.0 + i * 0.05)
+
+        stats = histogram.getStats(now=105.0)
+        self.assertEqual(stats['count'], 100)
+        self.assertAlmostEqual(stats['p50'], 0.0505, places=6)
+        self.assertAlmostEqual(stats['p95'], 0.09505, places=6)
+        self.assertAlmostEqual(stats['max'], 0.1)
+        self.assertAlmostEqual(stats['rate'], 100 / 5.0)
+
+        # Only the samples from the last 10s remain, lifetime totals don't
+        stats = histogram.getStats(now=112.0)
+        self.assertEqual(stats['count'], 60)
+        self.assertAlmostEqual(stats['p50'], 0.0705, places=6)
+        self.assertEqual(stats['totalCount'], 100)
+        self.assertAlmostEqual(stats['totalSec'], 5.05)
+
+        stats = histogram.getStats(now=200.0)
+        self.assertEqual(stats['count'], 0)
+        self.assertEqual(stats['rate'], 0.0)
+
+    def test_registry_timing_and_prometheus(self):
+        metrics = MetricsRegistry()
+        with metrics.time('acquire'):
+            time.sleep(0.01)
+        metrics.record('engine.detection', 0.002)
+
+        statsMap = metrics.getStats()
+        self.assertEqual(list(statsMap), ['acquire', 'engine.detection'])
+        self.assertGreaterEqual(statsMap['acquire']['p50'], 0.01)
+
+        text = metrics.toPrometheus(gaugeMap=dict(
+            recording_queue_depth=3,
+            event_queue_depth=[(dict(handler='FrameEvent:"x"'), 2)]),
+            counterMap=dict(event_dropped_total=[(dict(handler='y'), 5)]))
+        lineList = text.splitlines()
+        self.assertIn("# TYPE strikepoint_stage_seconds summary", lineList)
+        self.assertIn(
+            'strikepoint_stage_seconds{stage="engine.detection",'
+            'quantile="0.95"} 0.002', lineList)
+        self.assertIn(
+            'strikepoint_stage_seconds_count{stage="acquire"} 1', lineList)
+        self.assertIn("strikepoint_recording_queue_depth 3", lineList)
+        self.assertIn(
+            'strikepoint_event_queue_depth{handler="FrameEvent:\\"x\\""} 2',
+            lineList)
+        self.assertIn("# TYPE strikepoint_recording_queue_depth gauge",
+                      lineList)
+        self.assertIn("# TYPE strikepoint_event_dropped_total counter",
+                      lineList)
+        self.assertIn('strikepoint_event_dropped_total{handler="y"} 5',
+                      lineList)
+        self.assertTrue(text.endswith("\n"))
+
+    def test_driver_stats_exported_as_counters(self):
+        driverStats = dict(frameCount=90, resyncCount=2, timers=dict(
+            thermal_frame=dict(callCount=90, realSec=10.0, userSec=0.5,
+                               sysSec=0.25)))
+        text = MetricsRegistry().toPrometheus(
+            counterMap=driverCounterMap(driverStats))
+        lineList = text.splitlines()
+        for name in ('events', 'calls', 'seconds'):
+            self.assertIn(
+                f"# TYPE strikepoint_driver_{name}_total counter", lineList)
+        self.assertIn(
+            'strikepoint_driver_events_total{counter="resyncCount"} 2',
+            lineList)
+        self.assertIn(
+            'strikepoint_driver_calls_total{timer="thermal_frame"} 90',
+            lineList)
+        self.assertIn(
+            'strikepoint_driver_seconds_total{timer="thermal_frame",'
+            'clock="sys"} 0.25', lineList)
+
+
+if __name__ == "__main__":
+    unittest.main()
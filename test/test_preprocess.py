@@ -0,0 +1,79 @@
+import unittest
+import cv2
+import numpy as np
+
+from strikepoint.preprocess import ThermalPreprocessor, VisualPreprocessor
+
+
+class PreprocessTests(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(1234)
+
+    def test_visual_matches_step_by_step(self):
+        # Include shapes that don't scale by a whole factor
+        for shape in ((480, 640, 3), (240, 320, 3), (233, 311, 3)):
+            frame = self.rng.integers(0, 256, shape, dtype=np.uint8)
+
+            # The camera chain used by DeviceBasedFrameInfoProvider
+            expected = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            expected = cv2.rotate(expected, cv2.ROTATE_180)
+            expected = cv2.flip(expected, 0)
+            expected = cv2.flip(expected, 1)
+            expected = cv2.resize(expected, (320, 240),
+                                  interpolation=cv2.INTER_NEAREST)
+            preprocessor = VisualPreprocessor(shape, (320, 240))
+            np.testing.assert_array_equal(
+                preprocessor.process(frame), expected)
+
+            for flipCode in (0, 1, -1):
+                expected = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+                expected = cv2.flip(expected, flipCode)
+                expected = cv2.resize(expected, (320, 240),
+                                      interpolation=cv2.INTER_NEAREST)
+                preprocessor = VisualPreprocessor(
+                    shape, (320, 240), flipCode=flipCode)
+                np.testing.assert_array_equal(
+                    preprocessor.process(frame), expected)
+
+    def test_thermal_matches_step_by_step(self):
+        frame = (70 + self.rng.normal(0, 3, (60, 80))).astype(np.float32)
+
+        expectedRaw = cv2.flip(cv2.flip(frame, 0), 1)
+        expectedRgb = cv2.resize(expectedRaw, (320, 240),
+                                 interpolation=cv2.INTER_NEAREST)
+        expectedRgb = cv2.normalize(
+            expectedRgb, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+        expectedRgb = cv2.applyColorMap(expectedRgb, cv2.COLORMAP_HOT)
+
+        preprocessor = ThermalPreprocessor((60, 80), (320, 240), flipCode=-1)
+        raw, rgb = preprocessor.process(frame)
+        np.testing.assert_array_equal(raw, expectedRaw)
+        np.testing.assert_array_equal(rgb, expectedRgb)
+
+    def test_outputs_are_not_shared(self):
+        visual = VisualPreprocessor((480, 640, 3), (320, 240))
+        thermal = ThermalPreprocessor((60, 80), (320, 240), flipCode=-1)
+        frameList = [
+            (self.rng.integers(0, 256, (480, 640, 3), dtype=np.uint8),
+             self.rng.normal(70, 3, (60, 80)).astype(np.float32))
+            for _ in range(2)]
+        resultList = [(visual.process(v), *thermal.process(t))
+                      for v, t in frameList]
+        for first, second in zip(*resultList):
+            self.assertFalse(np.shares_memory(first, second))
+            self.assertFalse(np.array_equal(first, second))
+
+        # Caller-provided buffers are written in place
+        out = np.empty((240, 320, 3), dtype=np.uint8)
+        self.assertIs(visual.process(frameList[0][0], out=out), out)
+        np.testing.assert_array_equal(out, resultList[0][0])
+
+    def test_rejects_unexpected_shape(self):
+        preprocessor = VisualPreprocessor((480, 640, 3), (320, 240))
+        with self.assertRaises(ValueError):
+            preprocessor.process(np.zeros((240, 320, 3), dtype=np.uint8))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from strikepoint.frames import FrameInfoWriter
+from strikepoint.replay import ReplayRunner, main, replayRecordings
+from test.test_strike import FRAME_PERIOD_NS, THERMAL_TO_VISUAL, \
+    makeFrameInfo
+
+
+def writeStrikeRecording(fileName):
+    strikeNs = 2 * FRAME_PERIOD_NS + FRAME_PERIOD_NS // 2
+    with FrameInfoWriter(fileName) as writer:
+        for i in range(8):
+            writer.writeFrameInfo(makeFrameInfo(
+                i, ballPresent=i <= 2, warmPatch=i > 2,
+                audioEvents=[strikeNs] if i == 3 else []))
+    return strikeNs
+
+
+class ReplayTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.fileName = os.path.join(self.tempDir.name, "strike.bin")
+        self.strikeNs = writeStrikeRecording(self.fileName)
+
+    def tearDown(self):
+        self.tempDir.cleanup()
+
+    def test_replay_finds_strike(self):
+        result = ReplayRunner(THERMAL_TO_VISUAL).run(self.fileName)
+
+        self.assertEqual(result['frameCount'], 8)
+        self.assertEqual(len(result['strikes']), 1)
+        strike = result['strikes'][0]
+        self.assertEqual(strike['strikeNs'], self.strikeNs)
+        self.assertEqual(strike['frameIndex'], 3)
+        self.assertGreater(strike['leftScore'], strike['rightScore'])
+
+    def test_max_frames_stops_early(self):
+        result = ReplayRunner(THERMAL_TO_VISUAL).run(
+            self.fileName, maxFrames=3)
+        self.assertEqual(result['frameCount'], 3)
+        self.assertEqual(result['strikes'], [])
+
+    def test_transform_or_calibrate_required(self):
+        with self.assertRaises(ValueError):
+            ReplayRunner()
+
+    def test_parallel_replay_keeps_order_and_reports_errors(self):
+        missingName = os.path.join(self.tempDir.name, "missing.bin")
+        resultList = replayRecordings(
+            [missingName, self.fileName], jobs=2,
+            thermalVisualTransform=THERMAL_TO_VISUAL)
+
+        self.assertEqual([a['recording'] for a in resultList],
+                         [missingName, self.fileName])
+        self.assertIn('error', resultList[0])
+        self.assertEqual(len(resultList[1]['strikes']), 1)
+
+    def test_command_line_writes_json_and_csv(self):
+        transformName = os.path.join(self.tempDir.name, "transform.json")
+        jsonName = os.path.join(self.tempDir.name, "strikes.json")
+        csvName = os.path.join(self.tempDir.name, "strikes.csv")
+        with open(transformName, "w") as file:
+            json.dump(THERMAL_TO_VISUAL.tolist(), file)
+
+        main([self.fileName, "-t", transformName, "-o", jsonName,
+              "--csv", csvName, "-j", "1"])
+
+        with open(jsonName) as file:
+            resultList = json.load(file)
+        self.assertEqual(len(resultList[0]['strikes']), 1)
+        with open(csvName, newline="") as file:
+            rowList = list(csv.DictReader(file))
+        self.assertEqual(len(rowList), 1)
+        self.assertEqual(rowList[0]['recording'], self.fileName)
+        self.assertEqual(int(rowList[0]['strikeNs']), self.strikeNs)
+
+
+if __name__ == '__main__':
+    unittest.main()
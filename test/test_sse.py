@@ -0,0 +1,36 @@
+import json
+import unittest
+
+from strikepoint.web.sse import SSEManager
+
+
+class SSEManagerTests(unittest.TestCase):
+
+    def test_push_reaches_subscribers_until_unsubscribed(self):
+        sseManager = SSEManager()
+        first, second = sseManager.subscribe(), sseManager.subscribe()
+        sseManager.push('strike_detected', dict(left_score=0.25))
+        sseManager.unsubscribe(second)
+        sseManager.push('cal_phase', dict(phase=1))
+
+        self.assertEqual(
+            first.get_nowait(),
+            'event: strike_detected\ndata: {"left_score": 0.25}\n\n')
+        payload = first.get_nowait()
+        self.assertTrue(payload.startswith('event: cal_phase\n'))
+        self.assertEqual(json.loads(payload.split('data: ')[1]),
+                         dict(phase=1))
+        self.assertEqual(second.qsize(), 1)
+
+    def test_full_clients_are_dropped(self):
+        sseManager = SSEManager()
+        client = sseManager.subscribe(maxsize=1)
+        sseManager.push('a', dict())
+        sseManager.push('b', dict())
+        sseManager.push('c', dict())
+        self.assertEqual(client.qsize(), 1)
+        self.assertTrue(client.get_nowait().startswith('event: a\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import threading
+import time
+import unittest
+import cv2
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+
+from strikepoint.events import EventBus
+from strikepoint.frames import FrameInfo
+from strikepoint.engine.strike import StrikeDetectionEngine, StrikeDetectedEvent
+
+# Thermal RGB frames are already resized to match the visual frames
+THERMAL_TO_VISUAL = np.float32([[1, 0, 0], [0, 1, 0]])
+FRAME_PERIOD_NS = 100_000_000
+
+
+def makeFrameInfo(index, ballPresent, warmPatch=False, audioEvents=None,
+                  audioStrikeDetected=None, ballCenter=(160, 150),
+                  secondBallCenter=None):
+    rng = np.random.default_rng(index)
+    visual = np.full((240, 320, 3), 40, dtype=np.uint8)
+    visual += rng.integers(0, 10, visual.shape, dtype=np.uint8)
+    if ballPresent:
+        cv2.circle(visual, ballCenter, 18, (230, 230, 230), -1)
+    if secondBallCenter is not None:
+        cv2.circle(visual, secondBallCenter, 18, (230, 230, 230), -1)
+
+    thermal = np.full((60, 80), 70.0, dtype=np.float32)
+    thermal += rng.normal(0, 0.05, thermal.shape).astype(np.float32)
+    if warmPatch:
+        cv2.circle(thermal, (34, 38), 4, 80.0, -1)
+    thermalRgb = cv2.resize(thermal, (320, 240),
+                            interpolation=cv2.INTER_NEAREST)
+    thermalRgb = cv2.normalize(
+        thermalRgb, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+    frameInfo = FrameInfo(timestamp=index * FRAME_PERIOD_NS / 1e9)
+    frameInfo.rawFrames['thermal'] = thermal
+    frameInfo.rgbFrames['visual'] = visual
+    frameInfo.rgbFrames['thermal'] = cv2.applyColorMap(
+        thermalRgb, cv2.COLORMAP_HOT)
+    frameInfo.metadata['timestamp_ns'] = index * FRAME_PERIOD_NS
+    if audioEvents is not None:
+        frameInfo.metadata['audioEvents'] = [
+            dict(t_ns=t, rms=0.1, eventSeq=i + 1)
+            for i, t in enumerate(audioEvents)]
+    frameInfo.metadata['audioStrikeDetected'] = \
+        bool(audioEvents) if audioStrikeDetected is None \
+        else audioStrikeDetected
+    return frameInfo
+
+
+class StrikeDetectionEngineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.eventBus = EventBus()
+        self.engine = StrikeDetectionEngine()
+        self.strikeList = list()
+        self.eventBus.subscribe(StrikeDetectedEvent, self.strikeList.append)
+
+    def runFrames(self, frameInfoList):
+        for frameInfo in frameInfoList:
+            self.engine.process(self.eventBus, frameInfo, THERMAL_TO_VISUAL)
+            self.eventBus.pump()
+
+    def test_strike_paired_by_audio_timestamp(self):
+        # Heard between frames 2 and 3, but only reported with frame 5
+        strikeNs = 2 * FRAME_PERIOD_NS + FRAME_PERIOD_NS // 2
+        self.runFrames([
+            makeFrameInfo(i, ballPresent=i <= 2, warmPatch=i > 2,
+                          audioEvents=[strikeNs] if i == 5 else [])
+            for i in range(8)])
+
+        self.assertEqual(len(self.strikeList), 1)
+        strike = self.strikeList[0]
+        self.assertGreater(strike.leftScore, strike.rightScore)
+        self.assertAlmostEqual(strike.leftScore + strike.rightScore, 1.0)
+
+    def test_strike_waits_for_frame_after_it(self):
+        # Heard after frame 2 was captured, reported with frame 2
+        strikeNs = 2 * FRAME_PERIOD_NS + FRAME_PERIOD_NS // 2
+        frameInfoList = [
+            makeFrameInfo(i, ballPresent=i <= 2, warmPatch=i > 2,
+                          audioEvents=[strikeNs] if i == 2 else [])
+            for i in range(4)]
+        self.runFrames(frameInfoList[:3])
+        self.assertEqual(len(self.strikeList), 0)
+        self.runFrames(frameInfoList[3:])
+        self.assertEqual(len(self.strikeList), 1)
+
+    def test_no_strike_when_ball_still_present(self):
+        strikeNs = 2 * FRAME_PERIOD_NS + FRAME_PERIOD_NS // 2
+        self.runFrames([
+            makeFrameInfo(i, ballPresent=True,
+                          audioEvents=[strikeNs] if i == 3 else [])
+            for i in range(6)])
+        self.assertEqual(len(self.strikeList), 0)
+
+    def test_no_strike_when_ball_leaves_search_window(self):
+        # The ball is knocked well clear of the tracked window but stays
+        # in frame, so it is still there after the strike
+        strikeNs = 2 * FRAME_PERIOD_NS + FRAME_PERIOD_NS // 2
+        self.runFrames([
+            makeFrameInfo(i, ballPresent=True, warmPatch=i > 2,
+                          ballCenter=(160, 150) if i <= 2 else (50, 50),
+                          audioEvents=[strikeNs] if i == 3 else [])
+            for i in range(6)])
+        self.assertEqual(len(self.strikeList), 0)
+
+    def test_no_strike_with_second_ball_outside_search_window(self):
+        strikeNs = 4 * FRAME_PERIOD_NS + FRAME_PERIOD_NS // 2
+        self.runFrames([
+            makeFrameInfo(i, ballPresent=i <= 4, warmPatch=i > 4,
+                          secondBallCenter=(50, 50) if i == 4 else None,
+                          audioEvents=[strikeNs] if i == 5 else [])
+            for i in range(7)])
+        self.assertEqual(len(self.strikeList), 0)
+
+    def test_multi_frame_averages(self):
+        self.engine = StrikeDetectionEngine(
+            beforeCount=3, afterCount=2, historySize=8)
+        strikeNs = 4 * FRAME_PERIOD_NS + FRAME_PERIOD_NS // 2
+        frameInfoList = [
+            makeFrameInfo(i, ballPresent=i <= 4, warmPatch=i > 4,
+                          audioEvents=[strikeNs] if i == 4 else [])
+            for i in range(10)]
+        self.runFrames(frameInfoList[:6])
+        self.assertEqual(len(self.strikeList), 0)
+        self.runFrames(frameInfoList[6:])
+        self.assertEqual(len(self.strikeList), 1)
+
+        thermalList = [a.rawFrames['thermal'] for a in frameInfoList]
+        expected = (np.mean(thermalList[5:7], axis=0, dtype=np.float64) -
+                    np.mean(thermalList[2:5], axis=0, dtype=np.float64))
+        np.testing.assert_allclose(
+            self.strikeList[0].diffDegF, expected, atol=1e-4)
+
+    def test_strike_needs_ball_in_every_before_frame(self):
+        self.engine = StrikeDetectionEngine(beforeCount=3, afterCount=1)
+        strikeNs = 4 * FRAME_PERIOD_NS + FRAME_PERIOD_NS // 2
+        self.runFrames([
+            makeFrameInfo(i, ballPresent=3 <= i <= 4, warmPatch=i > 4,
+                          audioEvents=[strikeNs] if i == 6 else [])
+            for i in range(8)])
+        self.assertEqual(len(self.strikeList), 0)
+
+    def test_post_processing_on_executor(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.engine = StrikeDetectionEngine(executor=executor)
+        release = threading.Event()
+        executor.submit(release.wait)
+
+        strikeNs = 2 * FRAME_PERIOD_NS + FRAME_PERIOD_NS // 2
+        self.runFrames([
+            makeFrameInfo(i, ballPresent=i <= 2, warmPatch=i > 2,
+                          audioEvents=[strikeNs] if i == 2 else [])
+            for i in range(5)])
+        self.assertEqual(len(self.strikeList), 0)
+
+        time.sleep(0.05)
+        release.set()
+        executor.shutdown(wait=True)
+        self.eventBus.pump()
+        self.assertEqual(len(self.strikeList), 1)
+        strike = self.strikeList[0]
+        self.assertGreaterEqual(strike.queueDelaySec, 0.05)
+        self.assertGreater(strike.processingSec, 0)
+        self.assertGreater(strike.leftScore, strike.rightScore)
+
+    def test_legacy_recordings_use_strike_flag(self):
+        frameInfoList = [
+            makeFrameInfo(i, ballPresent=i <= 2, warmPatch=i > 2,
+                          audioStrikeDetected=i == 3)
+            for i in range(6)]
+        for frameInfo in frameInfoList:
+            del frameInfo.metadata['timestamp_ns']
+        self.runFrames(frameInfoList)
+        self.assertEqual(len(self.strikeList), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from multiprocessing.shared_memory import SharedMemory
+from unittest import mock
+
+from strikepoint.engine.params import DEFAULT_PARAMS
+from strikepoint.frames import FrameInfoWriter
+from strikepoint.sweep import SharedRecording, expandGrid, matchStrikes, \
+    runSweep
+from test.test_replay import writeStrikeRecording
+from test.test_strike import THERMAL_TO_VISUAL, makeFrameInfo
+
+
+class DetectionParamsTests(unittest.TestCase):
+
+    def test_overrides_leave_defaults_alone(self):
+        params = DEFAULT_PARAMS.withOverrides(
+            **{'visualCircles.param2': 0.9, 'strike.denoiseH': 30})
+        self.assertEqual(params.visualCircles.param2, 0.9)
+        self.assertEqual(params.strike.denoiseH, 30)
+        self.assertEqual(params.visualCircles.param1,
+                         DEFAULT_PARAMS.visualCircles.param1)
+        self.assertEqual(DEFAULT_PARAMS.visualCircles.param2, 0.8)
+        self.assertEqual(params.toDict()['visualCircles.param2'], 0.9)
+
+    def test_unknown_parameters_rejected(self):
+        with self.assertRaises(ValueError):
+            DEFAULT_PARAMS.withOverrides(**{'visual.param2': 0.9})
+        with self.assertRaises(ValueError):
+            DEFAULT_PARAMS.withOverrides(**{'strike.sigma': 2})
+
+
+class SweepTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.fileName = os.path.join(self.tempDir.name, "strike.bin")
+        self.strikeNs = writeStrikeRecording(self.fileName)
+
+    def tearDown(self):
+        self.tempDir.cleanup()
+
+    def test_expand_grid(self):
+        overrideList = expandGrid({'b': [1, 2], 'a': [3]})
+        self.assertEqual(overrideList, [dict(a=3, b=1), dict(a=3, b=2)])
+
+    def test_match_strikes(self):
+        strikeList = [dict(strikeNs=1000, leftScore=0.8, rightScore=0.2),
+                      dict(strikeNs=5000, leftScore=0.1, rightScore=0.9)]
+        labelList = [dict(strikeNs=1100, side='left'),
+                     dict(strikeNs=9000, side='right')]
+        resultMap = matchStrikes(strikeList, labelList, toleranceNs=200)
+        self.assertEqual(resultMap, dict(
+            truePositives=1, falsePositives=1, falseNegatives=1,
+            sideCount=1, sideCorrectCount=1))
+
+    def test_shared_recording_round_trip(self):
+        recording = SharedRecording.create(self.fileName)
+        try:
+            attached = SharedRecording.attach(recording.descriptor())
+            self.assertEqual(len(attached), 8)
+            frameInfo = attached.frameInfo(3)
+            self.assertEqual(frameInfo.rawFrames['thermal'].shape, (60, 80))
+            self.assertEqual(frameInfo.rgbFrames['visual'].shape,
+                             (240, 320, 3))
+            self.assertEqual(frameInfo.metadata['timestamp_ns'],
+                             recording.metadataList[3]['timestamp_ns'])
+            attached.close()
+        finally:
+            recording.unlink()
+
+    def test_failed_create_frees_shared_memory(self):
+        with FrameInfoWriter(self.fileName) as writer:
+            for i in range(3):
+                frameInfo = makeFrameInfo(i, ballPresent=True)
+                if i == 2:
+                    frameInfo.rawFrames['thermal'] = \
+                        np.zeros((30, 40), dtype=np.float32)
+                writer.writeFrameInfo(frameInfo)
+
+        shmList = list()
+
+        def createSharedMemory(*args, **kwargs):
+            shmList.append(SharedMemory(*args, **kwargs))
+            return shmList[-1]
+
+        with mock.patch('strikepoint.sweep.SharedMemory',
+                        side_effect=createSharedMemory):
+            with self.assertRaises(ValueError):
+                SharedRecording.create(self.fileName)
+        self.assertEqual(len(shmList), 3)
+        for shm in shmList:
+            with self.assertRaises(FileNotFoundError):
+                SharedMemory(name=shm.name)
+
+    def test_sweep_ranks_configurations(self):
+        labelMap = {self.fileName: [dict(strikeNs=self.strikeNs,
+                                         side='left')]}
+        # A minimum radius larger than the ball never finds it
+        resultList = runSweep(
+            labelMap, {'visualCircles.minRadius': [10, 40]},
+            THERMAL_TO_VISUAL, jobs=2)
+
+        self.assertEqual(len(resultList), 2)
+        best, worst = resultList
+        self.assertEqual(best['params'], {'visualCircles.minRadius': 10})
+        self.assertEqual(best['f1'], 1.0)
+        self.assertEqual(best['sideAccuracy'], 1.0)
+        self.assertEqual(best['frameCount'], 8)
+        self.assertGreater(best['meanFrameSec'], 0.0)
+        self.assertEqual(worst['recall'], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import time
+import unittest
+
+from strikepoint.events import EventBus
+from strikepoint.engine.strike import StrikeDetectionEngine, \
+    StrikeDetectedEvent
+from strikepoint.synthetic import SyntheticFrameInfoProvider
+
+
+class SyntheticFrameInfoProviderTests(unittest.TestCase):
+
+    def test_frames_match_requested_resolution(self):
+        provider = SyntheticFrameInfoProvider(
+            throttle=False, visualSize=(640, 480), thermalShape=(120, 160))
+        frameInfo = provider.getFrameInfo()
+        self.assertEqual(frameInfo.rgbFrames['visual'].shape, (480, 640, 3))
+        self.assertEqual(frameInfo.rgbFrames['thermal'].shape, (480, 640, 3))
+        self.assertEqual(frameInfo.rawFrames['thermal'].shape, (120, 160))
+        self.assertEqual(frameInfo.metadata['audioEvents'], [])
+
+    def test_timestamps_follow_fps_when_unthrottled(self):
+        provider = SyntheticFrameInfoProvider(fps=120.0, throttle=False)
+        startTime = time.monotonic()
+        timestampList = [provider.getFrameInfo().metadata['timestamp_ns']
+                         for _ in range(20)]
+        self.assertLess(time.monotonic() - startTime, 19 / 120.0)
+        for a, b in zip(timestampList, timestampList[1:]):
+            self.assertAlmostEqual(b - a, 1e9 / 120.0, delta=1)
+
+    def test_throttled_frames_are_paced(self):
+        provider = SyntheticFrameInfoProvider(fps=50.0)
+        startTime = time.monotonic()
+        for _ in range(11):
+            provider.getFrameInfo()
+        self.assertGreaterEqual(time.monotonic() - startTime, 0.19)
+
+    def test_strikes_are_injected_and_detected(self):
+        provider = SyntheticFrameInfoProvider(
+            fps=10.0, throttle=False, strikePeriodSec=2.0, teeSec=1.0,
+            decaySec=0.5)
+        eventBus = EventBus()
+        engine = StrikeDetectionEngine()
+        strikeList = list()
+        eventBus.subscribe(StrikeDetectedEvent, strikeList.append)
+
+        audioEventList = list()
+        for _ in range(60):
+            frameInfo = provider.getFrameInfo()
+            audioEventList += frameInfo.metadata['audioEvents']
+            engine.process(eventBus, frameInfo,
+                           provider.thermalVisualTransform)
+            eventBus.pump()
+
+        # Struck at 1s, 3s and 5s of the 6s of scene time
+        self.assertEqual([a['eventSeq'] for a in audioEventList], [1, 2, 3])
+        self.assertEqual(len(strikeList), 3)
+        for strike in strikeList:
+            self.assertGreater(strike.leftScore, strike.rightScore)
+
+    def test_ball_stays_without_strikes(self):
+        provider = SyntheticFrameInfoProvider(
+            throttle=False, strikePeriodSec=None, ballMotion=10.0)
+        for _ in range(50):
+            frameInfo = provider.getFrameInfo()
+            self.assertFalse(frameInfo.metadata['audioStrikeDetected'])
+
+
+if __name__ == '__main__':
+    unittest.main()
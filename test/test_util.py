@@ -0,0 +1,98 @@
+import unittest
+import cv2
+import numpy as np
+
+from strikepoint.engine.util import CircleTracker, _discMean, \
+    findBrightestThermalCircles, findBrightestVisualCircles
+
+
+def makeVisualFrame(center=None, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = np.full((240, 320, 3), 40, dtype=np.uint8)
+    frame += rng.integers(0, 10, frame.shape, dtype=np.uint8)
+    if center is not None:
+        cv2.circle(frame, center, 18, (230, 230, 230), -1)
+    return frame
+
+
+def makeThermalFrame(center):
+    thermal = np.full((60, 80), 70.0, dtype=np.float32)
+    cv2.circle(thermal, center, 5, 95.0, -1)
+    thermal = cv2.resize(thermal, (320, 240), interpolation=cv2.INTER_NEAREST)
+    thermal = cv2.normalize(
+        thermal, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    return cv2.applyColorMap(thermal, cv2.COLORMAP_HOT)
+
+
+class CircleScoringTests(unittest.TestCase):
+
+    def test_disc_mean_matches_full_frame_mask(self):
+        rng = np.random.default_rng(7)
+        frame = rng.integers(0, 256, (240, 320), dtype=np.uint8)
+        # Include circles clipped by, or entirely outside, the frame edges
+        for _ in range(500):
+            x, y = int(rng.integers(-60, 380)), int(rng.integers(-60, 300))
+            r = int(rng.integers(1, 60))
+            mask = np.zeros(frame.shape, dtype=np.uint8)
+            cv2.circle(mask, (x, y), r, 255, -1)
+            self.assertEqual(_discMean(frame, x, y, r),
+                             cv2.mean(frame, mask=mask)[0])
+
+
+class CircleTrackerTests(unittest.TestCase):
+
+    def assertCircleNear(self, circle, center, tolerance=3):
+        self.assertLessEqual(abs(circle[0] - center[0]), tolerance)
+        self.assertLessEqual(abs(circle[1] - center[1]), tolerance)
+
+    def test_roi_search_matches_full_frame(self):
+        frame = makeVisualFrame((160, 150))
+        fullCircles = findBrightestVisualCircles(frame)
+        self.assertEqual(len(fullCircles), 1)
+        self.assertEqual(
+            findBrightestVisualCircles(frame, roi=(110, 100, 210, 200)),
+            fullCircles)
+        self.assertEqual(
+            findBrightestVisualCircles(frame, roi=(0, 0, 100, 100)), [])
+
+        frame = makeThermalFrame((39, 37))
+        fullCircles = findBrightestThermalCircles(frame)
+        self.assertEqual(len(fullCircles), 1)
+        self.assertEqual(
+            findBrightestThermalCircles(frame, roi=(100, 90, 220, 210)),
+            fullCircles)
+
+    def test_tracks_then_falls_back_to_full_frame(self):
+        tracker = CircleTracker(findBrightestVisualCircles)
+        for seed in range(3):
+            circles = tracker.find(makeVisualFrame((160, 150), seed))
+            self.assertCircleNear(circles[0], (160, 150))
+        self.assertEqual(tracker.getStats(), dict(
+            hitCount=2, missCount=0, fullFrameCount=1))
+
+        # Ball moved well outside the search window
+        circles = tracker.find(makeVisualFrame((60, 60)))
+        self.assertCircleNear(circles[0], (60, 60))
+        self.assertEqual(tracker.getStats(), dict(
+            hitCount=2, missCount=1, fullFrameCount=2))
+
+        # Ball gone, then back; nothing to track in between
+        self.assertEqual(tracker.find(makeVisualFrame()), [])
+        self.assertIsNone(tracker.lastCircle)
+        self.assertEqual(tracker.find(makeVisualFrame()), [])
+        self.assertCircleNear(
+            tracker.find(makeVisualFrame((250, 180)))[0], (250, 180))
+        self.assertEqual(tracker.getStats(), dict(
+            hitCount=2, missCount=2, fullFrameCount=5))
+
+    def test_search_window_is_clipped(self):
+        tracker = CircleTracker(findBrightestVisualCircles)
+        self.assertIsNone(tracker.searchWindow((240, 320)))
+        tracker.lastCircle = (10, 230, 15)
+        self.assertEqual(tracker.searchWindow((240, 320)), (0, 192, 48, 240))
+        tracker.reset()
+        self.assertIsNone(tracker.searchWindow((240, 320)))
+
+
+if __name__ == "__main__":
+    unittest.main()